@@ -2,6 +2,7 @@ import { NextResponse } from 'next/server';
 import fs from 'fs';
 import path from 'path';
 import { spawn } from 'child_process';
+import { randomUUID } from 'crypto';
 import { getDatasetsDir } from '@/app/lib/datasets';
 
 export async function POST(request: Request) {
@@ -18,9 +19,15 @@ export async function POST(request: Request) {
         const outputDir = path.join(workspaceDir, 'output', name);
         const logsDir = path.join(workspaceDir, 'logs');
 
+        // Every run gets its own directory (config, command, log, meta.json),
+        // same layout as the Python UIs, so concurrent launches never share a file
+        const runId = randomUUID().replace(/-/g, '').slice(0, 8);
+        const runDir = path.join(workspaceDir, 'runs', runId);
+
         // Create directories
         if (!fs.existsSync(outputDir)) fs.mkdirSync(outputDir, { recursive: true });
         if (!fs.existsSync(logsDir)) fs.mkdirSync(logsDir, { recursive: true });
+        fs.mkdirSync(runDir, { recursive: true });
 
         // Generate lora_config.toml
         let configContent = '';
@@ -42,7 +49,7 @@ flip_aug = false
 `;
         }
 
-        const configPath = path.join(workspaceDir, 'lora_config.toml');
+        const configPath = path.join(runDir, 'lora_config.toml');
         fs.writeFileSync(configPath, configContent);
 
         // Prepare training command
@@ -59,6 +66,10 @@ flip_aug = false
             finalCommand = `echo "Error: No training command provided"`;
         }
 
+        // The frontend points --dataset_config at the shared workspace file; use this run's copy
+        const runConfigPath = configPath.replace(/\\/g, '/');
+        finalCommand = finalCommand.replace(/--dataset_config([ =])("[^"]*"|\S+)/, `--dataset_config$1"${runConfigPath}"`);
+
         // Ensure models are present before starting
         // We add a pre-check script to the wrapper
 
@@ -79,7 +90,7 @@ flip_aug = false
         }
 
         const isWin = process.platform === 'win32';
-        const wrapperScriptPath = path.join(workspaceDir, isWin ? 'run_training.bat' : 'run_training.sh');
+        const wrapperScriptPath = path.join(runDir, isWin ? 'command.bat' : 'command.sh');
 
         let wrapperScript = '';
 
@@ -125,20 +136,63 @@ ${finalCommand}
         fs.writeFileSync(wrapperScriptPath, wrapperScript);
         if (!isWin) fs.chmodSync(wrapperScriptPath, '755');
 
+        const metaPath = path.join(runDir, 'meta.json');
+        const meta: Record<string, unknown> = {
+            id: runId,
+            ui: 'nextjs',
+            spec: { dataset, lora_name: name, steps, resolution, batch_size: batchSize, learning_rate: learningRate, advanced: !!isAdvanced },
+            state: 'running',
+            created: Date.now() / 1000,
+            started: Date.now() / 1000,
+            finished: null,
+            returncode: null,
+            error: '',
+        };
+        const writeMeta = () => {
+            fs.writeFileSync(`${metaPath}.tmp`, JSON.stringify(meta, null, 2));
+            fs.renameSync(`${metaPath}.tmp`, metaPath);
+        };
+        writeMeta();
+
         const child = spawn(wrapperScriptPath, [], {
             detached: true,
             shell: isWin, // Required for .bat on Windows
             stdio: ['ignore', 'pipe', 'pipe']
         });
 
-        // Stream logs to file
-        const logFile = fs.createWriteStream(path.join(logsDir, 'training.log'));
+        // Stream logs to the run directory
+        const runLogPath = path.join(runDir, 'training.log');
+        const logFile = fs.createWriteStream(runLogPath);
         child.stdout.pipe(logFile);
         child.stderr.pipe(logFile);
 
+        // logs/training.log follows the latest run. Remove it first: writing
+        // through an old symlink would overwrite the previous run's log.
+        const latestLogPath = path.join(logsDir, 'training.log');
+        fs.rmSync(latestLogPath, { force: true });
+        try {
+            fs.symlinkSync(runLogPath, latestLogPath);
+        } catch {
+            // Symlinks need extra privileges on Windows; keep a copy instead
+            const latestLog = fs.createWriteStream(latestLogPath);
+            child.stdout.pipe(latestLog);
+            child.stderr.pipe(latestLog);
+        }
+
+        child.on('exit', (code, signal) => {
+            meta.state = code === 0 ? 'done' : signal ? 'cancelled' : 'failed';
+            meta.returncode = code;
+            meta.finished = Date.now() / 1000;
+            try {
+                writeMeta();
+            } catch (e) {
+                console.error('Could not update run metadata', e);
+            }
+        });
+
         child.unref();
 
-        return NextResponse.json({ success: true, pid: child.pid });
+        return NextResponse.json({ success: true, pid: child.pid, runId, runDir });
     } catch (error) {
         console.error('Error starting training:', error);
         return NextResponse.json({ error: 'Failed to start training' }, { status: 500 });
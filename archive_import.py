@@ -0,0 +1,249 @@
+"""
+📦 Archive Import
+Stream images and captions out of a zip or tar archive into a dataset.
+
+Entries are written straight into the dataset directory (atomically, via a
+hidden temp name) without extracting the archive anywhere first. Only
+images and ``.txt`` captions are kept; folders are flattened to file names,
+and links, hidden files and oversized entries are skipped.
+
+Zip archives have a central directory, so members are extracted in
+parallel, each worker thread with its own handle. Tar archives
+(plain, .gz, .bz2, .xz or .zst) can only be read front to back and are
+streamed in one pass. Progress is reported in bytes: uncompressed bytes
+written for zip, archive bytes consumed for tar.
+"""
+
+import os
+import stat
+import tarfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional, .tar.zst archives then can't be read
+    zstandard = None
+
+import dataset_index
+import file_ingest
+
+# ============================================================================
+# Configuration
+# ============================================================================
+
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz", ".tar.zst", ".tzst")
+ARCHIVE_WORKERS = int(os.environ.get("ARCHIVE_WORKERS", min(8, os.cpu_count() or 1)))
+
+# Entries larger than this (uncompressed) are skipped, which also defuses zip bombs
+ARCHIVE_MAX_ENTRY_MB = int(os.environ.get("ARCHIVE_MAX_ENTRY_MB", 512))
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def is_archive(path):
+    """True if ``path`` has one of the supported archive extensions."""
+    return str(path).lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+# ============================================================================
+# Filtering
+# ============================================================================
+
+def dataset_name(member_name):
+    """Flattened file name for an archive entry, or None if it isn't wanted."""
+    name = member_name.replace("\\", "/").rsplit("/", 1)[-1]
+    parts = member_name.replace("\\", "/").split("/")
+    if not name or name.startswith(".") or "__MACOSX" in parts:
+        return None
+    ext = os.path.splitext(name)[1].lower()
+    if ext not in dataset_index.IMAGE_EXTENSIONS and ext != dataset_index.CAPTION_EXTENSION:
+        return None
+    return name
+
+
+class ImportResult:
+    """Counters of one import."""
+
+    def __init__(self):
+        self.images = 0
+        self.captions = 0
+        self.skipped = 0
+        self.replaced = 0
+        self.errors = []
+        self._names = set()
+        self._replaced = set()
+        self._lock = threading.Lock()
+
+    def claim(self, name, dst_dir):
+        """Account for ``name`` about to be written.
+
+        A name that overwrites an existing file or an earlier entry of the
+        archive counts as replaced once, however often it repeats.
+        """
+        with self._lock:
+            seen = name in self._names
+            self._names.add(name)
+            if name not in self._replaced and (seen or os.path.exists(os.path.join(dst_dir, name))):
+                self._replaced.add(name)
+                self.replaced += 1
+
+    def done(self, name):
+        with self._lock:
+            if name.lower().endswith(dataset_index.CAPTION_EXTENSION):
+                self.captions += 1
+            else:
+                self.images += 1
+
+    def summary(self):
+        text = f"{self.images} images"
+        if self.captions:
+            text += f" and {self.captions} captions"
+        if self.replaced:
+            text += f", {self.replaced} replaced existing files"
+        if self.skipped:
+            text += f", {self.skipped} other entries skipped"
+        return text
+
+
+def _write_stream(fileobj, dst, on_bytes=None):
+    tmp_path = file_ingest.tmp_path(dst)
+    try:
+        with open(tmp_path, "wb") as out:
+            while True:
+                chunk = fileobj.read(COPY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                out.write(chunk)
+                if on_bytes:
+                    on_bytes(len(chunk))
+        os.replace(tmp_path, dst)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+# ============================================================================
+# Zip
+# ============================================================================
+
+def _zip_symlink(info):
+    return stat.S_ISLNK(info.external_attr >> 16)
+
+
+def _import_zip(archive_path, dst_dir, result, on_progress, workers):
+    with zipfile.ZipFile(archive_path) as archive:
+        by_name = {}
+        for info in archive.infolist():
+            name = None if info.is_dir() or _zip_symlink(info) else dataset_name(info.filename)
+            if name is None or info.file_size > ARCHIVE_MAX_ENTRY_MB * 1024 * 1024:
+                result.skipped += 1
+                continue
+            # Entries flattened to the same name: the last one wins, as it would
+            # when extracting in order (and parallel writers never share a temp file)
+            if name in by_name:
+                result.claim(name, dst_dir)  # the dropped entry, as if written first
+            by_name[name] = info
+        members = [(info, name) for name, info in by_name.items()]
+
+    total = sum(info.file_size for info, _ in members)
+    written = [0]
+    progress_lock = threading.Lock()
+    local = threading.local()
+
+    def on_bytes(n):
+        with progress_lock:
+            written[0] += n
+            if on_progress:
+                on_progress(written[0], total)
+
+    handles = []
+
+    def extract(item):
+        info, name = item
+        # ZipFile handles aren't safe to share between threads
+        archive = getattr(local, "archive", None)
+        if archive is None:
+            archive = local.archive = zipfile.ZipFile(archive_path)
+            handles.append(archive)
+        result.claim(name, dst_dir)
+        try:
+            with archive.open(info) as src:
+                _write_stream(src, os.path.join(dst_dir, name), on_bytes)
+            result.done(name)
+        except (OSError, zipfile.BadZipFile, RuntimeError) as e:
+            result.errors.append((info.filename, str(e)))
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(members)))) as executor:
+            list(executor.map(extract, members))
+    finally:
+        for archive in handles:
+            archive.close()
+
+
+# ============================================================================
+# Tar
+# ============================================================================
+
+def _open_tar_stream(raw, archive_path):
+    lower = archive_path.lower()
+    if lower.endswith((".tar.zst", ".tzst")):
+        if zstandard is None:
+            raise RuntimeError("zstandard is required for .tar.zst archives (pip install zstandard)")
+        stream = zstandard.ZstdDecompressor().stream_reader(raw)
+        return tarfile.open(fileobj=stream, mode="r|")
+    # "r|*" detects gzip, bzip2 and xz compression from the stream itself
+    return tarfile.open(fileobj=raw, mode="r|*")
+
+
+def _import_tar(archive_path, dst_dir, result, on_progress):
+    total = os.path.getsize(archive_path)
+    with open(archive_path, "rb") as raw, _open_tar_stream(raw, archive_path) as archive:
+        for member in archive:
+            name = dataset_name(member.name) if member.isfile() else None
+            if name is None or member.size > ARCHIVE_MAX_ENTRY_MB * 1024 * 1024:
+                result.skipped += 1
+                continue
+            result.claim(name, dst_dir)
+            try:
+                _write_stream(archive.extractfile(member), os.path.join(dst_dir, name),
+                              on_bytes=(lambda n: on_progress(raw.tell(), total)) if on_progress else None)
+                result.done(name)
+            except OSError as e:
+                result.errors.append((member.name, str(e)))
+        if on_progress:
+            on_progress(total, total)
+
+
+# ============================================================================
+# Entry Point
+# ============================================================================
+
+def import_archive(archive_path, dst_dir, on_progress=None, workers=ARCHIVE_WORKERS):
+    """Import the images and captions of an archive into ``dst_dir``.
+
+    ``on_progress(done_bytes, total_bytes)`` is called as data is written.
+    Returns an ``ImportResult``; a corrupt or unsupported archive raises
+    ``ValueError``.
+    """
+    archive_path = str(archive_path)
+    os.makedirs(dst_dir, exist_ok=True)
+    result = ImportResult()
+    try:
+        if zipfile.is_zipfile(archive_path):
+            _import_zip(archive_path, dst_dir, result, on_progress, workers)
+        else:
+            _import_tar(archive_path, dst_dir, result, on_progress)
+    except (tarfile.TarError, zipfile.BadZipFile, EOFError, RuntimeError) as e:
+        raise ValueError(f"{os.path.basename(archive_path)}: {e}") from e
+    except Exception as e:
+        if zstandard is not None and isinstance(e, zstandard.ZstdError):
+            raise ValueError(f"{os.path.basename(archive_path)}: {e}") from e
+        raise
+    dataset_index.get_index(dst_dir, refresh=False).invalidate()
+    return result
@@ -0,0 +1,199 @@
+"""
+🔎 Caption Index
+Full-text word index over a dataset's captions, plus atomic bulk edits.
+
+A ``CaptionIndex`` holds every caption in full and an inverted index from
+words to images. It is synced from a dataset index's entries, so only
+captions whose ``.txt`` mtime moved are re-read - the same change
+detection the dataset listing uses.
+
+Bulk edits write all new captions to temporary files first and only then
+rename them into place, so a failed batch leaves every caption untouched.
+"""
+
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+# ============================================================================
+# Configuration
+# ============================================================================
+
+WORD_RE = re.compile(r"[\w']+")
+CAPTION_WRITE_WORKERS = 8
+
+# Below this many files a thread pool costs more than it saves
+INLINE_WRITE_LIMIT = 64
+
+
+def tokenize(text):
+    """Lower-cased words of a caption or query."""
+    return WORD_RE.findall(text.lower())
+
+
+# ============================================================================
+# Index
+# ============================================================================
+
+def _read_caption(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except (OSError, UnicodeDecodeError):
+        return ""
+
+
+class CaptionIndex:
+    """Captions and word postings of one dataset, keyed by image name."""
+
+    def __init__(self):
+        self._captions = {}  # name -> (caption_mtime_ns, text, lowered text)
+        self._postings = {}  # word -> set of names
+
+    def __len__(self):
+        return len(self._captions)
+
+    def get(self, name):
+        """Full caption of an image ("" if it has none)."""
+        record = self._captions.get(name)
+        return record[1] if record else ""
+
+    def sync(self, entries):
+        """Bring the index in line with dataset index entries. Returns the names re-read."""
+        changed = []
+        seen = set()
+        for entry in entries:
+            seen.add(entry.name)
+            record = self._captions.get(entry.name)
+            if record is not None and record[0] == entry.caption_mtime_ns:
+                continue
+            text = "" if entry.caption_mtime_ns is None else _read_caption(entry.caption_path)
+            self._set(entry.name, entry.caption_mtime_ns, text)
+            changed.append(entry.name)
+        for name in [n for n in self._captions if n not in seen]:
+            self._set(name, None, None)
+        return changed
+
+    def put(self, name, mtime_ns, text):
+        """Record a caption that was just written, without reading it back."""
+        self._set(name, mtime_ns, text.strip())
+
+    def _set(self, name, mtime_ns, text):
+        old = self._captions.pop(name, None)
+        if old is not None:
+            for word in set(tokenize(old[1])):
+                names = self._postings.get(word)
+                if names is not None:
+                    names.discard(name)
+                    if not names:
+                        del self._postings[word]
+        if text is None:
+            return
+        self._captions[name] = (mtime_ns, text, text.lower())
+        for word in set(tokenize(text)):
+            self._postings.setdefault(word, set()).add(name)
+
+    def search(self, query):
+        """Names whose caption contains ``query`` (case-insensitive).
+
+        The query may start or end mid-word, so its first word is matched
+        against the ends of indexed words, its last word against their starts
+        (a single word anywhere inside one) and the words between exactly.
+        The candidates are then checked for the query as a whole.
+        """
+        query = (query or "").strip().lower()
+        words = tokenize(query)
+        if not words:
+            return {name for name, record in self._captions.items() if query in record[2]}
+
+        candidates = None
+        for i, word in enumerate(words):
+            first, last = i == 0, i == len(words) - 1
+            if first and last:
+                match = lambda known: word in known
+            elif first:
+                match = lambda known: known.endswith(word)
+            elif last:
+                match = lambda known: known.startswith(word)
+            else:
+                match = None
+            if match is None:
+                names = self._postings.get(word, set())
+            else:
+                names = set()
+                for known, posting in self._postings.items():
+                    if match(known):
+                        names |= posting
+            candidates = names if candidates is None else candidates & names
+            if not candidates:
+                return set()
+        return {name for name in candidates if query in self._captions[name][2]}
+
+
+# ============================================================================
+# Bulk Edits
+# ============================================================================
+
+def find_replace(text, find, replace, regex=False, ignore_case=False):
+    """Replace every occurrence of ``find`` in ``text``."""
+    if not find:
+        return text
+    flags = re.IGNORECASE if ignore_case else 0
+    if not regex:
+        if not ignore_case:
+            return text.replace(find, replace)
+        find, replace = re.escape(find), replace.replace("\\", "\\\\")
+    return re.sub(find, replace, text, flags=flags)
+
+
+def prepend(text, words, separator=", "):
+    """Put ``words`` in front of ``text``, unless the caption already starts with them."""
+    words = words.strip()
+    if not words or text.startswith(words):
+        return text
+    return f"{words}{separator}{text}" if text else words
+
+
+def append(text, words, separator=", "):
+    """Put ``words`` after ``text``, unless the caption already ends with them."""
+    words = words.strip()
+    if not words or text.endswith(words):
+        return text
+    return f"{text}{separator}{words}" if text else words
+
+
+def _tmp_path(path):
+    return f"{path}.{os.getpid()}.tmp"
+
+
+def _write_tmp(item):
+    path, text = item
+    with open(_tmp_path(path), "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def write_captions(updates):
+    """Write ``{caption_path: text}`` as one batch.
+
+    All temporary files are written before the first rename, so an error
+    (e.g. a full disk) leaves every caption as it was.
+    """
+    items = list(updates.items())
+    try:
+        if len(items) <= INLINE_WRITE_LIMIT:
+            for item in items:
+                _write_tmp(item)
+        else:
+            with ThreadPoolExecutor(max_workers=CAPTION_WRITE_WORKERS) as executor:
+                list(executor.map(_write_tmp, items))
+    except BaseException:
+        for path, _ in items:
+            try:
+                os.remove(_tmp_path(path))
+            except OSError:
+                pass
+        raise
+
+    for path, _ in items:
+        os.replace(_tmp_path(path), path)
+    return len(items)
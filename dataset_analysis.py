@@ -0,0 +1,245 @@
+"""
+📊 Dataset Analysis
+Pre-flight report on a dataset: sizes, captions, broken files and buckets.
+
+Only image headers are read (plus a few trailing bytes to spot truncated
+files), in a thread pool, and results are cached by file size and mtime.
+The bucket plan replays sd-scripts' bucket selection for the chosen
+resolution, so steps per epoch, upscaled images and cropped pixels are
+known before the run starts.
+"""
+
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional, the analysis then only covers captions
+    Image = None
+
+import dataset_index
+import image_preprocess
+
+# ============================================================================
+# Configuration
+# ============================================================================
+
+ANALYSIS_WORKERS = int(os.environ.get("ANALYSIS_WORKERS", 16))
+ORIENTATION_TAG = 0x0112
+TAIL_BYTES = 1024
+
+# (label, upper bound of the longer side) for the resolution histogram
+SIZE_BINS = [("< 512", 512), ("512-767", 768), ("768-1023", 1024), ("1024-2047", 2048),
+             ("2048-4095", 4096), ("≥ 4096", math.inf)]
+
+# (label, upper bound of width / height) for the aspect histogram
+ASPECT_BINS = [("≤ 1:2", 0.55), ("2:3", 0.72), ("3:4", 0.87), ("1:1", 1.15), ("4:3", 1.4),
+               ("3:2", 1.8), ("≥ 2:1", math.inf)]
+
+ISSUE_LIST_LIMIT = 10
+
+_headers = {}  # path -> (size, mtime_ns, result)
+_headers_lock = threading.Lock()
+
+
+# ============================================================================
+# Headers
+# ============================================================================
+
+def _truncated(path, fmt):
+    """Cheap end-of-file checks for the common formats."""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - TAIL_BYTES))
+        tail = f.read()
+        if fmt == "JPEG":
+            return b"\xff\xd9" not in tail
+        if fmt == "PNG":
+            return b"IEND" not in tail
+        if fmt == "WEBP":
+            f.seek(4)
+            riff_size = int.from_bytes(f.read(4), "little")
+            return riff_size + 8 > size
+    return False
+
+
+def read_header(path):
+    """Return ``(width, height, format, error)`` from an image's header.
+
+    Width and height are in display orientation (EXIF rotation applied).
+    """
+    try:
+        with Image.open(path) as img:
+            width, height = img.size
+            fmt = img.format
+            if fmt in ("JPEG", "WEBP") and img.getexif().get(ORIENTATION_TAG) in (5, 6, 7, 8):
+                width, height = height, width
+        if _truncated(path, fmt):
+            return width, height, fmt, "truncated"
+        return width, height, fmt, None
+    except Exception as e:
+        return None, None, None, str(e) or type(e).__name__
+
+
+def read_headers(entries):
+    """``{name: (width, height, format, error)}`` for dataset index entries, cached by mtime."""
+    results = {}
+    missing = []
+    with _headers_lock:
+        for entry in entries:
+            cached = _headers.get(entry.path)
+            if cached and cached[0] == entry.size and cached[1] == entry.mtime_ns:
+                results[entry.name] = cached[2]
+            else:
+                missing.append(entry)
+
+    if missing:
+        with ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS) as executor:
+            headers = list(executor.map(read_header, [entry.path for entry in missing]))
+        with _headers_lock:
+            for entry, header in zip(missing, headers):
+                _headers[entry.path] = (entry.size, entry.mtime_ns, header)
+                results[entry.name] = header
+    return results
+
+
+# ============================================================================
+# Bucket Plan
+# ============================================================================
+
+def plan_buckets(sizes, resolution, batch_size, num_repeats,
+                 min_bucket_reso=image_preprocess.MIN_BUCKET_RESO,
+                 max_bucket_reso=image_preprocess.MAX_BUCKET_RESO,
+                 bucket_reso_steps=image_preprocess.BUCKET_RESO_STEPS):
+    """Replay sd-scripts bucketing for ``[(width, height), ...]``.
+
+    Returns a dict with ``buckets`` (``{(w, h): {"images", "batches", "upscaled"}}``),
+    ``steps_per_epoch``, ``empty_slots`` (batch slots left unfilled by partial
+    batches), ``upscaled`` and ``cropped`` (fraction of resized pixels cropped away).
+    """
+    resos = image_preprocess.make_bucket_resolutions((resolution, resolution), min_bucket_reso,
+                                                     max_bucket_reso, bucket_reso_steps)
+    buckets = {}
+    upscaled = 0
+    resized_pixels = 0
+    bucket_pixels = 0
+    for width, height in sizes:
+        bucket, resized = image_preprocess.select_bucket(width, height, resos)
+        stats = buckets.setdefault(bucket, {"images": 0, "batches": 0, "upscaled": 0})
+        stats["images"] += 1
+        if resized[0] > width:
+            stats["upscaled"] += 1
+            upscaled += 1
+        resized_pixels += resized[0] * resized[1]
+        bucket_pixels += bucket[0] * bucket[1]
+
+    steps = 0
+    empty_slots = 0
+    for stats in buckets.values():
+        # Every repeat of an image lands in the same bucket; batches never mix buckets
+        samples = stats["images"] * num_repeats
+        stats["batches"] = -(-samples // batch_size)
+        steps += stats["batches"]
+        empty_slots += stats["batches"] * batch_size - samples
+
+    return {
+        "buckets": dict(sorted(buckets.items(), key=lambda kv: -kv[1]["images"])),
+        "steps_per_epoch": steps,
+        "empty_slots": empty_slots,
+        "upscaled": upscaled,
+        "cropped": 1 - bucket_pixels / resized_pixels if resized_pixels else 0.0,
+    }
+
+
+# ============================================================================
+# Report
+# ============================================================================
+
+def _histogram(values, bins):
+    counts = [0] * len(bins)
+    for value in values:
+        for i, (_, upper) in enumerate(bins):
+            if value < upper:
+                counts[i] += 1
+                break
+    return [(label, count) for (label, _), count in zip(bins, counts)]
+
+
+def _histogram_table(title, rows, total):
+    lines = [f"| {title} | Images | |", "|---|---:|---|"]
+    for label, count in rows:
+        if count:
+            bar = "█" * max(1, round(20 * count / total))
+            lines.append(f"| {label} | {count} | {bar} |")
+    return "\n".join(lines)
+
+
+def _name_list(names):
+    shown = ", ".join(f"`{n}`" for n in names[:ISSUE_LIST_LIMIT])
+    if len(names) > ISSUE_LIST_LIMIT:
+        shown += f" and {len(names) - ISSUE_LIST_LIMIT} more"
+    return shown
+
+
+def analyze_dataset(path, resolution, batch_size, num_repeats, steps=None):
+    """Markdown report for the dataset at ``path`` trained at ``resolution``."""
+    index = dataset_index.get_index(path)
+    entries = index.images
+    if not entries:
+        return "⚠️ Dataset has no images"
+
+    captions = index.captions()
+    missing_captions = [e.name for e in entries if e.caption_mtime_ns is None]
+    empty_captions = [e.name for e in entries if e.caption_mtime_ns is not None and not captions.get(e.name)]
+
+    lines = [f"### 📊 {os.path.basename(path)}: {len(entries)} images"]
+    if Image is None:
+        lines.append("⚠️ Pillow is not installed, image sizes can't be read")
+        headers = {}
+    else:
+        headers = read_headers(entries)
+
+    corrupt = [(name, h[3]) for name, h in headers.items() if h[3]]
+    sizes = {name: (h[0], h[1]) for name, h in headers.items() if not h[3]}
+
+    if missing_captions or empty_captions or corrupt:
+        lines.append("")
+        lines.append("#### ⚠️ Issues")
+        if corrupt:
+            lines.append(f"- ❌ {len(corrupt)} unreadable or truncated: "
+                         + _name_list([f"{n} ({err})" for n, err in corrupt]))
+        if missing_captions:
+            lines.append(f"- 📝 {len(missing_captions)} without caption: " + _name_list(missing_captions))
+        if empty_captions:
+            lines.append(f"- 📝 {len(empty_captions)} with an empty caption: " + _name_list(empty_captions))
+    else:
+        lines.append("✅ Every image is readable and captioned")
+
+    if sizes:
+        longest = [max(w, h) for w, h in sizes.values()]
+        aspects = [w / h for w, h in sizes.values()]
+        lines += ["", _histogram_table("Longest side (px)", _histogram(longest, SIZE_BINS), len(sizes)),
+                  "", _histogram_table("Aspect (w:h)", _histogram(aspects, ASPECT_BINS), len(sizes))]
+
+        plan = plan_buckets(list(sizes.values()), int(resolution), int(batch_size), num_repeats)
+        lines += ["", f"#### 🪣 Buckets at {resolution}px (batch {batch_size}, {num_repeats} repeats)",
+                  "| Bucket | Images | Batches / epoch | Upscaled |", "|---|---:|---:|---:|"]
+        for (w, h), stats in plan["buckets"].items():
+            lines.append(f"| {w}×{h} | {stats['images']} | {stats['batches']} | {stats['upscaled']} |")
+
+        slots = plan["steps_per_epoch"] * int(batch_size)
+        lines += [
+            "",
+            f"- 🔁 **{plan['steps_per_epoch']} steps per epoch** across {len(plan['buckets'])} buckets",
+            f"- 🧩 {plan['empty_slots']} of {slots} batch slots empty from partial batches "
+            f"({100 * plan['empty_slots'] / slots:.1f}%)",
+            f"- 🔍 {plan['upscaled']} images upscaled to reach their bucket",
+            f"- ✂️ {100 * plan['cropped']:.1f}% of resized pixels cropped away",
+        ]
+        if steps:
+            epochs = int(steps) / plan["steps_per_epoch"]
+            lines.append(f"- ⏱️ {steps} steps ≈ {epochs:.1f} epochs")
+    return "\n".join(lines)
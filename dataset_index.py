@@ -0,0 +1,310 @@
+"""
+📇 Dataset Index
+Cached, incrementally refreshed view of the dataset folders shared by both UIs.
+
+Each dataset keeps an in-memory list of its images (name, size, mtime and a
+caption snippet). A refresh only stats the dataset directory; the folder is
+re-listed when its mtime moves (files added, removed or renamed) or when the
+periodic rescan interval expires, and captions are only re-read for files
+whose ``.txt`` actually changed. Full captions for search and bulk edits
+live in a caption index that is synced from the same entries.
+"""
+
+import os
+import threading
+import time
+
+import caption_index
+
+# ============================================================================
+# Configuration
+# ============================================================================
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+CAPTION_EXTENSION = ".txt"
+CAPTION_SNIPPET_LENGTH = 100
+
+# In-place edits (e.g. a caption rewritten by an external tool) do not touch
+# the directory mtime, so the folder is re-listed at least this often anyway.
+FULL_RESCAN_INTERVAL = float(os.environ.get("DATASET_RESCAN_INTERVAL", 30))
+
+# Orderings offered by DatasetIndex.query: label -> (sort key, descending)
+SORT_ORDERS = {
+    "Default": (None, False),
+    "Name": (lambda e: e.name.lower(), False),
+    "Newest": (lambda e: e.mtime_ns, True),
+    "Oldest": (lambda e: e.mtime_ns, False),
+    "Largest": (lambda e: e.size, True),
+    "Smallest": (lambda e: e.size, False),
+}
+
+# Filtered/sorted views kept per index, so paging through one doesn't re-sort
+QUERY_CACHE_SIZE = 8
+
+# Directory mtimes this close to the last scan may hide a same-tick change
+# (coarse timestamps on network volumes), so such scans are not trusted.
+RACY_MTIME_WINDOW_NS = 2 * 10**9
+
+
+# ============================================================================
+# Index
+# ============================================================================
+
+class ImageEntry:
+    """One image of a dataset as seen by the last scan."""
+
+    __slots__ = ("name", "path", "size", "mtime_ns", "caption", "caption_mtime_ns")
+
+    def __init__(self, name, path, size, mtime_ns, caption="", caption_mtime_ns=None):
+        self.name = name
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.caption = caption
+        self.caption_mtime_ns = caption_mtime_ns
+
+    @property
+    def caption_path(self):
+        return os.path.splitext(self.path)[0] + CAPTION_EXTENSION
+
+
+def _sort_key(name):
+    """Order images by extension group, then by name (the historic gallery order)."""
+    ext = os.path.splitext(name)[1].lower()
+    return IMAGE_EXTENSIONS.index(ext), name
+
+
+def _read_caption_snippet(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read().strip()[:CAPTION_SNIPPET_LENGTH]
+    except (OSError, UnicodeDecodeError):
+        return ""
+
+
+class DatasetIndex:
+    """In-memory index of a single dataset directory."""
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.version = 0
+        self._entries = []
+        self._by_name = {}
+        self._dir_mtime_ns = None
+        self._scanned_at = 0.0
+        self._queries = {}
+        self._lock = threading.Lock()
+        self._captions = caption_index.CaptionIndex()
+        self._captions_version = None
+        self._captions_lock = threading.Lock()
+
+    @property
+    def images(self):
+        """Ordered image entries from the last refresh (do not mutate)."""
+        return self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, name):
+        return self._by_name.get(name)
+
+    def query(self, search="", sort="Default", offset=0, limit=None):
+        """Return ``(entries, total)`` for one page of the filtered, sorted image list.
+
+        ``search`` matches file names and full captions case-insensitively.
+        """
+        search = (search or "").strip().lower()
+        view = self._view(search, sort)
+        end = None if limit is None else offset + limit
+        return view[offset:end], len(view)
+
+    def page(self, page, page_size, search="", sort="Default"):
+        """Return ``(entries, page, pages, total)`` with ``page`` clamped to the valid range."""
+        view = self._view((search or "").strip().lower(), sort)
+        pages = max(1, -(-len(view) // page_size))
+        page = min(max(1, int(page or 1)), pages)
+        start = (page - 1) * page_size
+        return view[start:start + page_size], page, pages, len(view)
+
+    def _view(self, search, sort):
+        entries = self._entries
+        key = (search, sort)
+        cached = self._queries.get(key)
+        if cached is not None and cached[0] is entries:
+            return cached[1]
+
+        view = entries
+        if search:
+            matched = self.captions().search(search)
+            view = [e for e in view if e.name in matched or search in e.name.lower()]
+        sort_key, descending = SORT_ORDERS.get(sort, SORT_ORDERS["Default"])
+        if sort_key is not None:
+            view = sorted(view, key=sort_key, reverse=descending)
+
+        if len(self._queries) >= QUERY_CACHE_SIZE:
+            self._queries.clear()
+        self._queries[key] = (entries, view)
+        return view
+
+    def captions(self):
+        """The caption index, synced with the entries of the last refresh."""
+        with self._captions_lock:
+            entries, version = self._entries, self.version
+            if self._captions_version != version:
+                self._captions.sync(entries)
+                self._captions_version = version
+            return self._captions
+
+    def edit_captions(self, names, transform):
+        """Rewrite the captions of ``names`` with ``transform(caption)`` in one atomic batch.
+
+        Images without a caption get one if the transform returns text.
+        Returns the number of caption files written.
+        """
+        captions = self.captions()
+        updates = {}
+        for name in names:
+            entry = self.get(name)
+            if entry is None:
+                continue
+            old = captions.get(name)
+            new = transform(old)
+            if new != old and (new or entry.caption_mtime_ns is not None):
+                updates[name] = new
+        if not updates:
+            return 0
+
+        caption_index.write_captions({self.get(name).caption_path: text for name, text in updates.items()})
+        self.refresh(force=True)
+        # The new texts are known, so the caption index needn't read them back
+        with self._captions_lock:
+            for name, text in updates.items():
+                entry = self.get(name)
+                if entry is not None:
+                    self._captions.put(name, entry.caption_mtime_ns, text)
+        return len(updates)
+
+    def invalidate(self):
+        """Force the next refresh to re-list the directory."""
+        self._dir_mtime_ns = None
+
+    def refresh(self, force=False):
+        """Bring the index up to date. Returns True if its contents changed."""
+        with self._lock:
+            try:
+                dir_mtime_ns = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError:
+                if not self._entries:
+                    return False
+                self._set_entries([])
+                self._dir_mtime_ns = None
+                return True
+
+            expired = time.monotonic() - self._scanned_at > FULL_RESCAN_INTERVAL
+            if not force and not expired and dir_mtime_ns == self._dir_mtime_ns:
+                return False
+            return self._rescan()
+
+    def _rescan(self):
+        scan_started_ns = time.time_ns()
+        dir_mtime_ns = os.stat(self.path).st_mtime_ns
+
+        images = {}
+        captions = {}
+        with os.scandir(self.path) as it:
+            for entry in it:
+                stem, ext = os.path.splitext(entry.name)
+                ext = ext.lower()
+                if ext in IMAGE_EXTENSIONS or ext == CAPTION_EXTENSION:
+                    try:
+                        if not entry.is_file():
+                            continue
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    if ext == CAPTION_EXTENSION:
+                        captions[stem] = st.st_mtime_ns
+                    else:
+                        images[entry.name] = st
+
+        changed = len(images) != len(self._entries)
+        entries = []
+        for name in sorted(images, key=_sort_key):
+            st = images[name]
+            caption_mtime_ns = captions.get(os.path.splitext(name)[0])
+            old = self._by_name.get(name)
+            if old is not None and old.size == st.st_size and old.mtime_ns == st.st_mtime_ns \
+                    and old.caption_mtime_ns == caption_mtime_ns:
+                entries.append(old)
+                continue
+
+            changed = True
+            if old is not None and old.caption_mtime_ns == caption_mtime_ns:
+                caption = old.caption
+            elif caption_mtime_ns is not None:
+                caption = _read_caption_snippet(os.path.join(self.path, os.path.splitext(name)[0] + CAPTION_EXTENSION))
+            else:
+                caption = ""
+            entries.append(ImageEntry(name, os.path.join(self.path, name), st.st_size,
+                                      st.st_mtime_ns, caption, caption_mtime_ns))
+
+        if changed:
+            self._set_entries(entries)
+
+        # Don't trust a directory mtime that is indistinguishable from the scan
+        # itself; leaving it unset makes the next refresh re-list once more.
+        racy = scan_started_ns - dir_mtime_ns < RACY_MTIME_WINDOW_NS
+        self._dir_mtime_ns = None if racy else dir_mtime_ns
+        self._scanned_at = time.monotonic()
+        return changed
+
+    def _set_entries(self, entries):
+        self._entries = entries
+        self._by_name = {e.name: e for e in entries}
+        self.version += 1
+
+
+# ============================================================================
+# Registry
+# ============================================================================
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(path, refresh=True):
+    """Return the shared index for a dataset directory, refreshed by default."""
+    path = os.path.abspath(path)
+    with _indexes_lock:
+        index = _indexes.get(path)
+        if index is None:
+            index = _indexes[path] = DatasetIndex(path)
+    if refresh:
+        index.refresh()
+    return index
+
+
+def forget(path):
+    """Drop the cached index of a dataset (e.g. after it was deleted)."""
+    with _indexes_lock:
+        _indexes.pop(os.path.abspath(path), None)
+
+
+def cached_counts():
+    """``{path: image_count}`` for every index loaded so far, without refreshing any."""
+    with _indexes_lock:
+        return {path: len(index) for path, index in _indexes.items()}
+
+
+def list_datasets(root):
+    """Return ``[(name, image_count), ...]`` for every dataset under ``root``."""
+    if not os.path.isdir(root):
+        return []
+    datasets = []
+    with os.scandir(root) as it:
+        names = sorted(entry.name for entry in it if entry.is_dir())
+    for name in names:
+        datasets.append((name, len(get_index(os.path.join(root, name)))))
+    return datasets
+
@@ -1,5 +1,12 @@
 import os
 import requests
+import json
+import hashlib
+import shutil
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
 
 import sys
 
@@ -22,74 +29,680 @@ MODELS = [
     }
 ]
 
-WORKSPACE_DIR = os.environ.get("DATA_DIRECTORY", "/workspace")
+WORKSPACE_DIR = os.path.abspath(os.environ.get("DATA_DIRECTORY", "/workspace"))
 HF_TOKEN = os.environ.get("HF_TOKEN")
 
-def download_file(url, dest, name):
-    if os.path.exists(dest):
-        # Check if file is not empty (simple check)
-        if os.path.getsize(dest) > 1024 * 1024: # > 1MB
-            print(f"✓ {name} already exists at {dest}")
-            return
-        else:
-            print(f"⚠️ {name} exists but is too small. Re-downloading...")
-            os.remove(dest)
+# Every weight file is stored once, as model_store/sha256/<hash>, and each
+# workspace path is a hardlink (or reflink/symlink) to it
+def model_store_dir(workspace_dir):
+    """MODEL_STORE_DIR if set, else ``model_store`` inside ``workspace_dir``."""
+    return os.path.abspath(os.environ.get("MODEL_STORE_DIR") or os.path.join(workspace_dir, "model_store"))
+
+
+MODEL_STORE_DIR = model_store_dir(WORKSPACE_DIR)
+
+# Each file is fetched as CHUNK_SIZE HTTP Range requests, CONNECTIONS at a time
+CHUNK_SIZE = int(os.environ.get("DOWNLOAD_CHUNK_MB", 64)) * 1024 * 1024
+CONNECTIONS = int(os.environ.get("DOWNLOAD_CONNECTIONS", 8))
+BLOCK_SIZE = 1024 * 1024
+RETRIES = 5
+
+# Chunks that arrive ahead of the hashing frontier are held in memory up to
+# this much; past it they are hashed from disk once the frontier reaches them
+HASH_BUFFER = int(os.environ.get("DOWNLOAD_HASH_BUFFER_MB", 512)) * 1024 * 1024
+TIMEOUT = (10, 60)  # connect, read
+
+# Expected sizes/hashes and the mtime each file was last verified at.
+# A MODELS entry may pin "sha256"; otherwise it is taken from the Hugging Face
+# X-Linked-Etag header (the LFS SHA-256) when the file is first fetched.
+MANIFEST_FILENAME = "models_manifest.json"
+
+_print_lock = threading.Lock()
+
+
+class DownloadError(Exception):
+    pass
+
+
+def log(message):
+    with _print_lock:
+        print(message, flush=True)
+
+
+def make_session(pool_size=CONNECTIONS * len(MODELS)):
+    """HTTP session whose connection pool fits every concurrent chunk request."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
 
-    print(f"⬇️  Downloading {name}...")
-    
-    headers = {}
+
+def auth_headers(url):
     if "huggingface.co" in url and HF_TOKEN:
-        headers["Authorization"] = f"Bearer {HF_TOKEN}"
+        return {"Authorization": f"Bearer {HF_TOKEN}"}
+    return {}
+
+
+def probe(session, url):
+    """Return ``{"size", "ranges", "sha256"}`` for a URL using a one-byte Range request."""
+    headers = {**auth_headers(url), "Range": "bytes=0-0"}
+    with session.get(url, headers=headers, stream=True, timeout=TIMEOUT) as response:
+        response.raise_for_status()
+        info = {"size": int(response.headers.get("content-length", 0)), "ranges": False, "sha256": None}
+        content_range = response.headers.get("Content-Range", "")
+        if response.status_code == 206 and "/" in content_range:
+            total = content_range.rsplit("/", 1)[1]
+            if total.isdigit():
+                info["size"], info["ranges"] = int(total), True
+
+        # Hugging Face answers /resolve/ with a redirect carrying the LFS sha256
+        for r in [*response.history, response]:
+            etag = r.headers.get("X-Linked-Etag", "").strip('"').lower()
+            if len(etag) == 64 and all(c in "0123456789abcdef" for c in etag):
+                info["sha256"] = etag
+        return info
+
+
+# ============================================================================
+# Integrity
+# ============================================================================
+
+class Manifest:
+    """``models_manifest.json``: expected size/sha256 per file plus the mtime it was verified at."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def get(self, filename):
+        return self.entries.get(filename, {})
+
+    def update(self, filename, **fields):
+        with self._lock:
+            self.entries.setdefault(filename, {}).update(fields)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.entries, f, indent=2, sort_keys=True)
+            os.replace(tmp, self.path)
+
+
+_manifests = {}
+_manifests_lock = threading.Lock()
+
+
+def load_manifest(path):
+    """Shared Manifest instance per file, so concurrent downloads don't overwrite each other."""
+    path = os.path.abspath(path)
+    with _manifests_lock:
+        if path not in _manifests:
+            _manifests[path] = Manifest(path)
+        return _manifests[path]
+
+
+def check_safetensors(path):
+    """Check that the safetensors header parses and accounts for exactly the file's size.
+
+    Catches truncated files without reading the tensor data.
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        head = f.read(8)
+        if len(head) < 8:
+            return False
+        header_len = struct.unpack("<Q", head)[0]
+        if header_len > min(size - 8, 100 * 1024 * 1024):
+            return False
+        try:
+            header = json.loads(f.read(header_len))
+        except ValueError:
+            return False
+    data_end = max((t["data_offsets"][1] for k, t in header.items() if k != "__metadata__"), default=0)
+    return 8 + header_len + data_end == size
+
+
+def hash_file(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE * 8), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def verify_file(path, entry, full=False):
+    """Check a downloaded file against its manifest entry. Returns ``(ok, reason, sha256)``.
+
+    The quick check compares the size and the safetensors header and only
+    re-hashes when the file's mtime differs from the one it was last
+    verified at; ``full`` always re-hashes.
+    """
+    if not os.path.exists(path):
+        return False, "missing", None
+    st = os.stat(path)
+    if entry.get("size") and st.st_size != entry["size"]:
+        return False, f"size {st.st_size} != expected {entry['size']}", None
+    if path.endswith(".safetensors") and not check_safetensors(path):
+        return False, "truncated or corrupt safetensors header", None
+    if not entry.get("sha256"):
+        return True, "no checksum on record", None
+    if not full and entry.get("mtime_ns") == st.st_mtime_ns:
+        return True, "unchanged since last verification", entry["sha256"]
+    digest = hash_file(path)
+    if digest != entry["sha256"]:
+        return False, "sha256 mismatch", digest
+    return True, "sha256 verified", digest
+
+
+class _StreamHasher:
+    """SHA-256 of a chunked download, computed from the bytes as they arrive.
+
+    Bytes of the chunk at the hashing frontier go straight into the hash;
+    chunks running ahead of it are buffered in memory and hashed as soon as
+    the frontier reaches them, so the file is never read back. Only chunks
+    finished by an earlier session (``done``), or ones pushed out when the
+    buffer passes ``buffer_limit``, are hashed from disk.
+    """
+
+    def __init__(self, path, chunks, done=(), buffer_limit=HASH_BUFFER):
+        self.path = path
+        self.chunks = chunks
+        self.buffer_limit = buffer_limit
+        self.sha = hashlib.sha256()
+        self._mark = self.sha.copy()  # hash state before the frontier chunk, for retries
+        self._next = 0
+        self._frontier = None
+        self._done = set(done)
+        self._from_disk = set(done)
+        self._buffers = {}
+        self._buffered = 0
+        self._lock = threading.Lock()
+        with self._lock:
+            self._advance()
+
+    def start(self, index):
+        """A (re)try of chunk ``index`` begins; forget what an earlier attempt fed."""
+        with self._lock:
+            if index == self._frontier:
+                self.sha = self._mark.copy()
+            else:
+                self._buffered -= sum(len(data) for data in self._buffers.pop(index, []))
+
+    def feed(self, index, data):
+        with self._lock:
+            if index in self._from_disk:
+                return
+            if index == self._frontier:
+                self.sha.update(data)
+                return
+            self._buffers.setdefault(index, []).append(data)
+            self._buffered += len(data)
+            if self._buffered > self.buffer_limit:
+                self._buffered -= sum(len(d) for d in self._buffers.pop(index))
+                self._from_disk.add(index)
+
+    def chunk_done(self, index):
+        with self._lock:
+            self._done.add(index)
+            self._advance()
+
+    def _advance(self):
+        while self._next < len(self.chunks):
+            index = self._next
+            if index in self._from_disk:
+                if index not in self._done:
+                    return
+                self._hash_from_disk(index)
+            else:
+                if index != self._frontier:
+                    self._frontier = index
+                    self._mark = self.sha.copy()
+                    for data in self._buffers.pop(index, []):
+                        self.sha.update(data)
+                        self._buffered -= len(data)
+                if index not in self._done:
+                    return
+            self._next += 1
+
+    def _hash_from_disk(self, index):
+        _, start, end = self.chunks[index]
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining:
+                block = f.read(min(BLOCK_SIZE * 8, remaining))
+                if not block:
+                    raise DownloadError(f"chunk {index} is shorter than expected")
+                self.sha.update(block)
+                remaining -= len(block)
+
+    def hexdigest(self):
+        if self._next != len(self.chunks):
+            raise DownloadError("hash incomplete: not all chunks finished")
+        return self.sha.hexdigest()
+
+
+# ============================================================================
+# Resumable chunked download
+# ============================================================================
+
+class PartialDownload:
+    """A ``.part`` data file plus a ``.part.json`` sidecar listing finished chunks."""
+
+    def __init__(self, dest, url, size, chunk_size):
+        self.dest = dest
+        self.part_path = dest + ".part"
+        self.state_path = dest + ".part.json"
+        self.url = url
+        self.size = size
+        self.chunk_size = chunk_size
+        self.done = set()
+        self._lock = threading.Lock()
+
+        state = self._load_state()
+        if state and os.path.exists(self.part_path):
+            self.done = set(state["done"])
+        else:
+            self._preallocate()
+            self._save_state()
+
+    @property
+    def chunks(self):
+        return [(i, start, min(start + self.chunk_size, self.size) - 1)
+                for i, start in enumerate(range(0, self.size, self.chunk_size))]
+
+    @property
+    def done_bytes(self):
+        return sum(end - start + 1 for i, start, end in self.chunks if i in self.done)
+
+    def _load_state(self):
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # A different upstream file or chunk layout can't be resumed
+        if (state.get("url"), state.get("size"), state.get("chunk_size")) != (self.url, self.size, self.chunk_size):
+            return None
+        return state
+
+    def _save_state(self):
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"url": self.url, "size": self.size, "chunk_size": self.chunk_size,
+                       "done": sorted(self.done)}, f)
+        os.replace(tmp, self.state_path)
 
+    def _preallocate(self):
+        with open(self.part_path, "wb") as f:
+            try:
+                os.posix_fallocate(f.fileno(), 0, self.size)
+            except (AttributeError, OSError):
+                f.truncate(self.size)
+
+    def mark_done(self, index):
+        with self._lock:
+            self.done.add(index)
+            self._save_state()
+
+    def finish(self, target=None):
+        os.replace(self.part_path, target or self.dest)
+        os.remove(self.state_path)
+
+    def discard(self):
+        os.remove(self.part_path)
+        os.remove(self.state_path)
+
+
+# ============================================================================
+# Content-addressed store
+# ============================================================================
+
+FICLONE = 0x40049409  # linux/fs.h
+
+
+def blob_path(store_dir, sha256):
+    return os.path.join(store_dir, "sha256", sha256)
+
+
+def _reflink(src, dest):
+    import fcntl
+    with open(src, "rb") as s, open(dest, "wb") as d:
+        fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+
+
+def materialize(blob, dest):
+    """Make ``dest`` show a store blob: hardlink, else reflink, else symlink. Returns the method."""
+    if os.path.exists(dest) and os.path.samefile(blob, dest):
+        return "existing"
+    tmp = f"{dest}.link.tmp"
+    for method, make in (("hardlink", os.link), ("reflink", _reflink), ("symlink", os.symlink)):
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+        try:
+            make(blob, tmp)
+        except (OSError, ImportError):
+            continue
+        os.replace(tmp, dest)
+        return method
+    raise DownloadError(f"could not link {dest} to {blob}")
+
+
+def add_to_store(path, sha256, store_dir):
+    """Move a verified file into the store, or drop it if an intact blob is already there."""
+    blob = blob_path(store_dir, sha256)
+    os.makedirs(os.path.dirname(blob), exist_ok=True)
+    if os.path.exists(blob):
+        if os.path.samefile(path, blob):
+            return blob
+        if os.path.getsize(blob) == os.path.getsize(path) and hash_file(blob) == sha256:
+            os.remove(path)
+            return blob
+        # The blob was damaged in place: the freshly verified file replaces it
+        log(f"⚠️ Store blob {sha256[:12]}… is corrupt, replacing it")
+        os.chmod(blob, 0o644)  # read-only files can't be replaced on Windows
     try:
-        response = requests.get(url, stream=True, headers=headers)
+        os.replace(path, blob)
+    except OSError:
+        # Store on another filesystem
+        shutil.copyfile(path, blob + ".tmp")
+        os.replace(blob + ".tmp", blob)
+        os.remove(path)
+    # Blobs are shared by every hardlink, so keep them from being modified in place
+    os.chmod(blob, 0o444)
+    return blob
+
+
+def _link_from_store(store_dir, sha256, size, dest):
+    """Materialize ``dest`` from an existing blob. Returns the method used, or None."""
+    if not sha256:
+        return None
+    blob = blob_path(store_dir, sha256)
+    if not os.path.exists(blob) or (size and os.path.getsize(blob) != size):
+        return None
+    return materialize(blob, dest)
+
+
+def _fetch_chunk(session, part, fd, index, start, end, on_bytes, hasher):
+    headers = {**auth_headers(part.url), "Range": f"bytes={start}-{end}"}
+    last_error = None
+    for attempt in range(RETRIES):
+        offset = start
+        hasher.start(index)
+        out = None
+        try:
+            if not hasattr(os, "pwrite"):
+                # No pwrite on Windows: every attempt writes through its own handle
+                out = open(part.part_path, "r+b")
+                out.seek(start)
+            with session.get(part.url, headers=headers, stream=True, timeout=TIMEOUT) as response:
+                response.raise_for_status()
+                if response.status_code != 206:
+                    raise DownloadError(f"server ignored Range request (HTTP {response.status_code})")
+                for data in response.iter_content(BLOCK_SIZE):
+                    if out is None:
+                        os.pwrite(fd, data, offset)
+                    else:
+                        out.write(data)
+                    hasher.feed(index, data)
+                    offset += len(data)
+                    on_bytes(len(data))
+            if out is not None:
+                out.close()  # flushed before the chunk is recorded as done
+            if offset != end + 1:
+                raise DownloadError(f"chunk {index} ended early at byte {offset}")
+            part.mark_done(index)
+            hasher.chunk_done(index)
+            return
+        except requests.exceptions.HTTPError as err:
+            if err.response is not None and err.response.status_code in (401, 403, 404):
+                raise
+            last_error = err
+        except (requests.exceptions.RequestException, DownloadError) as err:
+            last_error = err
+        finally:
+            if out is not None:
+                out.close()
+        on_bytes(start - offset)  # un-count the bytes of the failed attempt
+    raise DownloadError(f"chunk {index} failed after {RETRIES} attempts: {last_error}")
+
+
+class _Progress:
+    """Thread-safe byte counter printing every 10% and reporting to an optional callback."""
+
+    def __init__(self, name, total, already=0, callback=None):
+        self.name = name
+        self.total = total
+        self.downloaded = already
+        self.last_print = int(already / total * 100) // 10 * 10 if total else 0
+        self.callback = callback
+        self._lock = threading.Lock()
+        if callback:
+            callback(already, total)
+
+    def __call__(self, n):
+        with self._lock:
+            self.downloaded += n
+            if self.callback:
+                self.callback(self.downloaded, self.total)
+            if self.total > 0:
+                percent = int(self.downloaded / self.total * 100)
+                if percent >= self.last_print + 10:
+                    log(f"   ...{self.name}: {percent}% ({self.downloaded / (1024*1024):.2f} MB)")
+                    self.last_print = percent
+
+
+def _download_stream(session, url, dest, progress):
+    """Single-connection fallback for servers without Range support. Returns the sha256."""
+    tmp = dest + ".part"
+    sha = hashlib.sha256()
+    with session.get(url, headers=auth_headers(url), stream=True, timeout=TIMEOUT) as response:
         response.raise_for_status()
-        
-        total_size = int(response.headers.get('content-length', 0))
-        block_size = 1024 # 1 Kibibyte
-        
-        os.makedirs(os.path.dirname(dest), exist_ok=True)
-        
-        print(f"   Total size: {total_size / (1024*1024):.2f} MB")
-        
-        downloaded = 0
-        last_print = 0
-        with open(dest, 'wb') as file:
-            for data in response.iter_content(block_size):
-                size = file.write(data)
-                downloaded += size
-                if total_size > 0:
-                    percent = int(downloaded / total_size * 100)
-                    if percent >= last_print + 10: # Print every 10%
-                        print(f"   ...{percent}% ({downloaded / (1024*1024):.2f} MB)")
-                        last_print = percent
-        print(f"✓ {name} downloaded successfully.")
-        
-    except requests.exceptions.HTTPError as err:
-        if err.response.status_code == 401:
-             print(f"❌ Error downloading {name}: 401 Unauthorized. Please check if this model requires an HF_TOKEN.")
-        elif err.response.status_code == 403:
-             print(f"❌ Error downloading {name}: 403 Forbidden. You may not have access to this model.")
+        with open(tmp, "wb") as file:
+            for data in response.iter_content(BLOCK_SIZE):
+                file.write(data)
+                sha.update(data)
+                progress(len(data))
+    return tmp, sha.hexdigest()
+
+
+def download_file(url, dest, name, session=None, connections=None, chunk_size=None,
+                  manifest=None, sha256=None, full_verify=False, store_dir=None, progress_callback=None):
+    connections = connections or CONNECTIONS
+    chunk_size = chunk_size or CHUNK_SIZE
+    dest = os.path.abspath(dest)
+    # Models live directly in the workspace, so its store sits next to them
+    store_dir = store_dir or model_store_dir(os.path.dirname(dest))
+    filename = os.path.basename(dest)
+    manifest = manifest or load_manifest(os.path.join(os.path.dirname(dest), MANIFEST_FILENAME))
+    store_index = load_manifest(os.path.join(store_dir, "index.json"))
+    entry = dict(store_index.get(url))
+    entry.update(manifest.get(filename))
+    if sha256:
+        entry["sha256"] = sha256
+
+    session = session or make_session(connections)
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    incoming = os.path.join(store_dir, "incoming")
+    os.makedirs(incoming, exist_ok=True)
+
+    def record(digest, how):
+        st = os.stat(dest)
+        manifest.update(filename, url=url, size=st.st_size, sha256=digest, mtime_ns=st.st_mtime_ns)
+        if digest:
+            store_index.update(url, size=st.st_size, sha256=digest)
+        log(f"✓ {name} {how}")
+
+    try:
+        if os.path.exists(dest):
+            if not entry.get("size"):
+                # Not verified before (e.g. fetched by an older version): learn size/hash upstream
+                try:
+                    info = probe(session, url)
+                    entry.update(size=info["size"], sha256=entry.get("sha256") or info["sha256"])
+                except requests.exceptions.RequestException as err:
+                    # Offline: the local header check still catches truncated files
+                    log(f"⚠️ Could not reach {name} upstream ({err}); checking the local file only")
+            ok, reason, digest = verify_file(dest, entry, full=full_verify)
+            if ok:
+                digest = digest or entry.get("sha256")
+                if digest and not os.path.islink(dest):
+                    # Adopt the file into the store so other workspaces can link to it
+                    materialize(add_to_store(dest, digest, store_dir), dest)
+                record(digest, f"already exists at {dest} ({reason})")
+                return
+            log(f"⚠️ {name} failed verification ({reason}). Re-downloading...")
+            os.remove(dest)
+
+        # The same content may already be in the store under another path
+        how = _link_from_store(store_dir, entry.get("sha256"), entry.get("size"), dest)
+        if how:
+            record(entry["sha256"], f"linked from model store ({how})")
+            return
+
+        info = probe(session, url)
+        expected_sha = entry.get("sha256") or info["sha256"]
+        if entry.get("size") and info["size"] and entry["size"] != info["size"]:
+            # Upstream file changed; the recorded checksum no longer applies
+            expected_sha = sha256 or info["sha256"]
+        total_size = info["size"]
+
+        how = _link_from_store(store_dir, expected_sha, total_size, dest)
+        if how:
+            record(expected_sha, f"linked from model store ({how})")
+            return
+
+        # Download next to the store so the finished file can be renamed into it
+        staging = os.path.join(incoming, filename)
+        part = None
+        if not info["ranges"] or total_size <= 0:
+            log(f"⬇️  Downloading {name} (single stream)...")
+            tmp, digest = _download_stream(session, url, staging, _Progress(name, total_size, 0, progress_callback))
         else:
-             print(f"❌ Error downloading {name}: {err}")
-        sys.exit(1)
+            part = PartialDownload(staging, url, total_size, chunk_size)
+            pending = [c for c in part.chunks if c[0] not in part.done]
+            resumed = part.done_bytes
+            if resumed:
+                log(f"⬇️  Resuming {name} at {resumed / (1024*1024):.2f} of {total_size / (1024*1024):.2f} MB...")
+            else:
+                log(f"⬇️  Downloading {name}...")
+                log(f"   Total size: {total_size / (1024*1024):.2f} MB")
+
+            # Chunks finished by an earlier session are hashed from disk, the rest as they stream in
+            hasher = _StreamHasher(part.part_path, part.chunks, done=part.done)
+            progress = _Progress(name, total_size, resumed, progress_callback)
+            fd = os.open(part.part_path, os.O_WRONLY | getattr(os, "O_BINARY", 0))
+            try:
+                with ThreadPoolExecutor(max_workers=connections) as pool:
+                    futures = [pool.submit(_fetch_chunk, session, part, fd, *chunk, progress, hasher)
+                               for chunk in pending]
+                    try:
+                        for future in as_completed(futures):
+                            future.result()
+                    except BaseException:
+                        # Finished chunks are already recorded; the rest resumes next time
+                        for future in futures:
+                            future.cancel()
+                        raise
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            digest = hasher.hexdigest()
+
+        if expected_sha and digest != expected_sha:
+            if part:
+                part.discard()
+            else:
+                os.remove(tmp)
+            raise DownloadError(f"checksum mismatch (got {digest}, expected {expected_sha})")
+        if part:
+            part.finish()
+        else:
+            os.replace(tmp, staging)
+
+        how = materialize(add_to_store(staging, digest, store_dir), dest)
+        record(digest, f"downloaded successfully (sha256 {digest[:12]}…, {how}).")
+
+    except requests.exceptions.HTTPError as err:
+        status = err.response.status_code if err.response is not None else None
+        if status == 401:
+            raise DownloadError(f"Error downloading {name}: 401 Unauthorized. Please check if this model requires an HF_TOKEN.")
+        elif status == 403:
+            raise DownloadError(f"Error downloading {name}: 403 Forbidden. You may not have access to this model.")
+        raise DownloadError(f"Error downloading {name}: {err}")
     except Exception as e:
-        print(f"❌ An error occurred while downloading {name}: {e}")
-        sys.exit(1)
+        raise DownloadError(f"An error occurred while downloading {name}: {e}")
+
+
+def verify_all(models=MODELS, workspace_dir=WORKSPACE_DIR, full=False):
+    """Verify downloaded models against the manifest without touching the network."""
+    manifest = load_manifest(os.path.join(workspace_dir, MANIFEST_FILENAME))
+    failures = []
+    for model in models:
+        path = os.path.join(workspace_dir, model["filename"])
+        entry = dict(manifest.get(model["filename"]))
+        if model.get("sha256"):
+            entry["sha256"] = model["sha256"]
+        ok, reason, digest = verify_file(path, entry, full=full)
+        if ok:
+            if digest:
+                manifest.update(model["filename"], sha256=digest, mtime_ns=os.stat(path).st_mtime_ns)
+            log(f"✓ {model['name']}: {reason}")
+        else:
+            log(f"❌ {model['name']}: {reason}")
+            failures.append(model["name"])
+    return failures
+
+
+def download_all(models=MODELS, workspace_dir=WORKSPACE_DIR, session=None, full_verify=False, store_dir=None):
+    """Download every model concurrently. Returns a list of error messages."""
+    session = session or make_session()
+    workspace_dir = os.path.abspath(workspace_dir)
+    store_dir = store_dir or model_store_dir(workspace_dir)
+    manifest = load_manifest(os.path.join(workspace_dir, MANIFEST_FILENAME))
+    errors = []
+    with ThreadPoolExecutor(max_workers=max(1, len(models))) as pool:
+        futures = {
+            pool.submit(download_file, model["url"], os.path.join(workspace_dir, model["filename"]),
+                        model["name"], session, manifest=manifest, sha256=model.get("sha256"),
+                        full_verify=full_verify, store_dir=store_dir): model
+            for model in models
+        }
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except DownloadError as e:
+                log(f"❌ {e}")
+                errors.append(str(e))
+    return errors
+
 
 def main():
     print("=========================================================================")
     print("===                  MODEL DOWNLOADER                                 ===")
     print("=========================================================================")
     print(f"Workspace Directory: {WORKSPACE_DIR}")
-    
+    print(f"Model Store:         {MODEL_STORE_DIR}")
+
     # Ensure workspace directory exists
     os.makedirs(WORKSPACE_DIR, exist_ok=True)
-    
-    for model in MODELS:
-        dest_path = os.path.join(WORKSPACE_DIR, model["filename"])
-        download_file(model["url"], dest_path, model["name"])
-        
+
+    # --verify: only check what is on disk, download nothing
+    # --full: re-hash every file instead of trusting unchanged mtimes
+    full = "--full" in sys.argv
+    if "--verify" in sys.argv:
+        if verify_all(full=full):
+            sys.exit(1)
+        print("\n✓ All models verified.")
+        return
+
+    if download_all(full_verify=full):
+        sys.exit(1)
+
     print("\n✓ All models processed.")
 
 if __name__ == "__main__":
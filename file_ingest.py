@@ -0,0 +1,161 @@
+"""
+📥 File Ingest
+Bring uploaded files into a dataset without copying their bytes when possible.
+
+Gradio stores uploads in its temp directory, usually on the same volume as
+the workspace. There a hard link (or a rename, for files the caller no
+longer needs) costs one metadata update instead of rewriting the file.
+Across filesystems the data is copied in the kernel with
+``copy_file_range`` (which can reflink or copy server-side) or ``sendfile``,
+in a thread pool. Every file appears in the dataset atomically, so a
+half-copied image is never indexed.
+"""
+
+import errno
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# ============================================================================
+# Configuration
+# ============================================================================
+
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", 4))
+COPY_CHUNK_SIZE = 64 * 1024 * 1024
+
+# Errors meaning "this mechanism doesn't work here", not "the copy failed"
+_UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP,
+                errno.EPERM, errno.EMLINK, errno.ETXTBSY}
+
+
+# ============================================================================
+# Single Files
+# ============================================================================
+
+def tmp_path(dst):
+    """Hidden temporary name next to ``dst``; dataset indexes ignore it."""
+    directory, name = os.path.split(dst)
+    return os.path.join(directory, f".{name}.{os.getpid()}.tmp")
+
+
+def _copy_kernel(src, dst):
+    """Copy inside the kernel; returns the method used."""
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        for method in ("copy_file_range", "sendfile"):
+            func = getattr(os, method, None)
+            if func is None:
+                continue
+            try:
+                offset = 0
+                while offset < size:
+                    if method == "copy_file_range":
+                        sent = func(fsrc.fileno(), fdst.fileno(), min(COPY_CHUNK_SIZE, size - offset))
+                    else:
+                        sent = func(fdst.fileno(), fsrc.fileno(), offset, min(COPY_CHUNK_SIZE, size - offset))
+                    if sent == 0:
+                        break
+                    offset += sent
+                if offset == size:
+                    return method
+            except OSError as e:
+                if e.errno not in _UNSUPPORTED or offset:
+                    raise
+            # Nothing was written yet; try the next mechanism from the start
+            fsrc.seek(0)
+            fdst.seek(0)
+            fdst.truncate()
+        shutil.copyfileobj(fsrc, fdst, COPY_CHUNK_SIZE)
+        return "copy"
+
+
+def ingest_file(src, dst, move=False):
+    """Place ``src`` at ``dst`` (replacing it) and return the method used.
+
+    Tries a hard link, then a rename if ``move`` allows consuming ``src``,
+    then an in-kernel copy.
+    """
+    tmp = tmp_path(dst)
+    try:
+        try:
+            os.link(src, tmp)
+            method = "hardlink"
+        except OSError as e:
+            if e.errno == errno.EEXIST:
+                os.remove(tmp)
+                return ingest_file(src, dst, move)
+            if e.errno not in _UNSUPPORTED:
+                raise
+            method = None
+            if move:
+                try:
+                    os.rename(src, tmp)
+                    method = "rename"
+                except OSError as e:
+                    if e.errno not in _UNSUPPORTED:
+                        raise
+            if method is None:
+                method = _copy_kernel(src, tmp)
+                shutil.copymode(src, tmp)
+        os.replace(tmp, dst)
+        return method
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+# ============================================================================
+# Batches
+# ============================================================================
+
+def _same_device(src, dst_dir):
+    try:
+        return os.stat(src).st_dev == os.stat(dst_dir).st_dev
+    except OSError:
+        return False
+
+
+def ingest_files(pairs, move=False, on_progress=None, workers=INGEST_WORKERS):
+    """Ingest ``[(src, dst), ...]``; returns ``({method: count}, [(src, error), ...])``.
+
+    Files on the destination's volume are linked inline (instant); the rest
+    are copied in a thread pool. ``on_progress(done, total, dst)`` is called
+    after every file.
+    """
+    counts = {}
+    failed = []
+    total = len(pairs)
+    done = 0
+
+    def finish(src, dst, method, error):
+        nonlocal done
+        done += 1
+        if error is None:
+            counts[method] = counts.get(method, 0) + 1
+        else:
+            failed.append((src, error))
+        if on_progress:
+            on_progress(done, total, dst)
+
+    def run(src, dst):
+        try:
+            return ingest_file(src, dst, move), None
+        except OSError as e:
+            return None, str(e)
+
+    local, remote = [], []
+    for src, dst in pairs:
+        (local if _same_device(src, os.path.dirname(dst) or ".") else remote).append((src, dst))
+
+    for src, dst in local:
+        finish(src, dst, *run(src, dst))
+
+    if remote:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(remote)))) as executor:
+            futures = {executor.submit(run, src, dst): (src, dst) for src, dst in remote}
+            for future in as_completed(futures):
+                finish(*futures[future], *future.result())
+    return counts, failed
@@ -0,0 +1,88 @@
+"""
+🎮 GPUs
+Discovery of the GPUs visible to this host, through ``nvidia-smi``.
+
+``NVIDIA_SMI`` can point at a stub script printing the same CSV (repeatedly
+when called with ``--loop-ms``, as the metrics sampler does), which is how
+the multi-GPU scheduler is exercised on machines without GPUs.
+"""
+
+import os
+import subprocess
+from collections import namedtuple
+
+# ============================================================================
+# Configuration
+# ============================================================================
+
+NVIDIA_SMI = os.environ.get("NVIDIA_SMI", "nvidia-smi")
+
+# A GPU with less free memory than this is considered busy (e.g. used by
+# another process) and gets no new training job.
+GPU_MIN_FREE_MB = int(os.environ.get("GPU_MIN_FREE_MB", 2048))
+
+QUERY_FIELDS = "index,name,memory.total,memory.used,memory.free,utilization.gpu,temperature.gpu"
+
+GPU = namedtuple("GPU", ["index", "name", "memory_total", "memory_used", "memory_free",
+                         "utilization", "temperature"])
+
+
+# ============================================================================
+# Discovery
+# ============================================================================
+
+def _number(text, cast=float):
+    try:
+        return cast(text)
+    except ValueError:
+        return None  # "[N/A]" on some cards
+
+
+def parse_gpus(output):
+    """Parse ``nvidia-smi --query-gpu=QUERY_FIELDS --format=csv,noheader,nounits`` output."""
+    gpus = []
+    for line in output.splitlines():
+        parts = [p.strip() for p in line.split(",")]
+        if len(parts) < 7:
+            continue
+        gpus.append(GPU(parts[0], parts[1], _number(parts[2]), _number(parts[3]), _number(parts[4]),
+                        _number(parts[5], int), _number(parts[6], int)))
+    return gpus
+
+
+def visible_gpus(gpus):
+    """Restrict to CUDA_VISIBLE_DEVICES if this process was started with one."""
+    visible = os.environ.get("CUDA_VISIBLE_DEVICES")
+    if visible is None:
+        return gpus
+    allowed = {v.strip() for v in visible.split(",") if v.strip()}
+    return [g for g in gpus if g.index in allowed]
+
+
+def query_gpus(timeout=5):
+    """Return the visible GPUs, or an empty list if nvidia-smi isn't available."""
+    try:
+        result = subprocess.run(
+            [NVIDIA_SMI, f"--query-gpu={QUERY_FIELDS}", "--format=csv,noheader,nounits"],
+            capture_output=True, text=True, timeout=timeout
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return []
+    if result.returncode != 0:
+        return []
+    return visible_gpus(parse_gpus(result.stdout))
+
+
+def free_gpus(min_free_mb=None, gpus=None):
+    """Indices of the GPUs with at least ``min_free_mb`` MB free.
+
+    ``gpus`` defaults to a fresh ``query_gpus()``. Returns None (rather than
+    an empty list) when no GPU could be found at all, so callers can fall
+    back to running without device pinning.
+    """
+    if gpus is None:
+        gpus = query_gpus()
+    if not gpus:
+        return None
+    min_free_mb = GPU_MIN_FREE_MB if min_free_mb is None else min_free_mb
+    return [g.index for g in gpus if g.memory_free is None or g.memory_free >= min_free_mb]
@@ -1,7 +1,7 @@
 import gradio as gr
+import uvicorn
 import os
 import sys
-import shutil
 import subprocess
 import threading
 import time
@@ -17,6 +17,20 @@ from datetime import datetime
 CURRENT_DIR = Path(__file__).parent.absolute()
 WORKSPACE_ROOT = os.environ.get("DATA_DIRECTORY", str(CURRENT_DIR.parent))
 
+# Shared helpers live next to gradio_ui.py in the repository root
+sys.path.insert(0, str(CURRENT_DIR.parent))
+import archive_import
+import dataset_index
+import file_ingest
+import metrics_export
+import model_prefetch
+import run_dirs
+import system_metrics
+import thumbnails
+from download_models import DownloadError
+from training_logs import APPEND_LOG_JS, LogBuffer, LogWriter, log_delta
+from training_progress import ProgressTracker
+
 # Define paths
 PATHS = {
     "workspace": WORKSPACE_ROOT,
@@ -24,9 +38,13 @@ PATHS = {
     "output": os.path.join(WORKSPACE_ROOT, "output"),
     "logs": os.path.join(WORKSPACE_ROOT, "logs"),
     "sd_scripts": os.path.join(WORKSPACE_ROOT, "sd-scripts"),
-    "config": os.path.join(WORKSPACE_ROOT, "lora_config.toml"),
+    "thumbnails": os.path.join(WORKSPACE_ROOT, "cache", "thumbnails"),
 }
 
+GALLERY_PAGE_SIZE = int(os.environ.get("GALLERY_PAGE_SIZE", 100))
+LOG_STREAM_INTERVAL = float(os.environ.get("LOG_STREAM_INTERVAL", 1.0))
+MODEL_STATUS_INTERVAL = 2.0
+
 # Ensure directories exist
 for p in [PATHS["datasets"], PATHS["output"], PATHS["logs"]]:
     os.makedirs(p, exist_ok=True)
@@ -34,40 +52,58 @@ for p in [PATHS["datasets"], PATHS["output"], PATHS["logs"]]:
 # Global State
 state = {
     "is_training": False,
-    "training_log": "",
+    "training_log": LogBuffer(),
+    "progress": ProgressTracker(),
     "process": None,
-    "current_lora_name": ""
+    "current_lora_name": "",
+    "run": None,  # the cancel event of the run that owns the fields above
+    "log_writer": None,  # that run's log file
 }
+run_lock = threading.Lock()
 
 # ============================================================================
 # Logic: System & Monitoring
 # ============================================================================
 
 def get_system_status():
-    """Get a quick summary of system status."""
+    """Get a quick summary of system status from the shared metrics sampler."""
+    sampler = system_metrics.get_sampler(PATHS["workspace"])
+    sample = sampler.latest()
+    
     # GPU Check
-    gpu_status = "Unknown"
+    gpu_status = "Unknown" if sampler.source else "No NVIDIA GPU found"
     gpu_memory = "0/0 MB"
-    try:
-        result = subprocess.run(
-            ["nvidia-smi", "--query-gpu=name,memory.used,memory.total", "--format=csv,noheader,nounits"],
-            capture_output=True, text=True, timeout=2
-        )
-        if result.returncode == 0:
-            name, used, total = result.stdout.strip().split(", ")
-            gpu_status = name
-            gpu_memory = f"{float(used):.0f}/{float(total):.0f} MB"
-    except FileNotFoundError:
-        gpu_status = "No NVIDIA GPU found"
-    except Exception:
-        pass
+    gpu_list = sampler.current_gpus()
+    if gpu_list:
+        gpu_status = gpu_list[0].name if len(gpu_list) == 1 else f"{len(gpu_list)}× {gpu_list[0].name}"
+        used = sum(g.memory_used or 0 for g in gpu_list)
+        total = sum(g.memory_total or 0 for g in gpu_list)
+        gpu_memory = f"{used:.0f}/{total:.0f} MB"
 
     # Disk Check
-    total, used, free = shutil.disk_usage(PATHS["workspace"])
-    disk_usage = f"{used/1024**3:.1f}/{total/1024**3:.1f} GB"
+    disk_usage = "Unknown"
+    if sample and sample.disk_total:
+        disk_usage = f"{sample.disk_used/1024**3:.1f}/{sample.disk_total/1024**3:.1f} GB"
 
     return gpu_status, gpu_memory, disk_usage
 
+def render_stat_cards():
+    """HTML for the three dashboard cards."""
+    gpu_name, gpu_mem, disk_usage = get_system_status()
+    if state["is_training"]:
+        active, detail = state["current_lora_name"], state["progress"].summary() or "Starting..."
+    else:
+        active, detail = "None", "Ready to start"
+    cards = [("GPU Status", gpu_name, gpu_mem), ("Disk Usage", disk_usage, "Workspace Storage"),
+             ("Active Training", active, detail)]
+    return [f"""
+            <div class="stat-card">
+                <div class="stat-label">{label}</div>
+                <div class="stat-value">{value}</div>
+                <div style="color: #6b7280; font-size: 0.875rem; margin-top: 4px;">{note}</div>
+            </div>
+            """ for label, value, note in cards]
+
 def get_training_status_ui():
     """Return status for UI indicators."""
     if state["is_training"]:
@@ -80,15 +116,7 @@ def get_training_status_ui():
 
 def get_datasets():
     """List available datasets."""
-    if not os.path.exists(PATHS["datasets"]):
-        return []
-    datasets = []
-    for name in os.listdir(PATHS["datasets"]):
-        path = os.path.join(PATHS["datasets"], name)
-        if os.path.isdir(path):
-            images = list(Path(path).glob("*.[jp][pn][g]*")) # simple glob for jpg, png, jpeg
-            datasets.append(f"{name} ({len(images)} images)")
-    return datasets
+    return [f"{name} ({count} images)" for name, count in dataset_index.list_datasets(PATHS["datasets"])]
 
 def create_dataset(name):
     if not name.strip():
@@ -103,35 +131,59 @@ def create_dataset(name):
     os.makedirs(path)
     return gr.update(choices=get_datasets(), value=f"{folder_name} (0 images)"), f"✅ Created {folder_name}"
 
-def upload_files(dataset_str, files):
+def upload_files(dataset_str, files, progress=gr.Progress()):
     if not dataset_str:
-        return "❌ Select a dataset first"
+        return "❌ Select a dataset first", gr.update()
+    if not files:
+        return "❌ No files selected", gr.update()
     
     dataset_name = dataset_str.split(" (")[0]
     path = os.path.join(PATHS["datasets"], dataset_name)
     
-    count = 0
-    for file in files:
-        shutil.copy(file.name, path)
-        count += 1
-        
-    return f"✅ Uploaded {count} files to {dataset_name}"
+    # Hard link (or move) out of Gradio's temp dir instead of copying when possible
+    archives = [file.name for file in files if archive_import.is_archive(file.name)]
+    pairs = [(file.name, os.path.join(path, os.path.basename(file.name)))
+             for file in files if file.name not in archives]
+    counts, failed = file_ingest.ingest_files(
+        pairs, move=True,
+        on_progress=lambda done, total, dst: progress((done, total), desc=os.path.basename(dst), unit="files")
+    )
+    uploaded = sum(counts.values())
+    
+    # Archives are streamed entry by entry straight into the dataset
+    for archive in archives:
+        try:
+            result = archive_import.import_archive(
+                archive, path,
+                on_progress=lambda done, total: progress((done, total), desc=os.path.basename(archive), unit="bytes")
+            )
+        except ValueError as e:
+            failed.append((archive, str(e)))
+            continue
+        uploaded += result.images + result.captions
+        failed += result.errors
+    
+    msg = f"✅ Uploaded {uploaded} files to {dataset_name}"
+    if failed:
+        msg += f" · ❌ {len(failed)} failed: " + ", ".join(os.path.basename(src) for src, _ in failed[:5])
+    return msg, None
 
-def get_dataset_gallery(dataset_str):
+def get_dataset_gallery(dataset_str, search="", page=1):
     if not dataset_str:
-        return []
+        return [], ""
     dataset_name = dataset_str.split(" (")[0]
     path = Path(PATHS["datasets"]) / dataset_name
-    images = []
-    for ext in ["*.png", "*.jpg", "*.jpeg", "*.webp"]:
-        images.extend(path.glob(ext))
-    return [str(p) for p in images]
+    if not path.exists():
+        return [], ""
+    images, page, pages, total = dataset_index.get_index(path).page(page, GALLERY_PAGE_SIZE, search)
+    return thumbnails.get_thumbnails(images, PATHS["thumbnails"]), f"Page {page} / {pages} · {total} images"
 
 # ============================================================================
 # Logic: Training
 # ============================================================================
 
-def generate_command(dataset_name, lora_name, steps, resolution, batch_size, lr):
+def generate_command(dataset_name, lora_name, steps, resolution, batch_size, lr, config_path):
+    """Return ``(toml, cmd)`` for a run whose dataset config will live at ``config_path``."""
     dataset_path = os.path.join(PATHS["datasets"], dataset_name)
     output_path = os.path.join(PATHS["output"], lora_name)
     
@@ -146,8 +198,6 @@ flip_aug = false
   image_dir = '{dataset_path}'
   num_repeats = 10
 """
-    with open(PATHS["config"], "w") as f:
-        f.write(toml)
 
     # Command construction (simplified for readability)
     # Note: Using python directly instead of accelerate launch for simplicity if needed, 
@@ -159,7 +209,7 @@ flip_aug = false
 --model_type chroma \
 --t5xxl "{os.path.join(PATHS['workspace'], 't5xxl_fp16.safetensors')}" \
 --ae "{os.path.join(PATHS['workspace'], 'ae.safetensors')}" \
---dataset_config "{PATHS['config']}" \
+--dataset_config "{config_path}" \
 --output_dir "{output_path}" \
 --output_name "{lora_name}" \
 --max_train_steps {steps} \
@@ -176,7 +226,7 @@ flip_aug = false
     # Note: The original command had many more flags. I'm keeping the core ones. 
     # Ideally we should use the exact same command as the original script to ensure same results.
     # I will revert to a more complete command structure similar to the original to be safe.
-    return cmd
+    return toml, cmd
 
 def run_training(dataset_str, lora_name, steps, resolution, batch_size, lr):
     global state
@@ -195,44 +245,121 @@ def run_training(dataset_str, lora_name, steps, resolution, batch_size, lr):
     # For now, let's just simulate or call the original logic if we imported it, 
     # but since we want a "fresh" file, I'll copy the essential parts of the command.
     
-    cmd = generate_command(dataset_name, lora_name, steps, resolution, batch_size, lr)
+    # Each run gets its own directory with config, command, log and meta.json
+    run_id = run_dirs.new_run_id()
+    run_dir = run_dirs.run_dir(PATHS["workspace"], run_id)
+    toml, cmd = generate_command(dataset_name, lora_name, steps, resolution, batch_size, lr,
+                                 os.path.join(run_dir, run_dirs.CONFIG_FILENAME))
     
     # Adjust command for Windows/Vast.ai environment
     # If sd-scripts is in a specific place, we need to cd there.
     full_cmd = f"cd {PATHS['sd_scripts']} && {cmd}"
     
-    state["is_training"] = True
-    state["training_log"] = f"🚀 Starting training for {lora_name}...\n"
+    spec = {"dataset": dataset_name, "lora_name": lora_name, "steps": steps,
+            "resolution": resolution, "batch_size": batch_size, "learning_rate": lr}
+    run_dirs.create_run_dir(run_dir, toml, full_cmd, {"id": run_id, "ui": "gradio_new", "spec": spec, "state": "running"})
+    log_path = os.path.join(run_dir, run_dirs.LOG_FILENAME)
+    log_writer = LogWriter(log_path, mode="w")
+    run_dirs.link_latest_log(log_path, os.path.join(PATHS["logs"], "training.log"))
+    
+    # Each run gets its own cancel event; a stopped run that is still winding
+    # down must not touch the state of the run started after it
+    cancel = threading.Event()
+    with run_lock:
+        state["run"] = cancel
+        state["log_writer"] = log_writer
+        state["is_training"] = True
+        state["process"] = None
+    state["training_log"].clear()
+    state["training_log"].append(f"🚀 Starting training for {lora_name}...\n")
+    state["progress"].reset()
     state["current_lora_name"] = lora_name
     
+    def log(text):
+        if state["run"] is cancel:
+            state["training_log"].append(text)
+        log_writer.write(text if text.endswith("\n") else text + "\n")
+
     def target():
+        returncode = None
+        error = ""
+        run_dirs.update_meta(run_dir, started=time.time())
         try:
-            state["process"] = subprocess.Popen(
-                full_cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
-            )
-            for line in iter(state["process"].stdout.readline, ''):
-                state["training_log"] += line
-            state["process"].wait()
-            state["training_log"] += "\n✅ Training completed."
+            # The TOML and command are ready; only wait for models still downloading
+            model_prefetch.get_prefetch(PATHS["workspace"]).wait_for(on_wait=log, cancel=cancel)
+            with run_lock:
+                if cancel.is_set():
+                    return  # stopped while waiting for the models
+                process = state["process"] = subprocess.Popen(
+                    full_cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+                )
+            for line in iter(process.stdout.readline, ''):
+                log(line)
+                if state["run"] is cancel:
+                    state["progress"].feed(line)
+            returncode = process.wait()
+            log("\n✅ Training completed.")
+        except DownloadError as e:
+            error = str(e)
+            log(f"\n❌ Model download failed: {e}")
         except Exception as e:
-            state["training_log"] += f"\n❌ Error: {e}"
+            error = str(e)
+            log(f"\n❌ Error: {e}")
         finally:
-            state["is_training"] = False
-            state["process"] = None
+            with run_lock:
+                if state["run"] is cancel:
+                    state["run"] = None
+                    state["log_writer"] = None
+                    state["is_training"] = False
+                    state["process"] = None
+            log_writer.close()
+            if log_writer.error:
+                error = error or f"log file incomplete: {log_writer.error}"
+            outcome = "cancelled" if cancel.is_set() else "done" if returncode == 0 else "failed"
+            run_dirs.update_meta(run_dir, state=outcome, finished=time.time(), returncode=returncode, error=error)
 
     threading.Thread(target=target, daemon=True).start()
-    return "🚀 Training started", state["training_log"]
+    return "🚀 Training started", state["training_log"].text()
 
 def stop_training():
-    if state["process"]:
-        state["process"].terminate() # Or kill()
+    with run_lock:
+        if not state["is_training"]:
+            return "⚠️ No training running"
+        state["run"].set()
+        if state["process"]:
+            state["process"].terminate() # Or kill()
         state["is_training"] = False
-        state["training_log"] += "\n🛑 Training stopped by user."
-        return "🛑 Stopped"
-    return "⚠️ No training running"
+        state["process"] = None
+        if state["log_writer"]:
+            state["log_writer"].write("\n🛑 Training stopped by user.\n")
+    state["training_log"].append("\n🛑 Training stopped by user.")
+    return "🛑 Stopped"
 
 def get_logs():
-    return state["training_log"]
+    return state["training_log"].text()
+
+def stream_logs(last_seen):
+    """Timer tick: send this tab the log lines added since its last update (appended in the browser)."""
+    delta, seen = log_delta(state["training_log"], None, last_seen)
+    if delta is None:
+        return gr.update(), gr.update(), last_seen
+    return delta, state["progress"].summary(), seen
+
+# ============================================================================
+# Metrics Endpoint
+# ============================================================================
+
+def render_metrics():
+    """Prometheus exposition of the in-memory training, download and host state."""
+    writer = metrics_export.MetricsWriter()
+    writer.add("training_running_jobs", int(state["is_training"]), "Jobs currently training.")
+    if state["is_training"]:
+        writer.add("training_running", 1, "1 while the job is training.", lora=state["current_lora_name"])
+        metrics_export.add_progress(writer, state["progress"], lora=state["current_lora_name"])
+    metrics_export.add_prefetch(writer, model_prefetch.get_prefetch(PATHS["workspace"]))
+    metrics_export.add_host(writer, system_metrics.get_sampler(PATHS["workspace"]))
+    metrics_export.add_datasets(writer, PATHS["datasets"])
+    return writer.render()
 
 # ============================================================================
 # UI Construction
@@ -292,31 +419,18 @@ with gr.Blocks(theme=theme, css=css, title="Chroma Trainer") as app:
 
     # Stats Section
     with gr.Row(elem_classes="stats-row"):
-        gpu_name, gpu_mem, disk_usage = get_system_status()
+        gpu_card, disk_card, training_card = render_stat_cards()
         with gr.Column():
-            gr.HTML(f"""
-            <div class="stat-card">
-                <div class="stat-label">GPU Status</div>
-                <div class="stat-value">{gpu_name}</div>
-                <div style="color: #6b7280; font-size: 0.875rem; margin-top: 4px;">{gpu_mem}</div>
-            </div>
-            """)
+            gpu_card_html = gr.HTML(gpu_card)
         with gr.Column():
-            gr.HTML(f"""
-            <div class="stat-card">
-                <div class="stat-label">Disk Usage</div>
-                <div class="stat-value">{disk_usage}</div>
-                <div style="color: #6b7280; font-size: 0.875rem; margin-top: 4px;">Workspace Storage</div>
-            </div>
-            """)
+            disk_card_html = gr.HTML(disk_card)
         with gr.Column():
-             gr.HTML(f"""
-            <div class="stat-card">
-                <div class="stat-label">Active Training</div>
-                <div class="stat-value">None</div>
-                <div style="color: #6b7280; font-size: 0.875rem; margin-top: 4px;">Ready to start</div>
-            </div>
-            """)
+            training_card_html = gr.HTML(training_card)
+    
+    # The cards only read the sampler's in-memory cache, so refreshing is cheap
+    stats_timer = gr.Timer(system_metrics.METRICS_INTERVAL)
+    stats_timer.tick(render_stat_cards, outputs=[gpu_card_html, disk_card_html, training_card_html],
+                     show_progress="hidden")
 
     gr.Markdown("---")
 
@@ -345,8 +459,12 @@ with gr.Blocks(theme=theme, css=css, title="Chroma Trainer") as app:
 
                 with gr.Column(scale=2):
                     gr.Markdown("### Live Logs")
+                    progress_md = gr.Markdown("")
                     logs_output = gr.Code(label="Terminal Output", language="shell", lines=20)
                     refresh_logs_btn = gr.Button("Refresh Logs", size="sm")
+                    logs_timer = gr.Timer(LOG_STREAM_INTERVAL)
+                    logs_seen = gr.State(None)
+                    logs_delta = gr.JSON(visible=False)
 
         # Tab 2: Datasets
         with gr.Tab("📁 Datasets"):
@@ -358,7 +476,7 @@ with gr.Blocks(theme=theme, css=css, title="Chroma Trainer") as app:
                     
                     gr.Markdown("### Upload Images")
                     upload_ds_select = gr.Dropdown(label="Target Dataset", choices=get_datasets())
-                    files_input = gr.File(label="Images", file_count="multiple")
+                    files_input = gr.File(label="Images, captions or .zip / .tar archives", file_count="multiple")
                     upload_btn = gr.Button("Upload")
                     
                     upload_status = gr.Markdown("")
@@ -366,7 +484,11 @@ with gr.Blocks(theme=theme, css=css, title="Chroma Trainer") as app:
                 with gr.Column(scale=2):
                     gr.Markdown("### Gallery")
                     gallery_ds_select = gr.Dropdown(label="View Dataset", choices=get_datasets())
+                    with gr.Row():
+                        gallery_search = gr.Textbox(label="Filter", placeholder="File name or caption", scale=3)
+                        gallery_page = gr.Number(label="Page", value=1, precision=0, minimum=1, scale=1)
                     gallery = gr.Gallery(label="Images", columns=6)
+                    gallery_page_info = gr.Markdown("")
                     refresh_gallery_btn = gr.Button("Refresh Gallery")
 
     # Tools Tab
@@ -374,35 +496,46 @@ with gr.Blocks(theme=theme, css=css, title="Chroma Trainer") as app:
             gr.Markdown("### Utilities")
             with gr.Row():
                 download_btn = gr.Button("Download Models", variant="secondary")
-                download_status = gr.Markdown("")
+            download_status = gr.Markdown(model_prefetch.get_prefetch(PATHS["workspace"]).summary())
+            download_timer = gr.Timer(MODEL_STATUS_INTERVAL)
+            
+            def get_download_status():
+                prefetch = model_prefetch.get_prefetch(PATHS["workspace"])
+                if prefetch.running:
+                    return f"⬇️ Downloading in background...\n\n{prefetch.summary()}"
+                return prefetch.summary()
             
             def run_download():
-                try:
-                    # Assuming download_models.py is in the parent directory
-                    script_path = os.path.join(PATHS["workspace"], "download_models.py")
-                    if os.path.exists(script_path):
-                        subprocess.Popen(["python", script_path], cwd=PATHS["workspace"])
-                        return "✅ Download started in background console"
-                    return "❌ download_models.py not found"
-                except Exception as e:
-                    return f"❌ Error: {e}"
+                # Same tracked prefetch that starts with the app; a no-op while it is running
+                model_prefetch.get_prefetch(PATHS["workspace"]).start()
+                return get_download_status()
 
             download_btn.click(run_download, outputs=[download_status])
+            download_timer.tick(get_download_status, outputs=[download_status], show_progress="hidden")
 
     # Event Wiring
     
     # Training
-    train_btn.click(run_training, inputs=[dataset_dropdown, lora_name_input, steps_slider, resolution_radio, batch_slider, lr_input], outputs=[status_msg, logs_output])
+    train_event = train_btn.click(run_training, inputs=[dataset_dropdown, lora_name_input, steps_slider, resolution_radio, batch_slider, lr_input], outputs=[status_msg, logs_output])
     stop_btn.click(stop_training, outputs=[status_msg])
-    refresh_logs_btn.click(get_logs, outputs=[logs_output])
+    refresh_event = refresh_logs_btn.click(get_logs, outputs=[logs_output])
+    # Only new lines travel on each tick; the browser appends them to the log box
+    logs_timer.tick(stream_logs, inputs=[logs_seen], outputs=[logs_delta, progress_md, logs_seen], show_progress="hidden").then(
+        None, inputs=[logs_delta, logs_output], outputs=logs_output, js=APPEND_LOG_JS, show_progress="hidden")
+    # Those two show the whole log; the next tick then starts over from it
+    for event in (train_event, refresh_event):
+        event.then(lambda: None, outputs=logs_seen, show_progress="hidden")
     
     # Datasets
     create_ds_btn.click(create_dataset, inputs=[new_ds_name], outputs=[dataset_dropdown, upload_status])
-    upload_btn.click(upload_files, inputs=[upload_ds_select, files_input], outputs=[upload_status])
+    upload_btn.click(upload_files, inputs=[upload_ds_select, files_input], outputs=[upload_status, files_input])
     
     # Gallery
-    gallery_ds_select.change(get_dataset_gallery, inputs=[gallery_ds_select], outputs=[gallery])
-    refresh_gallery_btn.click(get_dataset_gallery, inputs=[gallery_ds_select], outputs=[gallery])
+    gallery_inputs = [gallery_ds_select, gallery_search, gallery_page]
+    gallery_ds_select.change(get_dataset_gallery, inputs=gallery_inputs, outputs=[gallery, gallery_page_info])
+    gallery_search.submit(get_dataset_gallery, inputs=gallery_inputs, outputs=[gallery, gallery_page_info])
+    gallery_page.submit(get_dataset_gallery, inputs=gallery_inputs, outputs=[gallery, gallery_page_info])
+    refresh_gallery_btn.click(get_dataset_gallery, inputs=gallery_inputs, outputs=[gallery, gallery_page_info])
     
     # Auto-refresh datasets dropdowns
     app.load(lambda: gr.update(choices=get_datasets()), outputs=dataset_dropdown)
@@ -410,5 +543,8 @@ with gr.Blocks(theme=theme, css=css, title="Chroma Trainer") as app:
     app.load(lambda: gr.update(choices=get_datasets()), outputs=gallery_ds_select)
 
 if __name__ == "__main__":
+    model_prefetch.start_prefetch(PATHS["workspace"])
     port = int(os.environ.get("PORT", 18675))
-    app.launch(server_name="0.0.0.0", server_port=port, allowed_paths=[PATHS["workspace"]])
+    # Serve the UI next to a Prometheus /metrics route on the same port
+    server = metrics_export.create_server(app, render_metrics, allowed_paths=[PATHS["workspace"]])
+    uvicorn.run(server, host="0.0.0.0", port=port)
@@ -13,6 +13,29 @@ from pathlib import Path
 from datetime import datetime
 import shutil
 import json
+import re
+
+import pandas as pd
+import uvicorn
+
+import archive_import
+import caption_index
+import dataset_analysis
+import dataset_index
+import file_ingest
+import gpus
+import image_dedup
+import image_preprocess
+import job_queue
+import metrics_export
+import model_prefetch
+import run_dirs
+import system_metrics
+import timeseries
+import thumbnails
+from download_models import DownloadError
+from training_logs import APPEND_LOG_JS, LogBuffer, LogTail, LogWriter, TRAINING_LOG_MAX_LINES, log_delta
+from training_progress import ProgressTracker
 
 # ============================================================================
 # Configuration
@@ -23,15 +46,27 @@ DATASETS_DIR = os.path.join(WORKSPACE_DIR, "datasets")
 OUTPUT_DIR = os.path.join(WORKSPACE_DIR, "output")
 LOGS_DIR = os.path.join(WORKSPACE_DIR, "logs")
 SD_SCRIPTS_DIR = os.path.join(WORKSPACE_DIR, "sd-scripts")
+THUMBNAILS_DIR = os.path.join(WORKSPACE_DIR, "cache", "thumbnails")
+PREPROCESSED_DIR = os.path.join(WORKSPACE_DIR, "cache", "preprocessed")
+HASHES_DIR = os.path.join(WORKSPACE_DIR, "cache", "hashes")
+JOBS_DIR = os.path.join(WORKSPACE_DIR, "jobs")
+GALLERY_PAGE_SIZE = int(os.environ.get("GALLERY_PAGE_SIZE", 100))
+LOG_STREAM_INTERVAL = float(os.environ.get("LOG_STREAM_INTERVAL", 1.0))
+MODEL_STATUS_INTERVAL = 2.0
+CHART_REFRESH_INTERVAL = float(os.environ.get("CHART_REFRESH_INTERVAL", 10.0))
+KEEP_FINISHED_RUNS = 8  # finished runs whose log stays viewable in memory
+NUM_REPEATS = 10  # num_repeats of the generated dataset config
 
 # Ensure directories exist
 for d in [DATASETS_DIR, OUTPUT_DIR, LOGS_DIR]:
     os.makedirs(d, exist_ok=True)
 
-# Global state
-training_process = None
-training_log = ""
-is_training = False
+# Global state (the log of runs not started by this process, e.g. before a restart;
+# runs started here are tracked in training_runs)
+training_log = LogBuffer()
+training_log_tail = None
+training_log_lock = threading.Lock()
+progress_tracker = ProgressTracker()
 
 # ============================================================================
 # Dataset Functions
@@ -39,16 +74,7 @@ is_training = False
 
 def get_datasets():
     """Get list of available datasets."""
-    if not os.path.exists(DATASETS_DIR):
-        return []
-    datasets = []
-    for name in os.listdir(DATASETS_DIR):
-        path = os.path.join(DATASETS_DIR, name)
-        if os.path.isdir(path):
-            # Count images
-            images = list(Path(path).glob("*.png")) + list(Path(path).glob("*.jpg")) + list(Path(path).glob("*.jpeg"))
-            datasets.append({"name": name, "count": len(images)})
-    return datasets
+    return [{"name": name, "count": count} for name, count in dataset_index.list_datasets(DATASETS_DIR)]
 
 def get_dataset_choices():
     """Get dataset choices for dropdown."""
@@ -62,7 +88,7 @@ def get_dataset_name(choice):
     return choice.split(" (")[0]
 
 def get_dataset_images(dataset_choice):
-    """Get images from a dataset as gallery items."""
+    """Get images from a dataset as (path, caption) items."""
     dataset_name = get_dataset_name(dataset_choice)
     if not dataset_name:
         return []
@@ -71,33 +97,56 @@ def get_dataset_images(dataset_choice):
     if not path.exists():
         return []
     
-    images = []
-    for ext in ["*.png", "*.jpg", "*.jpeg", "*.webp"]:
-        for img_path in sorted(path.glob(ext)):
-            # Get caption if exists
-            caption_path = img_path.with_suffix(".txt")
-            caption = ""
-            if caption_path.exists():
-                caption = caption_path.read_text(encoding="utf-8").strip()[:100]
-            images.append((str(img_path), caption or img_path.name))
-    
-    return images
+    index = dataset_index.get_index(path)
+    return [(entry.path, entry.caption or entry.name) for entry in index.images]
 
-def get_image_caption(dataset_choice, evt: gr.SelectData):
-    """Get full caption for selected image."""
+def load_gallery(dataset_choice, search="", sort="Default", page=1):
+    """Get one gallery page plus the selection state that maps gallery indices back to images."""
     dataset_name = get_dataset_name(dataset_choice)
-    if not dataset_name or evt.index is None:
-        return "", "", None
+    if not dataset_name:
+        return [], None, ""
     
     path = Path(DATASETS_DIR) / dataset_name
-    images = []
-    for ext in ["*.png", "*.jpg", "*.jpeg", "*.webp"]:
-        images.extend(sorted(path.glob(ext)))
+    if not path.exists():
+        return [], None, ""
+    
+    index = dataset_index.get_index(path)
+    images, page, pages, total = index.page(page, GALLERY_PAGE_SIZE, search, sort)
+    
+    selection = {
+        "dataset": dataset_name,
+        "version": index.version,
+        "images": images,
+        "search": search,
+        "sort": sort,
+        "page": page,
+    }
+    page_info = f"Page {page} / {pages} · {total} images"
+    
+    # The gallery only gets thumbnails; the full image is loaded by the preview pane
+    thumbs = thumbnails.get_thumbnails(images, THUMBNAILS_DIR)
+    items = [(thumb, entry.caption or entry.name) for thumb, entry in zip(thumbs, images)]
+    return items, selection, page_info
+
+def reload_gallery(dataset_choice, selection, page_delta=0):
+    """Reload the gallery keeping the current filter and sort order, optionally moving pages."""
+    if not selection or selection["dataset"] != get_dataset_name(dataset_choice):
+        return load_gallery(dataset_choice)
+    return load_gallery(dataset_choice, selection["search"], selection["sort"], selection["page"] + page_delta)
+
+def get_image_caption(selection, evt: gr.SelectData):
+    """Get full caption for selected image."""
+    if not selection or evt.index is None or evt.index >= len(selection["images"]):
+        return "", "", None
     
-    if evt.index >= len(images):
+    # The gallery shows the list captured when it was loaded, so the click
+    # resolves against that list. If the dataset changed since, make sure the
+    # file is still there before handing it out.
+    img_path = Path(selection["images"][evt.index].path)
+    index = dataset_index.get_index(Path(DATASETS_DIR) / selection["dataset"])
+    if index.version != selection["version"] and index.get(img_path.name) is None:
         return "", "", None
     
-    img_path = images[evt.index]
     caption_path = img_path.with_suffix(".txt")
     caption = ""
     if caption_path.exists():
@@ -112,8 +161,46 @@ def save_caption(image_path, caption):
     
     caption_path = Path(image_path).with_suffix(".txt")
     caption_path.write_text(caption, encoding="utf-8")
+    # Rewriting a caption in place doesn't bump the directory mtime
+    dataset_index.get_index(caption_path.parent, refresh=False).invalidate()
     return f"✅ Caption saved for {Path(image_path).name}"
 
+def bulk_edit_captions(dataset_choice, scope, action, find, text, use_regex, selection=None):
+    """Find/replace, prepend or append across the filtered (or all) images' captions."""
+    dataset_name = get_dataset_name(dataset_choice)
+    if not dataset_name:
+        return "❌ No dataset selected", *reload_gallery(dataset_choice, selection)
+    
+    index = dataset_index.get_index(Path(DATASETS_DIR) / dataset_name)
+    search = ""
+    if scope == "Filtered images" and selection and selection["dataset"] == dataset_name:
+        search = selection["search"]
+    names = [entry.name for entry in index.query(search)[0]]
+    
+    if action == "Find & Replace":
+        if not find:
+            return "❌ Enter the text to find", *reload_gallery(dataset_choice, selection)
+        if use_regex:
+            try:
+                re.compile(find)
+            except re.error as e:
+                return f"❌ Invalid regex: {e}", *reload_gallery(dataset_choice, selection)
+        transform = lambda caption: caption_index.find_replace(caption, find, text or "", regex=use_regex)
+    elif not text or not text.strip():
+        return "❌ Enter the text to add", *reload_gallery(dataset_choice, selection)
+    elif action == "Prepend":
+        transform = lambda caption: caption_index.prepend(caption, text)
+    else:
+        transform = lambda caption: caption_index.append(caption, text)
+    
+    start = time.time()
+    try:
+        changed = index.edit_captions(names, transform)
+    except (OSError, re.error) as e:
+        return f"❌ No captions changed: {e}", *reload_gallery(dataset_choice, selection)
+    msg = f"✅ Updated {changed} of {len(names)} captions ({time.time() - start:.1f}s)"
+    return msg, *reload_gallery(dataset_choice, selection)
+
 def create_dataset(name):
     """Create a new dataset folder."""
     if not name or not name.strip():
@@ -132,27 +219,35 @@ def delete_dataset(dataset_choice):
     """Delete a dataset."""
     dataset_name = get_dataset_name(dataset_choice)
     if not dataset_name:
-        return "❌ No dataset selected", get_dataset_choices(), []
+        return "❌ No dataset selected", get_dataset_choices(), [], None, ""
     
     path = Path(DATASETS_DIR) / dataset_name
     if path.exists():
         shutil.rmtree(path)
-        return f"✅ Deleted dataset '{dataset_name}'", get_dataset_choices(), []
+        dataset_index.forget(path)
+        return f"✅ Deleted dataset '{dataset_name}'", get_dataset_choices(), [], None, ""
     
-    return f"❌ Dataset '{dataset_name}' not found", get_dataset_choices(), []
+    return f"❌ Dataset '{dataset_name}' not found", get_dataset_choices(), [], None, ""
 
-def upload_images(dataset_choice, files):
-    """Upload images and txt files to a dataset."""
+def upload_images(dataset_choice, files, selection=None, progress=gr.Progress()):
+    """Upload images and txt files, or zip/tar archives of them, to a dataset.
+    
+    Files are hard-linked (or moved) out of Gradio's temp dir when it shares
+    the workspace volume, so the upload widget is cleared afterwards.
+    Archives are streamed entry by entry straight into the dataset.
+    """
     dataset_name = get_dataset_name(dataset_choice)
     if not dataset_name:
-        return "❌ No dataset selected", []
+        return "❌ No dataset selected", [], None, "", gr.update()
     
     if not files:
-        return "❌ No files selected", get_dataset_images(dataset_choice)
+        return "❌ No files selected", *reload_gallery(dataset_choice, selection), gr.update()
     
     path = Path(DATASETS_DIR) / dataset_name
     path.mkdir(parents=True, exist_ok=True)
     
+    pairs = []
+    archives = []
     img_count = 0
     txt_count = 0
     
@@ -173,25 +268,50 @@ def upload_images(dataset_choice, files):
             
         suffix = src.suffix.lower()
         
-        if suffix in [".png", ".jpg", ".jpeg", ".webp"]:
-            dst = path / src.name
-            shutil.copy(str(src), str(dst))
+        if archive_import.is_archive(src):
+            archives.append(src)
+            continue
+        elif suffix in [".png", ".jpg", ".jpeg", ".webp"]:
             img_count += 1
         elif suffix == ".txt":
-            dst = path / src.name
-            shutil.copy(str(src), str(dst))
             txt_count += 1
+        else:
+            continue
+        pairs.append((str(src), str(path / src.name)))
+    
+    def on_progress(done, total, dst):
+        progress((done, total), desc=f"Importing {os.path.basename(dst)}", unit="files")
+    
+    counts, failed = file_ingest.ingest_files(pairs, move=True, on_progress=on_progress)
     
-    msg = f"✅ Uploaded {img_count} images"
-    if txt_count > 0:
-        msg += f" and {txt_count} caption files"
+    msg = ""
+    if pairs:
+        msg = f"✅ Uploaded {img_count} images"
+        if txt_count > 0:
+            msg += f" and {txt_count} caption files"
+        msg += " (" + ", ".join(f"{n} {method}" for method, n in sorted(counts.items())) + ")" if counts else ""
     
-    return msg, get_dataset_images(dataset_choice)
+    for archive in archives:
+        def on_bytes(done, total, name=archive.name):
+            progress((done, total), desc=f"Extracting {name}", unit="bytes")
+        try:
+            result = archive_import.import_archive(archive, path, on_progress=on_bytes)
+        except ValueError as e:
+            failed.append((str(archive), str(e)))
+            continue
+        msg += f"\n\n✅ {archive.name}: {result.summary()}"
+        failed += [(entry, err) for entry, err in result.errors]
+    
+    if failed:
+        msg += f"\n\n❌ {len(failed)} failed: " + ", ".join(f"{Path(src).name} ({err})" for src, err in failed[:5])
+    msg = msg.strip() or "❌ No images, captions or archives among the selected files"
+    
+    return msg, *reload_gallery(dataset_choice, selection), None
 
-def delete_image(dataset_choice, image_path):
+def delete_image(dataset_choice, image_path, selection=None):
     """Delete an image from dataset."""
     if not image_path:
-        return "❌ No image selected", [], ""
+        return "❌ No image selected", *reload_gallery(dataset_choice, selection), ""
     
     img_path = Path(image_path)
     caption_path = img_path.with_suffix(".txt")
@@ -201,19 +321,103 @@ def delete_image(dataset_choice, image_path):
     if caption_path.exists():
         caption_path.unlink()
     
-    return f"✅ Deleted {img_path.name}", get_dataset_images(dataset_choice), ""
+    return f"✅ Deleted {img_path.name}", *reload_gallery(dataset_choice, selection), ""
+
+def find_duplicates(dataset_choice, threshold):
+    """Cluster near-duplicate images; returns status, cluster dropdown and dedup state."""
+    dataset_name = get_dataset_name(dataset_choice)
+    if not dataset_name:
+        return "❌ No dataset selected", gr.update(choices=[], value=None), None
+    if not image_dedup.available():
+        return "❌ Duplicate search needs Pillow (pip install Pillow)", gr.update(choices=[], value=None), None
+    
+    path = os.path.join(DATASETS_DIR, dataset_name)
+    start = time.time()
+    hashes = image_dedup.get_hashes(path, HASHES_DIR)
+    clusters = image_dedup.find_clusters(hashes, int(threshold))
+    index = dataset_index.get_index(path, refresh=False)
+    
+    state = {"dataset": dataset_name, "clusters": []}
+    for cluster in clusters:
+        keep = image_dedup.pick_keeper(cluster, hashes, index)
+        # Keeper first, so the review gallery reads "original, then copies"
+        names = [keep] + sorted(n for n in cluster if n != keep)
+        state["clusters"].append({"names": names, "keep": keep, "sizes": {n: hashes[n][2:4] for n in names}})
+    
+    labels = [f"#{i + 1} · {len(c['names'])} images · {c['keep']}" for i, c in enumerate(state["clusters"])]
+    extra = sum(len(c["names"]) - 1 for c in state["clusters"])
+    status = f"🧬 {len(clusters)} clusters, {extra} removable duplicates among {len(hashes)} images ({time.time() - start:.1f}s)"
+    return status, gr.update(choices=labels, value=labels[0] if labels else None), state
+
+def show_duplicate_cluster(state, cluster_label):
+    """Gallery items and removal checkboxes (copies pre-selected) for one cluster."""
+    if not state or not cluster_label:
+        return [], gr.update(choices=[], value=[])
+    cluster = state["clusters"][int(cluster_label.split(" ")[0][1:]) - 1]
+    
+    path = os.path.join(DATASETS_DIR, state["dataset"])
+    index = dataset_index.get_index(path)
+    entries = [index.get(n) for n in cluster["names"] if index.get(n) is not None]
+    thumbs = thumbnails.get_thumbnails(entries, THUMBNAILS_DIR)
+    items = []
+    for thumb, entry in zip(thumbs, entries):
+        width, height = cluster["sizes"][entry.name]
+        marker = "✅ keep" if entry.name == cluster["keep"] else "🗑️"
+        items.append((thumb, f"{marker} {entry.name} ({width}x{height})"))
+    names = [e.name for e in entries]
+    return items, gr.update(choices=names, value=[n for n in names if n != cluster["keep"]])
+
+def _remove_dataset_images(dataset_name, names):
+    path = Path(DATASETS_DIR) / dataset_name
+    removed = 0
+    stems = set()
+    for name in names:
+        img_path = path / name
+        if img_path.exists():
+            img_path.unlink()
+            removed += 1
+        stems.add(img_path.stem)
+    # a.png and a.jpg share a.txt; keep it while any image with that stem is left
+    left = {os.path.splitext(n)[0] for n in os.listdir(path)
+            if n.lower().endswith(dataset_index.IMAGE_EXTENSIONS)}
+    for stem in stems - left:
+        caption_path = path / (stem + dataset_index.CAPTION_EXTENSION)
+        if caption_path.exists():
+            caption_path.unlink()
+    return removed
+
+def remove_duplicates(dataset_choice, state, names, threshold, selection=None):
+    """Delete the checked images of the current cluster, then rescan."""
+    if not state or state["dataset"] != get_dataset_name(dataset_choice):
+        return "❌ Run the duplicate search first", gr.update(), state, *reload_gallery(dataset_choice, selection)
+    removed = _remove_dataset_images(state["dataset"], names or [])
+    status, clusters, state = find_duplicates(dataset_choice, threshold)
+    return f"✅ Removed {removed} images · {status}", clusters, state, *reload_gallery(dataset_choice, selection)
+
+def remove_all_duplicates(dataset_choice, state, threshold, selection=None):
+    """Delete every image but the keeper of every cluster."""
+    if not state or state["dataset"] != get_dataset_name(dataset_choice):
+        return "❌ Run the duplicate search first", gr.update(), state, *reload_gallery(dataset_choice, selection)
+    names = [n for c in state["clusters"] for n in c["names"] if n != c["keep"]]
+    removed = _remove_dataset_images(state["dataset"], names)
+    status, clusters, state = find_duplicates(dataset_choice, threshold)
+    return f"✅ Removed {removed} images · {status}", clusters, state, *reload_gallery(dataset_choice, selection)
 
 # ============================================================================
 # Training Functions
 # ============================================================================
 
-def generate_training_command(dataset_name, lora_name, steps, resolution, batch_size, learning_rate):
-    """Generate the training command."""
-    dataset_path = os.path.join(DATASETS_DIR, dataset_name)
-    output_path = os.path.join(OUTPUT_DIR, lora_name)
+def get_image_dir(dataset_name, resolution, preprocess=False):
+    """Directory training reads images from: the dataset or its preprocessed copy."""
+    if preprocess:
+        return image_preprocess.derived_dir(PREPROCESSED_DIR, dataset_name, resolution)
+    return os.path.join(DATASETS_DIR, dataset_name)
+
+def generate_training_config(dataset_name, resolution, batch_size, preprocess=False):
+    """Generate the dataset TOML config."""
+    dataset_path = get_image_dir(dataset_name, resolution, preprocess)
     
-    # Generate TOML config
-    toml_content = f"""[[datasets]]
+    return f"""[[datasets]]
 resolution = [{resolution}, {resolution}]
 batch_size = {batch_size}
 caption_extension = ".txt"
@@ -221,12 +425,12 @@ flip_aug = false
 
   [[datasets.subsets]]
   image_dir = '{dataset_path}'
-  num_repeats = 10
+  num_repeats = {NUM_REPEATS}
 """
-    
-    config_path = os.path.join(WORKSPACE_DIR, "lora_config.toml")
-    with open(config_path, "w") as f:
-        f.write(toml_content)
+
+def generate_training_command(dataset_name, lora_name, steps, resolution, batch_size, learning_rate, config_path):
+    """Generate the training command for a dataset config at ``config_path``."""
+    output_path = os.path.join(OUTPUT_DIR, lora_name)
     
     cmd = f"""cd {SD_SCRIPTS_DIR} && source venv/bin/activate && accelerate launch --num_cpu_threads_per_process 2 \\
   flux_train_network.py \\
@@ -264,8 +468,9 @@ flip_aug = false
   --network_dropout 0.1 \\
   --network_train_unet_only \\
   --enable_bucket \\
-  --min_bucket_reso 256 \\
-  --max_bucket_reso 768 \\
+  --min_bucket_reso {image_preprocess.MIN_BUCKET_RESO} \\
+  --max_bucket_reso {image_preprocess.MAX_BUCKET_RESO} \\
+  --bucket_reso_steps {image_preprocess.BUCKET_RESO_STEPS} \\
   --persistent_data_loader_workers \\
   --max_data_loader_n_workers 2 \\
   --noise_offset 0.07 \\
@@ -283,109 +488,341 @@ flip_aug = false
     
     return cmd
 
-def start_training(dataset_choice, lora_name, steps, resolution, batch_size, learning_rate):
-    """Start the training process."""
-    global training_process, training_log, is_training
-    
-    if is_training:
-        return "⚠️ Training already in progress!", training_log
-    
+def analyze_training_dataset(dataset_choice, resolution, batch_size, steps):
+    """Pre-flight report: captions, broken files and the bucket plan for these settings."""
     dataset_name = get_dataset_name(dataset_choice)
     if not dataset_name:
-        return "❌ Please select a dataset", ""
+        return "❌ Please select a dataset"
+    path = os.path.join(DATASETS_DIR, dataset_name)
+    if not os.path.isdir(path):
+        return f"❌ Dataset '{dataset_name}' not found"
+    return dataset_analysis.analyze_dataset(path, int(resolution), int(batch_size), NUM_REPEATS, int(steps))
+
+def start_training(dataset_choice, lora_name, steps, resolution, batch_size, learning_rate, preprocess=False):
+    """Add a training job to the queue; it starts as soon as a GPU is free."""
+    dataset_name = get_dataset_name(dataset_choice)
+    if not dataset_name:
+        return "❌ Please select a dataset", get_log_text(), *get_job_queue()
     
     if not lora_name or not lora_name.strip():
-        return "❌ Please enter a LoRA name", ""
+        return "❌ Please enter a LoRA name", get_log_text(), *get_job_queue()
     
     # Check dataset has images
     images = get_dataset_images(dataset_choice)
     if not images:
-        return "❌ Dataset has no images", ""
+        return "❌ Dataset has no images", get_log_text(), *get_job_queue()
+    
+    if preprocess and not image_preprocess.available():
+        return "❌ Preprocessing needs Pillow (pip install Pillow)", get_log_text(), *get_job_queue()
     
     lora_name = lora_name.strip().replace(" ", "_")
-    training_log = f"🚀 Starting training: {lora_name}\n"
-    training_log += f"📁 Dataset: {dataset_name} ({len(images)} images)\n"
-    training_log += f"⚙️ Steps: {steps}, Resolution: {resolution}, Batch: {batch_size}, LR: {learning_rate}\n"
-    training_log += "=" * 60 + "\n\n"
-    
-    # Generate command
-    cmd = generate_training_command(dataset_name, lora_name, steps, resolution, batch_size, learning_rate)
-    
-    # Save log
-    log_path = os.path.join(LOGS_DIR, "training.log")
-    with open(log_path, "w") as f:
-        f.write(training_log)
-    
-    # Start training in background
-    def run_training():
-        global training_process, training_log, is_training
-        is_training = True
+    spec = {
+        "dataset": dataset_name,
+        "images": len(images),
+        "lora_name": lora_name,
+        "steps": steps,
+        "resolution": resolution,
+        "batch_size": batch_size,
+        "learning_rate": learning_rate,
+        "preprocess": bool(preprocess),
+    }
+    
+    # Every job gets its own run directory, so queued jobs never share a config
+    job_id = run_dirs.new_run_id()
+    run_dir = run_dirs.run_dir(WORKSPACE_DIR, job_id)
+    config_path = os.path.join(run_dir, run_dirs.CONFIG_FILENAME)
+    cmd = generate_training_command(dataset_name, lora_name, steps, resolution, batch_size, learning_rate, config_path)
+    run_dirs.create_run_dir(
+        run_dir,
+        generate_training_config(dataset_name, resolution, batch_size, preprocess),
+        cmd,
+        {"id": job_id, "ui": "gradio_ui", "spec": spec, "state": job_queue.QUEUED}
+    )
+    job = training_jobs.enqueue(spec, cmd, run_dir, job_id)
+    job_scheduler.start()
+    
+    position = training_jobs.position(job["id"])
+    if position is None or (not job_scheduler.busy and position == 1):
+        status = f"✅ Training started! (job {job['id']})"
+    else:
+        status = f"📋 Queued job {job['id']} (position {position})"
+    return status, get_log_text(), *get_job_queue()
+
+class TrainingRun:
+    """Log, progress and process of one job started by this UI."""
+    
+    def __init__(self, job, gpu):
+        self.job = job
+        self.gpu = gpu
+        self.process = None
+        self.log = LogBuffer()
+        self.progress = ProgressTracker()
+        self.running = True
+
+def run_training_job(job, gpu=None):
+    """Scheduler callback: run one job on ``gpu`` (None = no pinning) and return its exit code."""
+    run = TrainingRun(job, gpu)
+    with training_runs_lock:
+        training_runs[job["id"]] = run
+        finished = [r for r in training_runs.values() if not r.running]
+        for old in finished[:-KEEP_FINISHED_RUNS]:
+            training_runs.pop(old.job["id"], None)
+    
+    spec = job["spec"]
+    header = f"🚀 Starting training: {spec['lora_name']} (job {job['id']})\n"
+    header += f"📁 Dataset: {spec['dataset']} ({spec['images']} images)\n"
+    header += f"⚙️ Steps: {spec['steps']}, Resolution: {spec['resolution']}, Batch: {spec['batch_size']}, LR: {spec['learning_rate']}\n"
+    if gpu is not None:
+        header += f"🎮 GPU: {gpu}\n"
+    header += "=" * 60 + "\n\n"
+    run.log.append(header)
+    
+    # Save log in the run directory; logs/training.log follows the latest run
+    log_path = os.path.join(job["run_dir"], run_dirs.LOG_FILENAME)
+    log_writer = LogWriter(log_path, mode="w")
+    log_writer.write(header)
+    run_dirs.link_latest_log(log_path, os.path.join(LOGS_DIR, "training.log"))
+    run_dirs.update_meta(job["run_dir"], gpu=gpu)
+    returncode = None
+    result = ""
+    
+    cancel = job_scheduler.cancel_event(job["id"])
+    
+    try:
+        def on_wait(message):
+            run.log.append(message)
+            log_writer.write(message + "\n")
         
-        try:
-            training_process = subprocess.Popen(
-                cmd,
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1
-            )
-            
-            for line in iter(training_process.stdout.readline, ''):
-                if line:
-                    # Handle carriage return for progress bars
-                    if '\r' in line:
-                        line = line.split('\r')[-1]
-                    training_log += line
-                    # Save to file
-                    with open(log_path, "a") as f:
-                        f.write(line)
-            
-            training_process.wait()
+        if spec.get("preprocess"):
+            preprocess_images(spec, on_wait, cancel)
+            if cancel.is_set():
+                return None
+        
+        # Only blocks on model files the background prefetch hasn't finished yet
+        model_prefetch.get_prefetch(WORKSPACE_DIR).wait_for(on_wait=on_wait, cancel=cancel)
+        if cancel.is_set():
+            return None  # stopped while waiting for the models
+        
+        env = None
+        if gpu is not None:
+            # nvidia-smi numbers GPUs by PCI bus; make CUDA use the same order
+            env = dict(os.environ, CUDA_DEVICE_ORDER="PCI_BUS_ID", CUDA_VISIBLE_DEVICES=str(gpu))
+        run.process = subprocess.Popen(
+            job["command"],
+            shell=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1,
+            env=env
+        )
+        if cancel.is_set():
+            run.process.terminate()  # cancelled while the process was starting
+        
+        for line in iter(run.process.stdout.readline, ''):
+            if line:
+                # Handle carriage return for progress bars
+                if '\r' in line:
+                    line = line.split('\r')[-1]
+                run.log.append(line)
+                log_writer.write(line)
+                run.progress.feed(line)
+        
+        returncode = run.process.wait()
+        
+        if returncode == 0:
+            result = "\n\n✅ TRAINING COMPLETED SUCCESSFULLY!\n"
+        elif not cancel.is_set():
+            result = f"\n\n❌ Training failed with code {returncode}\n"
             
-            if training_process.returncode == 0:
-                training_log += "\n\n✅ TRAINING COMPLETED SUCCESSFULLY!\n"
-            else:
-                training_log += f"\n\n❌ Training failed with code {training_process.returncode}\n"
-                
-        except Exception as e:
-            training_log += f"\n\n❌ Error: {str(e)}\n"
-        finally:
-            is_training = False
-            with open(log_path, "a") as f:
-                f.write(training_log.split('\n')[-1])
+    except DownloadError as e:
+        result = f"\n\n❌ Model download failed: {e}\n"
+        raise
+    except Exception as e:
+        result = f"\n\n❌ Error: {str(e)}\n"
+        raise
+    finally:
+        run.running = False
+        run.log.append(result)
+        log_writer.write(result)
+        log_writer.close()
+        if log_writer.error:
+            run.log.append(f"⚠️ Log file incomplete: {log_writer.error}")
+    
+    return returncode
+
+def preprocess_images(spec, on_message, cancel=None):
+    """Resize the job's dataset to its buckets (the models keep downloading meanwhile)."""
+    src_dir = os.path.join(DATASETS_DIR, spec["dataset"])
+    dst_dir = get_image_dir(spec["dataset"], spec["resolution"], preprocess=True)
+    reported = [-1]
     
-    thread = threading.Thread(target=run_training, daemon=True)
-    thread.start()
+    def on_progress(done, total):
+        percent = 100 * done // total if total else 100
+        if percent // 10 != reported[0] // 10 or done == total:
+            reported[0] = percent
+            on_message(f"📐 Preprocessing images: {done}/{total}")
     
-    return "✅ Training started!", training_log
+    processed, skipped, failed = image_preprocess.preprocess_dataset(
+        src_dir, dst_dir, spec["resolution"], on_progress=on_progress, cancel=cancel
+    )
+    on_message(f"📐 Preprocessed {processed} images, {skipped} unchanged")
+    for name, error in failed:
+        on_message(f"⚠️ Skipped {name}: {error}")
+
+def get_displayed_run(job_id=None):
+    """The run whose log is shown: the selected job if this UI ran it, else the latest one."""
+    runs = list_training_runs()
+    run = training_runs.get(job_id) if job_id else None
+    if run is None and runs:
+        run = runs[-1]
+    return run
 
-def stop_training():
-    """Stop the training process."""
-    global training_process, is_training, training_log
+def stop_training(job_id=None):
+    """Stop the selected (or latest) running job; the queue moves on to the next one."""
+    run = get_displayed_run(job_id)
+    if run is None or not run.running:
+        running = [r for r in list_training_runs() if r.running]
+        run = running[-1] if running else None
     
-    if training_process and is_training:
-        training_process.terminate()
-        training_log += "\n\n⚠️ Training stopped by user\n"
-        is_training = False
-        return "⚠️ Training stopped", training_log
+    if run and cancel_job(run.job["id"]):
+        run.log.append("\n\n⚠️ Training stopped by user\n")
+        return f"⚠️ Training stopped (job {run.job['id']})", run.log.text()
     
-    return "ℹ️ No training in progress", training_log
+    return "ℹ️ No training in progress", get_log_text(job_id)
 
-def get_training_logs():
-    """Get current training logs."""
-    global training_log, is_training
+def cancel_job(job_id):
+    """Cancel a queued job, or stop it if it is running. Returns True if it was active."""
+    previous = job_scheduler.cancel(job_id)
+    run = training_runs.get(job_id)
+    if previous == job_queue.RUNNING and run and run.process and run.process.poll() is None:
+        run.process.terminate()
+    return previous is not None
+
+def get_job_queue():
+    """Rows for the queue table and choices for the job selector."""
+    rows = []
+    choices = []
+    for job in training_jobs.jobs():
+        spec = job["spec"]
+        state = f"{job_queue.STATE_ICONS[job['state']]} {job['state']}"
+        created = datetime.fromtimestamp(job["created"]).strftime("%Y-%m-%d %H:%M")
+        gpu = job_scheduler.running.get(job["id"], "")
+        rows.append([job["id"], spec["lora_name"], spec["dataset"], spec["steps"], state,
+                     "" if gpu is None else str(gpu), created])
+        if job["state"] in job_queue.ACTIVE_STATES:
+            choices.append((f"{job['id']} · {spec['lora_name']} ({job['state']})", job["id"]))
+    return rows, gr.update(choices=choices)
+
+def move_job(job_id, delta):
+    """Move a queued job up (-1) or down (+1)."""
+    if job_id:
+        training_jobs.move(job_id, delta)
+    return get_job_queue()
+
+def cancel_selected_job(job_id):
+    """Cancel the job picked in the queue selector."""
+    if job_id:
+        cancel_job(job_id)
+    return get_job_queue()
+
+def stream_job_queue(last_version):
+    """Timer tick: refresh the queue table only when the queue changed."""
+    version = (training_jobs.version, tuple(job_scheduler.running.items()))
+    if version == last_version:
+        return gr.update(), gr.update(), last_version
+    return *get_job_queue(), version
+
+training_runs = {}  # job id -> TrainingRun, in start order
+training_runs_lock = threading.Lock()  # scheduler threads add and prune runs while the UI reads them
+
+def list_training_runs():
+    """Snapshot of the tracked runs, oldest first."""
+    with training_runs_lock:
+        return list(training_runs.values())
+training_jobs = job_queue.JobQueue(os.path.join(JOBS_DIR, "queue.json"))
+job_scheduler = job_queue.JobScheduler(training_jobs, run_training_job, gpus.free_gpus)
+
+def poll_training_log():
+    """Pull new lines from training.log into the buffer when no local run is feeding it."""
+    global training_log_tail
     
-    # Also try to read from file
-    log_path = os.path.join(LOGS_DIR, "training.log")
-    if os.path.exists(log_path):
-        with open(log_path, "r") as f:
-            file_log = f.read()
-        if len(file_log) > len(training_log):
-            training_log = file_log
+    # Runs started here feed their own buffers. Before the first one (after
+    # a UI restart, or for a run started elsewhere) follow training.log,
+    # reading only what was appended since the last refresh.
+    with training_log_lock:
+        if training_runs:
+            if training_log_tail is not None:
+                training_log_tail.close()
+                training_log_tail = None
+            return
+        
+        if training_log_tail is None:
+            log_path = os.path.join(LOGS_DIR, "training.log")
+            training_log_tail = LogTail(log_path, initial_lines=0 if training_log else TRAINING_LOG_MAX_LINES)
+        new_lines = training_log_tail.read()
+        if new_lines:
+            training_log.append("\n".join(new_lines))
+            for line in new_lines:
+                progress_tracker.feed(line)
+
+def get_log_text(job_id=None):
+    run = get_displayed_run(job_id)
+    return run.log.text() if run else training_log.text()
+
+def get_training_status(job_id=None):
+    """Get the training status line for the displayed run."""
+    run = get_displayed_run(job_id)
+    running = [r for r in list_training_runs() if r.running]
+    if run is None:
+        progress = progress_tracker.summary()
+        return f"⚪ Idle (last run: {progress})" if progress else "⚪ Idle"
     
-    status = "🟢 Training in progress..." if is_training else "⚪ Idle"
-    return training_log, status
+    progress = run.progress.summary()
+    label = f"job {run.job['id']} ({run.job['spec']['lora_name']})"
+    if run.running:
+        status = f"🟢 Training {label}... {progress}" if progress else f"🟢 Training {label}..."
+    else:
+        status = f"⚪ Finished {label}: {progress}" if progress else f"⚪ Finished {label}"
+    if len(running) > 1:
+        gpus_in_use = ", ".join(str(r.gpu) for r in running if r.gpu is not None)
+        status += f"\n\n🎮 {len(running)} jobs running" + (f" on GPUs {gpus_in_use}" if gpus_in_use else "")
+    return status
+
+def get_training_logs(job_id=None):
+    """Get current training logs."""
+    poll_training_log()
+    return get_log_text(job_id), get_training_status(job_id)
+
+def stream_training_logs(last_seen, job_id=None):
+    """Timer tick: send this tab the log lines added since its last update.
+    
+    Every tab reads the same in-memory buffers, so viewers never touch the
+    training processes or the log files themselves. The lines go to a hidden
+    component and are appended to the log box in the browser (APPEND_LOG_JS).
+    """
+    poll_training_log()
+    run = get_displayed_run(job_id)
+    log = run.log if run else training_log
+    status = get_training_status(job_id)
+    log_seen, status_seen = last_seen or (None, None)
+    delta, log_seen = log_delta(log, run.job["id"] if run else None, log_seen)
+    if delta is None and status == status_seen:
+        return gr.update(), gr.update(), last_seen
+    return (gr.update() if delta is None else delta), status, (log_seen, status)
+
+def get_model_status():
+    """Markdown table with the background model download progress."""
+    prefetch = model_prefetch.get_prefetch(WORKSPACE_DIR)
+    header = "⬇️ Downloading models in the background..." if prefetch.running else ""
+    if not prefetch.running and prefetch.missing():
+        header = "⚠️ Some models are missing. They will be downloaded when training starts."
+    return f"{header}\n\n{prefetch.summary()}" if header else prefetch.summary()
+
+def retry_model_download():
+    """Restart the background download of models that aren't ready."""
+    model_prefetch.get_prefetch(WORKSPACE_DIR).start()
+    return get_model_status()
 
 def get_checkpoints(lora_name):
     """Get list of checkpoints for a LoRA."""
@@ -423,44 +860,111 @@ def download_checkpoint(lora_name, checkpoint_name):
 # ============================================================================
 
 def get_gpu_info():
-    """Get GPU information."""
-    try:
-        result = subprocess.run(
-            ["nvidia-smi", "--query-gpu=name,memory.used,memory.total,utilization.gpu,temperature.gpu", 
-             "--format=csv,noheader,nounits"],
-            capture_output=True, text=True, timeout=5
-        )
-        if result.returncode == 0:
-            parts = result.stdout.strip().split(", ")
-            if len(parts) >= 5:
-                name = parts[0]
-                mem_used = float(parts[1])
-                mem_total = float(parts[2])
-                util = int(parts[3])
-                temp = int(parts[4])
-                mem_percent = (mem_used / mem_total) * 100
-                return f"""### 🎮 GPU: {name}
-| Metric | Value |
-|--------|-------|
-| Memory | {mem_used:.0f} / {mem_total:.0f} MB ({mem_percent:.1f}%) |
-| Utilization | {util}% |
-| Temperature | {temp}°C |"""
-    except:
-        pass
-    return "### 🎮 GPU: Unable to get info"
+    """Get GPU information from the shared metrics sampler (no nvidia-smi fork per call)."""
+    gpu_list = system_metrics.get_sampler(WORKSPACE_DIR).current_gpus()
+    if not gpu_list:
+        return "### 🎮 GPU: Unable to get info"
+    
+    busy = {str(gpu): job_id for job_id, gpu in job_scheduler.running.items() if gpu is not None}
+    title = f"### 🎮 GPU: {gpu_list[0].name}" if len(gpu_list) == 1 else f"### 🎮 GPUs: {len(gpu_list)}"
+    lines = [title, "| GPU | Memory | Utilization | Temperature | Job |", "|-----|--------|-------------|-------------|-----|"]
+    for gpu in gpu_list:
+        memory = "n/a"
+        if gpu.memory_total:
+            memory = f"{gpu.memory_used:.0f} / {gpu.memory_total:.0f} MB ({gpu.memory_used / gpu.memory_total * 100:.1f}%)"
+        util = "n/a" if gpu.utilization is None else f"{gpu.utilization}%"
+        temp = "n/a" if gpu.temperature is None else f"{gpu.temperature}°C"
+        lines.append(f"| {gpu.index}: {gpu.name} | {memory} | {util} | {temp} | {busy.get(gpu.index, '')} |")
+    return "\n".join(lines)
 
 def get_system_info():
     """Get system information."""
     gpu_info = get_gpu_info()
+    sample = system_metrics.get_sampler(WORKSPACE_DIR).latest()
     
-    # Disk space
-    try:
-        total, used, free = shutil.disk_usage(WORKSPACE_DIR)
-        disk_info = f"💾 Disk: {used/1024**3:.1f} / {total/1024**3:.1f} GB ({(used/total)*100:.1f}%)"
-    except:
-        disk_info = "💾 Disk: Unable to get info"
+    lines = []
+    if sample and sample.disk_total:
+        lines.append(f"💾 Disk: {sample.disk_used/1024**3:.1f} / {sample.disk_total/1024**3:.1f} GB "
+                     f"({sample.disk_used / sample.disk_total * 100:.1f}%)")
+    else:
+        lines.append("💾 Disk: Unable to get info")
+    if sample and sample.cpu_percent is not None:
+        lines.append(f"🧮 CPU: {sample.cpu_percent:.0f}%")
+    if sample and sample.ram_total:
+        lines.append(f"🧠 RAM: {sample.ram_used/1024**3:.1f} / {sample.ram_total/1024**3:.1f} GB")
+    
+    return f"{gpu_info}\n\n" + "  \n".join(lines)
+
+def _chart_frame(series):
+    """Long-format frame (time, value, series) for gr.LinePlot, each series LTTB-downsampled."""
+    rows = []
+    for name, points in series.items():
+        rows.extend((t, v, name) for t, v in timeseries.lttb(points))
+    frame = pd.DataFrame(rows, columns=["time", "value", "series"])
+    frame["time"] = pd.to_datetime(frame["time"], unit="s")
+    return frame
+
+def get_resource_charts(job_id=None):
+    """Frames for the history charts: GPU util, VRAM, temperature, disk/RAM, it/s and loss."""
+    samples = system_metrics.get_sampler(WORKSPACE_DIR).samples()
+    util, vram, temp = {}, {}, {}
+    for sample in samples:
+        for gpu in sample.gpus:
+            name = f"GPU {gpu.index}"
+            util.setdefault(name, []).append((sample.time, gpu.utilization))
+            vram.setdefault(name, []).append((sample.time, None if gpu.memory_used is None else gpu.memory_used / 1024))
+            temp.setdefault(name, []).append((sample.time, gpu.temperature))
+    storage = {
+        "Disk": [(s.time, None if s.disk_used is None else s.disk_used / 1024**3) for s in samples],
+        "RAM": [(s.time, None if s.ram_used is None else s.ram_used / 1024**3) for s in samples],
+    }
+    
+    run = get_displayed_run(job_id)
+    progress = run.progress.samples() if run else progress_tracker.samples()
+    throughput = {"it/s": [(p.time, p.it_per_sec) for p in progress]}
+    loss = {
+        "loss": [(p.time, p.loss) for p in progress],
+        "avr_loss": [(p.time, p.avr_loss) for p in progress],
+    }
+    return [_chart_frame(series) for series in (util, vram, temp, storage, throughput, loss)]
+
+def stream_resource_charts(last_seen, job_id=None):
+    """Timer tick: rebuild the charts only when new samples arrived."""
+    run = get_displayed_run(job_id)
+    latest = system_metrics.get_sampler(WORKSPACE_DIR).latest()
+    progress = (run.progress if run else progress_tracker).latest()
+    seen = (latest.time if latest else None, run.job["id"] if run else None, progress)
+    if seen == last_seen:
+        return *[gr.update()] * 6, last_seen
+    return *get_resource_charts(job_id), seen
+
+# ============================================================================
+# Metrics Endpoint
+# ============================================================================
+
+def render_metrics():
+    """Prometheus exposition of the in-memory training, queue, download and host state."""
+    writer = metrics_export.MetricsWriter()
     
-    return f"{gpu_info}\n\n{disk_info}"
+    running = [run for run in list_training_runs() if run.running]
+    writer.add("training_running_jobs", len(running), "Jobs currently training.")
+    for run in running:
+        labels = {"job": run.job["id"], "lora": run.job["spec"]["lora_name"],
+                  "gpu": "" if run.gpu is None else run.gpu}
+        writer.add("training_running", 1, "1 while the job is training.", **labels)
+        metrics_export.add_progress(writer, run.progress, **labels)
+    
+    states = {state: 0 for state in job_queue.STATE_ICONS}
+    for job in training_jobs.jobs():
+        states[job["state"]] += 1
+    for state, count in states.items():
+        writer.add("jobs", count, "Jobs in the queue file by state.", state=state)
+    writer.add("queue_depth", states[job_queue.QUEUED], "Jobs waiting to start.")
+    
+    metrics_export.add_prefetch(writer, model_prefetch.get_prefetch(WORKSPACE_DIR))
+    metrics_export.add_host(writer, system_metrics.get_sampler(WORKSPACE_DIR))
+    metrics_export.add_datasets(writer, DATASETS_DIR)
+    return writer.render()
 
 # ============================================================================
 # UI Definition
@@ -515,7 +1019,7 @@ def create_ui():
                         
                         with gr.Accordion("📤 Upload Images & Captions", open=False):
                             upload_files = gr.File(
-                                label="Drop images (.png, .jpg) and captions (.txt) here",
+                                label="Drop images (.png, .jpg), captions (.txt) or .zip / .tar(.gz/.zst) archives here",
                                 file_count="multiple"
                             )
                             upload_btn = gr.Button("Upload to Dataset", variant="primary")
@@ -529,11 +1033,30 @@ def create_ui():
                     with gr.Column(scale=3):
                         gr.Markdown("### 🖼️ Images")
                         
+                        with gr.Row():
+                            gallery_search = gr.Textbox(
+                                label="Filter",
+                                placeholder="Search file names and captions...",
+                                scale=3
+                            )
+                            gallery_sort = gr.Dropdown(
+                                choices=list(dataset_index.SORT_ORDERS),
+                                value="Default",
+                                label="Sort",
+                                scale=1
+                            )
+                        
                         gallery = gr.Gallery(
                             label="Dataset Images",
                             show_label=False,
                             columns=5
                         )
+                        gallery_selection = gr.State(None)
+                        
+                        with gr.Row():
+                            prev_page_btn = gr.Button("◀ Previous", size="sm")
+                            gallery_page_info = gr.Markdown("")
+                            next_page_btn = gr.Button("Next ▶", size="sm")
                         
                         with gr.Row():
                             with gr.Column(scale=2):
@@ -551,6 +1074,47 @@ def create_ui():
                                 selected_preview = gr.Image(label="Preview")
                         
                         caption_status = gr.Markdown("")
+                        
+                        with gr.Accordion("✏️ Bulk Caption Edit", open=False):
+                            with gr.Row():
+                                bulk_scope = gr.Radio(
+                                    choices=["Filtered images", "All images"],
+                                    value="Filtered images",
+                                    label="Apply To"
+                                )
+                                bulk_action = gr.Radio(
+                                    choices=["Find & Replace", "Prepend", "Append"],
+                                    value="Find & Replace",
+                                    label="Action"
+                                )
+                            with gr.Row():
+                                bulk_find = gr.Textbox(label="Find", placeholder="Only used by Find & Replace")
+                                bulk_text = gr.Textbox(label="Replace With / Text To Add", placeholder="e.g. ohwx person")
+                            with gr.Row():
+                                bulk_regex = gr.Checkbox(label="Regex", value=False)
+                                bulk_apply_btn = gr.Button("✏️ Apply", variant="primary")
+                            bulk_status = gr.Markdown("")
+                        
+                        with gr.Accordion("🧬 Near-Duplicates", open=False):
+                            with gr.Row():
+                                dedup_threshold = gr.Slider(
+                                    minimum=0,
+                                    maximum=12,
+                                    value=image_dedup.DEDUP_THRESHOLD,
+                                    step=1,
+                                    label="Max Hash Distance",
+                                    info="Bits of 64 that may differ; 0 = identical looking only",
+                                    scale=3
+                                )
+                                dedup_btn = gr.Button("🔍 Find Duplicates", scale=1)
+                            dedup_status = gr.Markdown("")
+                            dedup_cluster = gr.Dropdown(label="Cluster", choices=[], interactive=True)
+                            dedup_gallery = gr.Gallery(show_label=False, columns=6, height=260)
+                            dedup_remove = gr.CheckboxGroup(label="Remove", choices=[])
+                            with gr.Row():
+                                dedup_remove_btn = gr.Button("🗑️ Remove Checked", variant="stop")
+                                dedup_remove_all_btn = gr.Button("🗑️ Remove All Copies", variant="stop")
+                            dedup_state = gr.State(None)
                 
                 # Dataset event handlers
                 refresh_btn.click(
@@ -558,15 +1122,41 @@ def create_ui():
                     outputs=dataset_dropdown
                 )
                 
+                gallery_outputs = [gallery, gallery_selection, gallery_page_info]
+                
                 dataset_dropdown.change(
-                    fn=get_dataset_images,
-                    inputs=dataset_dropdown,
-                    outputs=gallery
+                    fn=load_gallery,
+                    inputs=[dataset_dropdown, gallery_search, gallery_sort],
+                    outputs=gallery_outputs
+                )
+                
+                gallery_search.submit(
+                    fn=load_gallery,
+                    inputs=[dataset_dropdown, gallery_search, gallery_sort],
+                    outputs=gallery_outputs
+                )
+                
+                gallery_sort.change(
+                    fn=load_gallery,
+                    inputs=[dataset_dropdown, gallery_search, gallery_sort],
+                    outputs=gallery_outputs
+                )
+                
+                prev_page_btn.click(
+                    fn=lambda choice, selection: reload_gallery(choice, selection, -1),
+                    inputs=[dataset_dropdown, gallery_selection],
+                    outputs=gallery_outputs
+                )
+                
+                next_page_btn.click(
+                    fn=lambda choice, selection: reload_gallery(choice, selection, 1),
+                    inputs=[dataset_dropdown, gallery_selection],
+                    outputs=gallery_outputs
                 )
                 
                 gallery.select(
                     fn=get_image_caption,
-                    inputs=dataset_dropdown,
+                    inputs=gallery_selection,
                     outputs=[selected_image_path, caption_editor, selected_preview]
                 )
                 
@@ -585,19 +1175,49 @@ def create_ui():
                 delete_dataset_btn.click(
                     fn=delete_dataset,
                     inputs=dataset_dropdown,
-                    outputs=[dataset_status, dataset_dropdown, gallery]
+                    outputs=[dataset_status, dataset_dropdown, *gallery_outputs]
                 )
                 
                 upload_btn.click(
                     fn=upload_images,
-                    inputs=[dataset_dropdown, upload_files],
-                    outputs=[dataset_status, gallery]
+                    inputs=[dataset_dropdown, upload_files, gallery_selection],
+                    outputs=[dataset_status, *gallery_outputs, upload_files]
                 )
                 
                 delete_image_btn.click(
                     fn=delete_image,
-                    inputs=[dataset_dropdown, selected_image_path],
-                    outputs=[caption_status, gallery, selected_image_path]
+                    inputs=[dataset_dropdown, selected_image_path, gallery_selection],
+                    outputs=[caption_status, *gallery_outputs, selected_image_path]
+                )
+                
+                bulk_apply_btn.click(
+                    fn=bulk_edit_captions,
+                    inputs=[dataset_dropdown, bulk_scope, bulk_action, bulk_find, bulk_text, bulk_regex, gallery_selection],
+                    outputs=[bulk_status, *gallery_outputs]
+                )
+                
+                dedup_btn.click(
+                    fn=find_duplicates,
+                    inputs=[dataset_dropdown, dedup_threshold],
+                    outputs=[dedup_status, dedup_cluster, dedup_state]
+                )
+                
+                dedup_cluster.change(
+                    fn=show_duplicate_cluster,
+                    inputs=[dedup_state, dedup_cluster],
+                    outputs=[dedup_gallery, dedup_remove]
+                )
+                
+                dedup_remove_btn.click(
+                    fn=remove_duplicates,
+                    inputs=[dataset_dropdown, dedup_state, dedup_remove, dedup_threshold, gallery_selection],
+                    outputs=[dedup_status, dedup_cluster, dedup_state, *gallery_outputs]
+                )
+                
+                dedup_remove_all_btn.click(
+                    fn=remove_all_duplicates,
+                    inputs=[dataset_dropdown, dedup_state, dedup_threshold, gallery_selection],
+                    outputs=[dedup_status, dedup_cluster, dedup_state, *gallery_outputs]
                 )
             
             # ================================================================
@@ -650,12 +1270,37 @@ def create_ui():
                             info="Use 1 for Prodigy optimizer"
                         )
                         
+                        preprocess = gr.Checkbox(
+                            value=False,
+                            label="Preprocess images to bucket resolution",
+                            info="Resize and crop a cached copy once, instead of decoding full-size images every epoch",
+                            interactive=image_preprocess.available()
+                        )
+                        
                         with gr.Row():
                             start_btn = gr.Button("▶️ Start Training", variant="primary", scale=2)
                             stop_btn = gr.Button("⏹️ Stop", variant="stop", scale=1)
                         
                         training_status_text = gr.Markdown("⚪ Ready to train")
                         
+                        with gr.Accordion("📊 Dataset Analysis", open=False):
+                            analyze_btn = gr.Button("📊 Analyze Dataset")
+                            dataset_report = gr.Markdown("Checks captions, unreadable files and the bucket plan for the settings above.")
+                        
+                        # Job queue
+                        gr.Markdown("### 📋 Job Queue")
+                        job_table = gr.Dataframe(
+                            headers=["Job", "LoRA", "Dataset", "Steps", "Status", "GPU", "Created"],
+                            datatype=["str", "str", "str", "number", "str", "str", "str"],
+                            col_count=(7, "fixed"),
+                            interactive=False
+                        )
+                        job_select = gr.Dropdown(label="Selected Job", choices=[], interactive=True)
+                        with gr.Row():
+                            job_up_btn = gr.Button("⬆️ Up", size="sm")
+                            job_down_btn = gr.Button("⬇️ Down", size="sm")
+                            job_cancel_btn = gr.Button("🚫 Cancel", size="sm", variant="stop")
+                        
                         # System info
                         gr.Markdown("---")
                         system_info = gr.Markdown(get_system_info())
@@ -686,20 +1331,40 @@ def create_ui():
                         )
                         refresh_checkpoints_btn = gr.Button("🔄 Refresh Checkpoints")
                 
+                # Resource history, on one time axis so dips in it/s line up with GPU stats
+                with gr.Accordion("📈 Resource History", open=False):
+                    chart_options = dict(x="time", y="value", color="series", height=220)
+                    with gr.Row():
+                        gpu_util_plot = gr.LinePlot(title="GPU Utilization (%)", **chart_options)
+                        gpu_memory_plot = gr.LinePlot(title="VRAM Used (GB)", **chart_options)
+                        gpu_temp_plot = gr.LinePlot(title="GPU Temperature (°C)", **chart_options)
+                    with gr.Row():
+                        storage_plot = gr.LinePlot(title="Disk / RAM Used (GB)", **chart_options)
+                        throughput_plot = gr.LinePlot(title="Throughput (it/s)", **chart_options)
+                        loss_plot = gr.LinePlot(title="Loss", **chart_options)
+                
                 # Training event handlers
-                start_btn.click(
+                start_event = start_btn.click(
                     fn=start_training,
-                    inputs=[train_dataset, lora_name, steps, resolution, batch_size, learning_rate],
-                    outputs=[training_status_text, training_logs]
+                    inputs=[train_dataset, lora_name, steps, resolution, batch_size, learning_rate, preprocess],
+                    outputs=[training_status_text, training_logs, job_table, job_select]
                 )
                 
-                stop_btn.click(
+                analyze_btn.click(
+                    fn=analyze_training_dataset,
+                    inputs=[train_dataset, resolution, batch_size, steps],
+                    outputs=dataset_report
+                )
+                
+                stop_event = stop_btn.click(
                     fn=stop_training,
+                    inputs=job_select,
                     outputs=[training_status_text, training_logs]
                 )
                 
-                refresh_logs_btn.click(
+                refresh_logs_event = refresh_logs_btn.click(
                     fn=get_training_logs,
+                    inputs=job_select,
                     outputs=[training_logs, training_status]
                 )
                 
@@ -714,11 +1379,69 @@ def create_ui():
                     outputs=system_info
                 )
                 
-                # Auto-refresh logs every 3 seconds when on training tab
-                training_logs.change(
-                    fn=lambda: None,
-                    inputs=None,
-                    outputs=None
+                # Reads the sampler's cache, so every open tab can poll it cheaply
+                system_timer = gr.Timer(system_metrics.METRICS_INTERVAL)
+                system_timer.tick(
+                    fn=get_system_info,
+                    outputs=system_info,
+                    show_progress="hidden"
+                )
+                
+                job_up_btn.click(
+                    fn=lambda job_id: move_job(job_id, -1),
+                    inputs=job_select,
+                    outputs=[job_table, job_select]
+                )
+                
+                job_down_btn.click(
+                    fn=lambda job_id: move_job(job_id, 1),
+                    inputs=job_select,
+                    outputs=[job_table, job_select]
+                )
+                
+                job_cancel_btn.click(
+                    fn=cancel_selected_job,
+                    inputs=job_select,
+                    outputs=[job_table, job_select]
+                )
+                
+                # Push new log lines to every open tab at a bounded rate
+                log_timer = gr.Timer(LOG_STREAM_INTERVAL)
+                log_stream_seen = gr.State(None)
+                log_delta_json = gr.JSON(visible=False)
+                log_timer.tick(
+                    fn=stream_training_logs,
+                    inputs=[log_stream_seen, job_select],
+                    outputs=[log_delta_json, training_status, log_stream_seen],
+                    show_progress="hidden"
+                ).then(
+                    fn=None,
+                    inputs=[log_delta_json, training_logs],
+                    outputs=training_logs,
+                    js=APPEND_LOG_JS,
+                    show_progress="hidden"
+                )
+                
+                # These show the whole log; the next tick then starts over from it
+                for event in (start_event, stop_event, refresh_logs_event):
+                    event.then(fn=lambda: None, outputs=log_stream_seen, show_progress="hidden")
+                
+                chart_timer = gr.Timer(CHART_REFRESH_INTERVAL)
+                charts_seen = gr.State(None)
+                chart_timer.tick(
+                    fn=stream_resource_charts,
+                    inputs=[charts_seen, job_select],
+                    outputs=[gpu_util_plot, gpu_memory_plot, gpu_temp_plot, storage_plot,
+                             throughput_plot, loss_plot, charts_seen],
+                    show_progress="hidden"
+                )
+                
+                job_queue_seen = gr.State(None)
+                log_timer.tick(
+                    fn=stream_job_queue,
+                    inputs=job_queue_seen,
+                    outputs=[job_table, job_select, job_queue_seen],
+                    show_progress="hidden"
                 )
             
             # ================================================================
@@ -732,6 +1455,23 @@ def create_ui():
                 gr.Textbox(value=OUTPUT_DIR, label="Output Directory", interactive=False)
                 gr.Textbox(value=SD_SCRIPTS_DIR, label="SD-Scripts Directory", interactive=False)
                 
+                gr.Markdown("---")
+                gr.Markdown("### 📦 Models")
+                model_status = gr.Markdown(get_model_status())
+                retry_models_btn = gr.Button("⬇️ Download Missing Models")
+                
+                retry_models_btn.click(
+                    fn=retry_model_download,
+                    outputs=model_status
+                )
+                
+                model_status_timer = gr.Timer(MODEL_STATUS_INTERVAL)
+                model_status_timer.tick(
+                    fn=get_model_status,
+                    outputs=model_status,
+                    show_progress="hidden"
+                )
+                
                 gr.Markdown("---")
                 gr.Markdown("### ℹ️ About")
                 gr.Markdown("""
@@ -752,11 +1492,17 @@ def create_ui():
 # ============================================================================
 
 if __name__ == "__main__":
+    # Fetch the base models while the user is still setting up datasets
+    model_prefetch.start_prefetch(WORKSPACE_DIR)
+    system_metrics.get_sampler(WORKSPACE_DIR)
+    # Pick up jobs that were still queued when the UI last stopped
+    job_scheduler.start()
     app = create_ui()
-    app.launch(
-        server_name="0.0.0.0",
-        server_port=int(os.environ.get("PORT", 7860)),
-        share=False,
+    # Serve the UI next to a Prometheus /metrics route on the same port
+    server = metrics_export.create_server(
+        app,
+        render_metrics,
         show_error=True,
         allowed_paths=[WORKSPACE_DIR, DATASETS_DIR, OUTPUT_DIR, "/tmp"]
     )
+    uvicorn.run(server, host="0.0.0.0", port=int(os.environ.get("PORT", 7860)))
@@ -0,0 +1,241 @@
+"""
+🧬 Image Dedup
+Near-duplicate detection for datasets with perceptual hashes.
+
+Every image gets a 64-bit pHash (low frequencies of a DCT) and dHash
+(horizontal gradients), computed in a process pool and cached per dataset
+by file size and mtime, so a rescan only hashes new or edited files.
+
+Candidate pairs come from multi-index hashing: the pHash is split into four
+16-bit chunks, and two hashes within ``threshold`` bits must agree on at
+least one chunk up to ``threshold // 4`` flipped bits. That turns the
+O(n²) comparison into a handful of dict lookups per image. Pairs within
+the threshold on both hashes are merged into clusters.
+"""
+
+import hashlib
+import json
+import math
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional, dedup is then unavailable
+    Image = None
+
+import dataset_index
+
+# ============================================================================
+# Configuration
+# ============================================================================
+
+DEDUP_THRESHOLD = int(os.environ.get("DEDUP_THRESHOLD", 6))  # max differing bits of 64
+DEDUP_WORKERS = int(os.environ.get("DEDUP_WORKERS", min(8, os.cpu_count() or 1)))
+
+HASH_BITS = 64
+CHUNKS = 4
+CHUNK_BITS = HASH_BITS // CHUNKS
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+
+# Below this many images to hash a process pool costs more than it saves
+INLINE_HASH_LIMIT = 8
+
+_DCT_SIZE = 32
+_DCT_KEEP = 8
+_DCT_COS = [[math.cos(math.pi * (2 * x + 1) * u / (2 * _DCT_SIZE)) for x in range(_DCT_SIZE)]
+            for u in range(_DCT_KEEP)]
+
+_executor = None
+_executor_lock = threading.Lock()
+_cache_lock = threading.Lock()
+
+
+# ============================================================================
+# Hashing
+# ============================================================================
+
+def _dhash(img):
+    pixels = list(img.convert("L").resize((9, 8), Image.BILINEAR).getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return bits
+
+
+def _phash(img):
+    pixels = list(img.convert("L").resize((_DCT_SIZE, _DCT_SIZE), Image.BILINEAR).getdata())
+    rows = [pixels[y * _DCT_SIZE:(y + 1) * _DCT_SIZE] for y in range(_DCT_SIZE)]
+    # Separable 2-D DCT, keeping only the 8x8 lowest frequencies
+    partial = [[sum(c * p for c, p in zip(cos_u, row)) for cos_u in _DCT_COS] for row in rows]
+    coeffs = [sum(_DCT_COS[v][y] * partial[y][u] for y in range(_DCT_SIZE))
+              for v in range(_DCT_KEEP) for u in range(_DCT_KEEP)]
+    median = sorted(coeffs[1:])[len(coeffs) // 2 - 1]  # DC term excluded
+    bits = 0
+    for c in coeffs:
+        bits = (bits << 1) | (c > median)
+    return bits
+
+
+def hash_image(path):
+    """Return ``(phash, dhash, width, height)`` of one image, or None if unreadable."""
+    try:
+        with Image.open(path) as img:
+            size = img.size
+            # JPEG can decode at 1/8 scale; the hashes only need 32x32
+            img.draft("RGB", (_DCT_SIZE * 2, _DCT_SIZE * 2))
+            return _phash(img), _dhash(img), size[0], size[1]
+    except Exception:
+        return None
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=DEDUP_WORKERS)
+        return _executor
+
+
+def _cache_path(cache_dir, dataset_path):
+    digest = hashlib.sha1(os.path.abspath(dataset_path).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, f"{digest}.json")
+
+
+def _load_cache(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(path, hashes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(hashes, f)
+    os.replace(tmp_path, path)
+
+
+def get_hashes(dataset_path, cache_dir):
+    """``{name: (phash, dhash, width, height)}`` for every readable image of a dataset.
+
+    Hashes are cached on disk by file size and mtime; only new or changed
+    images are decoded.
+    """
+    entries = dataset_index.get_index(dataset_path).images
+    cache_path = _cache_path(cache_dir, dataset_path)
+    with _cache_lock:
+        cached = _load_cache(cache_path)
+
+    hashes = {}
+    fresh = {}
+    missing = []
+    for entry in entries:
+        record = cached.get(entry.name)
+        if record and record[0] == entry.size and record[1] == entry.mtime_ns:
+            fresh[entry.name] = record
+            if record[2] is not None:
+                hashes[entry.name] = tuple(record[2:])
+        else:
+            missing.append(entry)
+
+    if len(missing) <= INLINE_HASH_LIMIT:
+        results = [hash_image(entry.path) for entry in missing]
+    else:
+        results = _get_executor().map(hash_image, [entry.path for entry in missing], chunksize=32)
+
+    for entry, result in zip(missing, results):
+        # Unreadable files are cached too, so they aren't retried every scan
+        fresh[entry.name] = [entry.size, entry.mtime_ns] + (list(result) if result else [None])
+        if result:
+            hashes[entry.name] = result
+
+    if missing or len(fresh) != len(cached):
+        with _cache_lock:
+            _save_cache(cache_path, fresh)
+    return hashes
+
+
+# ============================================================================
+# Clustering
+# ============================================================================
+
+def _flip_masks(bits, radius):
+    """Every mask of ``bits`` bits with at most ``radius`` bits set."""
+    masks = [0]
+    for r in range(1, radius + 1):
+        for positions in combinations(range(bits), r):
+            mask = 0
+            for p in positions:
+                mask |= 1 << p
+            masks.append(mask)
+    return masks
+
+
+def find_pairs(phashes, threshold=DEDUP_THRESHOLD):
+    """Index pairs ``(i, j)``, i < j, whose hashes differ in at most ``threshold`` bits."""
+    masks = _flip_masks(CHUNK_BITS, threshold // CHUNKS)
+    tables = [{} for _ in range(CHUNKS)]
+    pairs = []
+    for j, h in enumerate(phashes):
+        candidates = set()
+        chunks = [(h >> (c * CHUNK_BITS)) & CHUNK_MASK for c in range(CHUNKS)]
+        for table, chunk in zip(tables, chunks):
+            for mask in masks:
+                bucket = table.get(chunk ^ mask)
+                if bucket:
+                    candidates.update(bucket)
+        for i in candidates:
+            if (phashes[i] ^ h).bit_count() <= threshold:
+                pairs.append((i, j))
+        for table, chunk in zip(tables, chunks):
+            table.setdefault(chunk, []).append(j)
+    return pairs
+
+
+def find_clusters(hashes, threshold=DEDUP_THRESHOLD):
+    """Group near-duplicate images.
+
+    ``hashes`` is ``{name: (phash, dhash, ...)}``. Returns a list of clusters
+    (lists of names, at least two each), largest clusters first.
+    """
+    names = list(hashes)
+    parent = list(range(len(names)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in find_pairs([hashes[n][0] for n in names], threshold):
+        # The dHash has to agree as well, which weeds out flat or low-detail
+        # images whose DCTs happen to look alike
+        if (hashes[names[i]][1] ^ hashes[names[j]][1]).bit_count() <= threshold:
+            parent[find(i)] = find(j)
+
+    groups = {}
+    for i, name in enumerate(names):
+        groups.setdefault(find(i), []).append(name)
+    clusters = [group for group in groups.values() if len(group) > 1]
+    clusters.sort(key=len, reverse=True)
+    return clusters
+
+
+def pick_keeper(cluster, hashes, index):
+    """The image to keep from a cluster: most pixels, then captioned, then largest file."""
+    def rank(name):
+        entry = index.get(name)
+        has_caption = entry is not None and entry.caption_mtime_ns is not None
+        return hashes[name][2] * hashes[name][3], has_caption, entry.size if entry else 0, name
+    return max(cluster, key=rank)
+
+
+def available():
+    """True if Pillow is installed and images can be hashed."""
+    return Image is not None
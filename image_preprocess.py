@@ -0,0 +1,300 @@
+"""
+📐 Image Preprocessing
+Resize a dataset to its training buckets once, before launch.
+
+sd-scripts decodes and downsamples every full-size upload on each latent
+caching pass. Here each image is EXIF-rotated, scaled and center-cropped to
+the bucket sd-scripts would pick for it (same bucket table and selection
+rule as its ``BucketManager``), and written to a derived dataset directory
+next to its caption. A manifest keyed by content hash and settings lets
+re-runs skip images that haven't changed.
+"""
+
+import hashlib
+import json
+import math
+import os
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional, training then uses the originals
+    Image = None
+
+import dataset_index
+
+# ============================================================================
+# Configuration
+# ============================================================================
+
+# Bucket settings passed to sd-scripts; the derived images must match them
+MIN_BUCKET_RESO = 256
+MAX_BUCKET_RESO = 768
+BUCKET_RESO_STEPS = 64
+
+PREPROCESS_FORMAT = os.environ.get("PREPROCESS_FORMAT", "png").lower()  # png, webp or jpeg
+PREPROCESS_QUALITY = 95  # jpeg/webp only
+PREPROCESS_WORKERS = int(os.environ.get("PREPROCESS_WORKERS", min(8, os.cpu_count() or 1)))
+
+MANIFEST_FILENAME = "manifest.json"
+HASH_CHUNK_SIZE = 1024 * 1024
+ORIENTATION_TAG = 0x0112
+
+_dir_locks = {}
+_dir_locks_lock = threading.Lock()
+
+
+# ============================================================================
+# Buckets
+# ============================================================================
+
+def make_bucket_resolutions(max_reso, min_size=MIN_BUCKET_RESO, max_size=MAX_BUCKET_RESO,
+                            divisible=BUCKET_RESO_STEPS):
+    """Sorted ``[(width, height), ...]`` buckets, as sd-scripts' make_bucket_resolutions."""
+    max_width, max_height = max_reso
+    max_area = max_width * max_height
+
+    resos = set()
+    width = int(math.sqrt(max_area) // divisible) * divisible
+    resos.add((width, width))
+
+    width = min_size
+    while width <= max_size:
+        height = min(max_size, int((max_area // width) // divisible) * divisible)
+        if height >= min_size:
+            resos.add((width, height))
+            resos.add((height, width))
+        width += divisible
+
+    return sorted(resos)
+
+
+def select_bucket(width, height, buckets):
+    """Return ``(bucket, resized_size)`` the way sd-scripts' BucketManager.select_bucket does.
+
+    The bucket with the closest aspect ratio wins; the image is scaled so it
+    covers the bucket, and the overflow is cropped away.
+    """
+    aspect_ratio = width / height
+    bucket = min(buckets, key=lambda r: abs(r[0] / r[1] - aspect_ratio))
+    if aspect_ratio > bucket[0] / bucket[1]:
+        scale = bucket[1] / height
+    else:
+        scale = bucket[0] / width
+    return bucket, (int(width * scale + 0.5), int(height * scale + 0.5))
+
+
+# ============================================================================
+# Processing
+# ============================================================================
+
+def file_digest(path):
+    """SHA-1 of a file's contents."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def process_image(src_path, dst_path, buckets, known_digest=None):
+    """Write the bucket-sized version of one image (runs in a worker process).
+
+    Returns ``(digest, bucket, error)``; ``bucket`` is None when the existing
+    output is still current (its source hashes to ``known_digest``).
+    """
+    try:
+        digest = file_digest(src_path)
+        if digest == known_digest and os.path.exists(dst_path):
+            return digest, None, None
+
+        with Image.open(src_path) as img:
+            # Pick the bucket in display orientation, before anything is decoded
+            rotated = img.getexif().get(ORIENTATION_TAG) in (5, 6, 7, 8)
+            width, height = (img.height, img.width) if rotated else img.size
+            bucket, resized = select_bucket(width, height, buckets)
+            # JPEG can decode at 1/2, 1/4 or 1/8 scale, which skips most of the work
+            img.draft("RGB", (resized[1], resized[0]) if rotated else resized)
+            img = ImageOps.exif_transpose(img)
+            if img.mode not in ("RGB", "RGBA") or PREPROCESS_FORMAT == "jpeg":
+                img = img.convert("RGB")
+            img = img.resize(resized, Image.LANCZOS)
+
+            left = (resized[0] - bucket[0]) // 2
+            top = (resized[1] - bucket[1]) // 2
+            img = img.crop((left, top, left + bucket[0], top + bucket[1]))
+
+            tmp_path = f"{dst_path}.{os.getpid()}.tmp"
+            img.save(tmp_path, format=PREPROCESS_FORMAT.upper(), quality=PREPROCESS_QUALITY)
+        os.replace(tmp_path, dst_path)
+        return digest, list(bucket), None
+    except Exception as e:
+        return None, None, str(e)
+
+
+def available():
+    """True if Pillow is installed and images can be preprocessed."""
+    return Image is not None
+
+
+def derived_dir(cache_root, dataset_name, resolution):
+    """Directory holding the preprocessed copy of a dataset at one resolution."""
+    return os.path.join(cache_root, f"{dataset_name}-{resolution}")
+
+
+def _settings(resolution):
+    return {
+        "resolution": int(resolution),
+        "min_bucket_reso": MIN_BUCKET_RESO,
+        "max_bucket_reso": MAX_BUCKET_RESO,
+        "bucket_reso_steps": BUCKET_RESO_STEPS,
+        "format": PREPROCESS_FORMAT,
+        "quality": PREPROCESS_QUALITY,
+    }
+
+
+def _read_manifest(path, settings):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("settings") != settings:
+        return {}  # different buckets or encoding: every output is stale
+    return manifest.get("images", {})
+
+
+def _write_manifest(path, settings, images):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"settings": settings, "images": images}, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def _sync_caption(entry, dst_dir, dst_stem):
+    dst = os.path.join(dst_dir, dst_stem + dataset_index.CAPTION_EXTENSION)
+    src = entry.caption_path
+    if entry.caption_mtime_ns is None:
+        if os.path.exists(dst):
+            os.remove(dst)
+        return
+    try:
+        if os.stat(dst).st_mtime_ns == entry.caption_mtime_ns:
+            return
+    except FileNotFoundError:
+        pass
+    shutil.copy2(src, dst)
+
+
+def _dir_lock(path):
+    with _dir_locks_lock:
+        return _dir_locks.setdefault(path, threading.Lock())
+
+
+def preprocess_dataset(src_dir, dst_dir, resolution, on_progress=None, workers=PREPROCESS_WORKERS,
+                       cancel=None):
+    """Bring ``dst_dir`` up to date with ``src_dir`` resized to ``resolution`` buckets.
+
+    Unchanged images (same size and mtime, or same content hash) are skipped
+    and outputs of removed images deleted. ``on_progress(done, total)`` is
+    called as images finish. Returns ``(processed, skipped, failed)`` where
+    ``failed`` is a list of ``(name, error)``; failed images are left out of
+    the derived dataset. Setting the ``cancel`` event stops after the images
+    in progress; what finished is kept for the next run.
+    """
+    if Image is None:
+        raise RuntimeError("Pillow is required to preprocess images")
+
+    dst_dir = os.path.abspath(dst_dir)
+    with _dir_lock(dst_dir):
+        os.makedirs(dst_dir, exist_ok=True)
+        settings = _settings(resolution)
+        manifest_path = os.path.join(dst_dir, MANIFEST_FILENAME)
+        old = _read_manifest(manifest_path, settings)
+        buckets = make_bucket_resolutions((settings["resolution"], settings["resolution"]))
+        ext = "jpg" if PREPROCESS_FORMAT == "jpeg" else PREPROCESS_FORMAT
+
+        # In-place edits don't move the directory mtime, so always re-list
+        index = dataset_index.get_index(src_dir, refresh=False)
+        index.refresh(force=True)
+        entries = index.images
+        images = {}
+        todo = []
+        failed = []
+        stems = {}
+        for entry in entries:
+            stem = os.path.splitext(entry.name)[0]
+            output = f"{stem}.{ext}"
+            # a.png and a.jpg would write the same output (and share a caption)
+            if stem in stems:
+                failed.append((entry.name, f"same file name as {stems[stem]}, rename one of them"))
+                continue
+            stems[stem] = entry.name
+            _sync_caption(entry, dst_dir, stem)
+            record = old.get(entry.name)
+            if (record and record["size"] == entry.size and record["mtime_ns"] == entry.mtime_ns
+                    and os.path.exists(os.path.join(dst_dir, output))):
+                images[entry.name] = record
+            else:
+                todo.append((entry, output, record["digest"] if record else None))
+
+        processed = 0
+        done = len(entries) - len(todo)
+        if on_progress:
+            on_progress(done, len(entries))
+
+        def finish(entry, output, result):
+            nonlocal processed, done
+            digest, bucket, error = result
+            done += 1
+            if error:
+                failed.append((entry.name, error))
+            else:
+                record = dict(old.get(entry.name) or {}, output=output, digest=digest,
+                              size=entry.size, mtime_ns=entry.mtime_ns)
+                if bucket is not None:
+                    record["bucket"] = bucket
+                    processed += 1
+                images[entry.name] = record
+            if on_progress:
+                on_progress(done, len(entries))
+
+        if len(todo) <= 1 or workers <= 1:
+            for entry, output, digest in todo:
+                if cancel is not None and cancel.is_set():
+                    break
+                finish(entry, output, process_image(entry.path, os.path.join(dst_dir, output), buckets, digest))
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as executor:
+                futures = {
+                    executor.submit(process_image, entry.path, os.path.join(dst_dir, output), buckets, digest):
+                        (entry, output)
+                    for entry, output, digest in todo
+                }
+                for future in as_completed(futures):
+                    if future.cancelled():
+                        continue
+                    finish(*futures[future], future.result())
+                    if cancel is not None and cancel.is_set():
+                        for pending in futures:
+                            pending.cancel()
+
+        # Drop outputs (and captions) of images that were removed or failed. Only
+        # image, caption and temp files are swept: the latent and text encoder
+        # caches sd-scripts writes next to the images must survive.
+        # A cancelled run skips this, since images it didn't get to aren't in ``keep``.
+        if cancel is None or not cancel.is_set():
+            keep = {record["output"] for record in images.values()}
+            keep |= {stem + dataset_index.CAPTION_EXTENSION for stem in stems}
+            sweep = dataset_index.IMAGE_EXTENSIONS + (dataset_index.CAPTION_EXTENSION, ".tmp")
+            with os.scandir(dst_dir) as it:
+                for item in it:
+                    if (item.name.lower().endswith(sweep) and item.name not in keep
+                            and item.is_file()):
+                        os.remove(item.path)
+
+        _write_manifest(manifest_path, settings, images)
+        dataset_index.get_index(dst_dir, refresh=False).invalidate()
+        return processed, len(entries) - processed - len(failed), failed
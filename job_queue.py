@@ -0,0 +1,305 @@
+"""
+📋 Job Queue
+Persistent queue of training jobs, started by a scheduler thread as soon as
+a slot (a GPU, or the whole machine when there are none) is free.
+
+Jobs (their spec and generated command) live in a JSON file in the
+workspace, so queued work survives UI restarts. A job that was running when
+the UI went away can't be re-attached and is marked ``interrupted``. Jobs
+with a run directory get their state mirrored into its meta.json.
+"""
+
+import json
+import os
+import threading
+import time
+
+import run_dirs
+
+# ============================================================================
+# Configuration
+# ============================================================================
+
+# Finished jobs kept in the queue file for the history table
+JOB_HISTORY = int(os.environ.get("JOB_HISTORY", 50))
+
+# How often queued jobs that found no free slot look again
+SCHEDULER_POLL_INTERVAL = float(os.environ.get("SCHEDULER_POLL_INTERVAL", 10))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+INTERRUPTED = "interrupted"
+
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+STATE_ICONS = {
+    QUEUED: "⏳",
+    RUNNING: "🟢",
+    DONE: "✅",
+    FAILED: "❌",
+    CANCELLED: "🚫",
+    INTERRUPTED: "⚠️",
+}
+
+
+# ============================================================================
+# Queue
+# ============================================================================
+
+class JobQueue:
+    """Ordered list of jobs persisted to ``path`` after every change."""
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.version = 0
+        self._lock = threading.RLock()
+        self._jobs = []
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._jobs = json.load(f).get("jobs", [])
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError):
+            # Keep the unreadable file around instead of silently losing the queue
+            os.replace(self.path, f"{self.path}.corrupt")
+            return
+
+        interrupted = False
+        for job in self._jobs:
+            if job["state"] == RUNNING:
+                job.update(state=INTERRUPTED, finished=time.time())
+                self._sync_meta(job)
+                interrupted = True
+        if interrupted:
+            self._save()
+
+    def _save(self):
+        finished = [j for j in self._jobs if j["state"] not in ACTIVE_STATES]
+        if len(finished) > JOB_HISTORY:
+            drop = {j["id"] for j in sorted(finished, key=lambda j: j.get("finished") or 0)[:-JOB_HISTORY]}
+            self._jobs = [j for j in self._jobs if j["id"] not in drop]
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"jobs": self._jobs}, f, indent=2)
+        os.replace(tmp, self.path)
+        self.version += 1
+
+    def _sync_meta(self, job):
+        if job.get("run_dir") and os.path.isdir(job["run_dir"]):
+            run_dirs.update_meta(job["run_dir"], **{k: job[k] for k in
+                                 ("state", "started", "finished", "returncode", "error")})
+
+    def jobs(self):
+        """Snapshot of all jobs in queue order."""
+        with self._lock:
+            return [dict(j) for j in self._jobs]
+
+    def get(self, job_id):
+        with self._lock:
+            for job in self._jobs:
+                if job["id"] == job_id:
+                    return dict(job)
+        return None
+
+    def position(self, job_id):
+        """1-based position among the queued jobs, or None if it isn't queued."""
+        with self._lock:
+            queued = [j["id"] for j in self._jobs if j["state"] == QUEUED]
+        return queued.index(job_id) + 1 if job_id in queued else None
+
+    def has_queued(self):
+        with self._lock:
+            return any(j["state"] == QUEUED for j in self._jobs)
+
+    def enqueue(self, spec, command, run_dir=None, job_id=None):
+        """Append a job and return it."""
+        job = {
+            "id": job_id or run_dirs.new_run_id(),
+            "state": QUEUED,
+            "spec": spec,
+            "command": command,
+            "run_dir": run_dir,
+            "created": time.time(),
+            "started": None,
+            "finished": None,
+            "returncode": None,
+            "error": "",
+        }
+        with self._lock:
+            self._jobs.append(job)
+            self._save()
+        return dict(job)
+
+    def move(self, job_id, delta):
+        """Move a queued job ``delta`` places among the other queued jobs. Returns True if it moved."""
+        with self._lock:
+            queued = [i for i, j in enumerate(self._jobs) if j["state"] == QUEUED]
+            index = next((n for n, i in enumerate(queued) if self._jobs[i]["id"] == job_id), None)
+            if index is None:
+                return False
+            target = min(max(index + delta, 0), len(queued) - 1)
+            if target == index:
+                return False
+            # Reorder the queued jobs among their own slots; finished ones stay put
+            order = [self._jobs[i] for i in queued]
+            order.insert(target, order.pop(index))
+            for slot, job in zip(queued, order):
+                self._jobs[slot] = job
+            self._save()
+            return True
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job. Returns its previous state, or None."""
+        with self._lock:
+            for job in self._jobs:
+                if job["id"] == job_id and job["state"] in ACTIVE_STATES:
+                    previous = job["state"]
+                    job.update(state=CANCELLED, finished=time.time())
+                    self._save()
+                    self._sync_meta(job)
+                    return previous
+        return None
+
+    def claim_next(self):
+        """Mark the first queued job as running and return it, or None if there is none."""
+        with self._lock:
+            for job in self._jobs:
+                if job["state"] == QUEUED:
+                    job.update(state=RUNNING, started=time.time())
+                    self._save()
+                    self._sync_meta(job)
+                    return dict(job)
+        return None
+
+    def finish(self, job_id, state, **fields):
+        """Record the outcome of a running job (a cancelled job stays cancelled)."""
+        with self._lock:
+            for job in self._jobs:
+                if job["id"] == job_id:
+                    if job["state"] == RUNNING:
+                        job["state"] = state
+                        job["finished"] = time.time()
+                    job.update(fields)
+                    self._save()
+                    self._sync_meta(job)
+                    return
+
+
+# ============================================================================
+# Scheduler
+# ============================================================================
+
+class JobScheduler:
+    """Runs queued jobs on a background thread, one per free slot.
+
+    ``discover_slots()`` returns the slots a job could start on right now
+    (e.g. GPU indices with enough free memory), or None when there is
+    nothing to pin jobs to; then jobs run one at a time with slot None.
+    ``run_job(job, slot)`` does the actual work and returns the process
+    exit code (0 for success); exceptions mark the job as failed. It can
+    check ``cancel_event(job_id)`` between its phases to stop early.
+    """
+
+    def __init__(self, queue, run_job, discover_slots=None):
+        self.queue = queue
+        self.run_job = run_job
+        self.discover_slots = discover_slots
+        self._running = {}  # job id -> slot
+        self._cancel = {}  # job id -> event set when the running job is cancelled
+        self._slots_seen = False
+        self._wake = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        """Snapshot of ``{job id: slot}`` for the jobs being run."""
+        with self._lock:
+            return dict(self._running)
+
+    @property
+    def busy(self):
+        with self._lock:
+            return bool(self._running)
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job and signal its run. Returns its previous state, or None."""
+        with self._lock:
+            previous = self.queue.cancel(job_id)
+            event = self._cancel.get(job_id)
+        if event is not None:
+            event.set()
+        return previous
+
+    def cancel_event(self, job_id):
+        """Event that is set once the running job ``job_id`` is cancelled."""
+        with self._lock:
+            return self._cancel.get(job_id) or threading.Event()
+
+    def start(self):
+        """Start the scheduler thread if needed and let it look at the queue."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="job-scheduler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.clear()
+            waiting = self._dispatch()
+            # Queued jobs waiting for a slot: re-check now and then, since
+            # memory can also be freed by processes outside this UI
+            self._wake.wait(SCHEDULER_POLL_INTERVAL if waiting else None)
+
+    def _free_slots(self):
+        slots = self.discover_slots() if self.discover_slots else None
+        running = self.running
+        if slots is None:
+            # Once slots were seen, None is a failed lookup (e.g. nvidia-smi timing
+            # out): wait for the next one rather than start an unpinned job next to
+            # pinned ones. The unpinned slot also needs the machine to itself.
+            if self._slots_seen or running:
+                return []
+            slots = [None]
+        else:
+            self._slots_seen = True
+        busy = set(running.values())
+        return [slot for slot in slots if slot not in busy]
+
+    def _dispatch(self):
+        """Start queued jobs on free slots. Returns True if jobs are left waiting."""
+        while self.queue.has_queued():
+            free = self._free_slots()
+            if not free:
+                return True
+            # Claimed and registered under the lock, so a cancel can't slip in between
+            with self._lock:
+                job = self.queue.claim_next()
+                if job is None:
+                    return False
+                self._running[job["id"]] = free[0]
+                self._cancel[job["id"]] = threading.Event()
+            threading.Thread(target=self._execute, args=(job, free[0]),
+                             name=f"job-{job['id']}", daemon=True).start()
+        return False
+
+    def _execute(self, job, slot):
+        try:
+            returncode = self.run_job(job, slot)
+            self.queue.finish(job["id"], DONE if returncode == 0 else FAILED, returncode=returncode)
+        except Exception as e:
+            self.queue.finish(job["id"], FAILED, error=str(e))
+        finally:
+            with self._lock:
+                self._running.pop(job["id"], None)
+                self._cancel.pop(job["id"], None)
+            self._wake.set()
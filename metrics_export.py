@@ -0,0 +1,147 @@
+"""
+📡 Metrics Export
+Prometheus text exposition of training and host state for a ``/metrics`` route.
+
+Everything is read from state the UI already keeps in memory (progress
+trackers, job queue, model prefetch, metrics sampler, dataset indexes), so
+a scrape never touches the disk or forks a process.
+"""
+
+import math
+import os
+
+import dataset_index
+
+# ============================================================================
+# Configuration
+# ============================================================================
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+METRIC_PREFIX = os.environ.get("METRIC_PREFIX", "lora_trainer_")
+
+
+# ============================================================================
+# Exposition Format
+# ============================================================================
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    value = float(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(int(value)) if value.is_integer() and abs(value) < 2**53 else repr(value)
+
+
+class MetricsWriter:
+    """Collects samples grouped by metric family and renders the text format."""
+
+    def __init__(self, prefix=METRIC_PREFIX):
+        self.prefix = prefix
+        self._families = {}  # name -> (kind, help, lines), in insertion order
+
+    def add(self, name, value, help_text, kind="gauge", /, **labels):
+        """Add one sample. ``None`` values (unknown yet) are skipped.
+
+        The metric arguments are positional-only, so any label name
+        (including ``name``) can be passed as a keyword.
+        """
+        if value is None:
+            return
+        name = self.prefix + name
+        family = self._families.setdefault(name, (kind, help_text, []))
+        label_text = ""
+        if labels:
+            label_text = "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+        family[2].append(f"{name}{label_text} {_format_value(value)}")
+
+    def render(self):
+        out = []
+        for name, (kind, help_text, lines) in self._families.items():
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+            out.extend(lines)
+        return "\n".join(out) + "\n"
+
+
+# ============================================================================
+# Collectors
+# ============================================================================
+
+def add_progress(writer, tracker, **labels):
+    """Step, loss, it/s and ETA from a training_progress.ProgressTracker."""
+    sample = tracker.latest()
+    if sample is None:
+        return
+    writer.add("training_step", sample.step, "Current optimizer step.", **labels)
+    writer.add("training_total_steps", sample.total, "Total steps of the run.", **labels)
+    writer.add("training_loss", sample.loss, "Last reported loss.", **labels)
+    writer.add("training_avr_loss", sample.avr_loss, "Running average loss.", **labels)
+    writer.add("training_iterations_per_second", sample.it_per_sec, "Training throughput.", **labels)
+    writer.add("training_eta_seconds", sample.eta, "Estimated time remaining.", **labels)
+    writer.add("training_last_progress_timestamp_seconds", sample.time,
+               "Unix time of the last progress update.", **labels)
+
+
+def add_host(writer, sampler):
+    """GPU, CPU, RAM and disk from the system_metrics sampler's latest sample."""
+    sample = sampler.latest()
+    if sample is None:
+        return
+    mb = 1024 * 1024
+    for gpu in sample.gpus:
+        labels = {"gpu": gpu.index, "name": gpu.name}
+        writer.add("gpu_utilization_percent", gpu.utilization, "GPU utilization.", **labels)
+        writer.add("gpu_memory_used_bytes", None if gpu.memory_used is None else gpu.memory_used * mb,
+                   "GPU memory in use.", **labels)
+        writer.add("gpu_memory_total_bytes", None if gpu.memory_total is None else gpu.memory_total * mb,
+                   "GPU memory size.", **labels)
+        writer.add("gpu_temperature_celsius", gpu.temperature, "GPU temperature.", **labels)
+    writer.add("cpu_utilization_percent", sample.cpu_percent, "Host CPU utilization.")
+    writer.add("memory_used_bytes", sample.ram_used, "Host RAM in use.")
+    writer.add("memory_total_bytes", sample.ram_total, "Host RAM size.")
+    writer.add("disk_used_bytes", sample.disk_used, "Workspace volume usage.")
+    writer.add("disk_total_bytes", sample.disk_total, "Workspace volume size.")
+    writer.add("metrics_sample_timestamp_seconds", sample.time, "Unix time of the host sample.")
+
+
+def add_prefetch(writer, prefetch):
+    """Per-model download progress from a model_prefetch.ModelPrefetch."""
+    for filename, status in prefetch.status.items():
+        labels = {"model": filename}
+        writer.add("model_ready", status["state"] == "ready", "1 once the model file is verified.", **labels)
+        writer.add("model_download_bytes", status["downloaded"], "Bytes downloaded so far.", **labels)
+        writer.add("model_download_total_bytes", status["total"] or None, "Model file size.", **labels)
+
+
+def add_datasets(writer, datasets_dir):
+    """Image counts of the datasets whose index is already loaded."""
+    datasets_dir = os.path.abspath(datasets_dir)
+    for path, count in sorted(dataset_index.cached_counts().items()):
+        if os.path.dirname(path) == datasets_dir:
+            writer.add("dataset_images", count, "Images in the dataset.", dataset=os.path.basename(path))
+
+
+# ============================================================================
+# Server
+# ============================================================================
+
+def create_server(blocks, render, **mount_kwargs):
+    """FastAPI app serving ``render()`` at /metrics, with the Gradio app mounted at /."""
+    import gradio as gr
+    from fastapi import FastAPI
+    from fastapi.responses import PlainTextResponse
+
+    server = FastAPI()
+
+    @server.get("/metrics")
+    def metrics():
+        return PlainTextResponse(render(), media_type=CONTENT_TYPE)
+
+    return gr.mount_gradio_app(server, blocks, path="/", **mount_kwargs)
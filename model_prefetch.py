@@ -0,0 +1,179 @@
+"""
+📦 Model Prefetch
+Background download of the base models, started when the UI launches.
+
+Each model is tracked individually (state, bytes done, error), so the UI can
+show progress and training only has to wait for the files it still lacks
+instead of re-running the whole downloader synchronously.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import download_models
+from download_models import DownloadError
+
+# ============================================================================
+# Configuration
+# ============================================================================
+
+# Set MODEL_PREFETCH=0 to only download when training actually needs the files
+MODEL_PREFETCH = os.environ.get("MODEL_PREFETCH", "1") != "0"
+
+# How often a run waiting for downloads checks whether it was cancelled (seconds)
+CANCEL_POLL_INTERVAL = 0.5
+
+STATE_ICONS = {
+    "pending": "⏸️",
+    "downloading": "⬇️",
+    "ready": "✅",
+    "failed": "❌",
+}
+
+
+# ============================================================================
+# Prefetch
+# ============================================================================
+
+class ModelPrefetch:
+    """Downloads ``models`` into ``workspace_dir`` on a background thread."""
+
+    def __init__(self, workspace_dir, models=None):
+        self.workspace_dir = os.path.abspath(workspace_dir)
+        self.models = models or download_models.MODELS
+        self.status = {
+            m["filename"]: {"name": m["name"], "state": "pending", "downloaded": 0, "total": 0, "error": ""}
+            for m in self.models
+        }
+        self._done = {m["filename"]: threading.Event() for m in self.models}
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start (or retry) the prefetch. Returns False if it is already running."""
+        with self._lock:
+            if self.running:
+                return False
+            todo = [m for m in self.models if self.status[m["filename"]]["state"] != "ready"]
+            if not todo:
+                return False
+            # Clear before the thread starts so a waiter can't see a stale "done"
+            for model in todo:
+                self.status[model["filename"]].update(state="pending", error="")
+                self._done[model["filename"]].clear()
+            self._thread = threading.Thread(target=self._run, args=(todo,), name="model-prefetch", daemon=True)
+            self._thread.start()
+            return True
+
+    def _run(self, models):
+        session = download_models.make_session()
+        with ThreadPoolExecutor(max_workers=len(models)) as pool:
+            for model in models:
+                pool.submit(self._fetch, session, model)
+
+    def _fetch(self, session, model):
+        status = self.status[model["filename"]]
+        status["state"] = "downloading"
+
+        def on_progress(downloaded, total):
+            status["downloaded"] = downloaded
+            status["total"] = total
+
+        try:
+            download_models.download_file(model["url"], os.path.join(self.workspace_dir, model["filename"]),
+                                          model["name"], session, sha256=model.get("sha256"),
+                                          store_dir=download_models.model_store_dir(self.workspace_dir),
+                                          progress_callback=on_progress)
+            status["state"] = "ready"
+        except DownloadError as e:
+            download_models.log(f"❌ {e}")
+            status.update(state="failed", error=str(e))
+        except Exception as e:
+            status.update(state="failed", error=f"{model['name']}: {e}")
+        finally:
+            self._done[model["filename"]].set()
+
+    def missing(self, filenames=None):
+        """Filenames (of ``filenames``, default all models) that aren't ready yet."""
+        filenames = filenames or list(self.status)
+        return [f for f in filenames if self.status[f]["state"] != "ready"]
+
+    def wait_for(self, filenames=None, timeout=None, on_wait=None, cancel=None):
+        """Block until the given model files are ready.
+
+        Starts the prefetch if it isn't running. ``on_wait`` is called with a
+        message for every file that actually has to be waited for. Returns
+        False as soon as the ``cancel`` event is set, True once every file is
+        ready. Raises DownloadError if one of them fails or the timeout expires.
+        """
+        missing = self.missing(filenames)
+        if not missing:
+            return True
+        if any(self.status[f]["state"] == "failed" for f in missing) or not self.running:
+            self.start()
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for filename in missing:
+            status = self.status[filename]
+            done = self._done[filename]
+            if not done.is_set() and on_wait:
+                on_wait(f"⏳ Waiting for {status['name']} to finish downloading...")
+            while not done.is_set():
+                if cancel is not None and cancel.is_set():
+                    return False
+                left = None if deadline is None else deadline - time.monotonic()
+                if left is not None and left <= 0:
+                    raise DownloadError(f"Timed out waiting for {status['name']}")
+                # Wake up now and then to notice a cancelled run
+                done.wait(CANCEL_POLL_INTERVAL if left is None else min(left, CANCEL_POLL_INTERVAL))
+            if status["state"] != "ready":
+                raise DownloadError(status["error"] or f"{status['name']} could not be downloaded")
+        return True
+
+    def summary(self):
+        """Markdown table with the state of every model."""
+        lines = ["| Model | Status | Progress |", "|---|---|---|"]
+        for status in self.status.values():
+            state = status["state"]
+            progress = ""
+            if status["total"]:
+                done_mb = status["downloaded"] / (1024 * 1024)
+                total_mb = status["total"] / (1024 * 1024)
+                progress = f"{done_mb:,.0f} / {total_mb:,.0f} MB ({status['downloaded'] / status['total'] * 100:.0f}%)"
+            if state == "failed":
+                progress = status["error"]
+            lines.append(f"| {status['name']} | {STATE_ICONS[state]} {state} | {progress} |")
+        return "\n".join(lines)
+
+
+# ============================================================================
+# Shared Instance
+# ============================================================================
+
+_prefetches = {}
+_prefetches_lock = threading.Lock()
+
+
+def get_prefetch(workspace_dir):
+    """Return the shared prefetch for a workspace."""
+    workspace_dir = os.path.abspath(workspace_dir)
+    with _prefetches_lock:
+        prefetch = _prefetches.get(workspace_dir)
+        if prefetch is None:
+            prefetch = _prefetches[workspace_dir] = ModelPrefetch(workspace_dir)
+        return prefetch
+
+
+def start_prefetch(workspace_dir):
+    """Kick off the background download at UI startup, unless disabled via MODEL_PREFETCH=0."""
+    prefetch = get_prefetch(workspace_dir)
+    if MODEL_PREFETCH:
+        os.makedirs(prefetch.workspace_dir, exist_ok=True)
+        prefetch.start()
+    return prefetch
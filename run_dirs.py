@@ -0,0 +1,92 @@
+"""
+🗂️ Run Directories
+One directory per training job with everything needed to inspect or rerun it:
+
+    runs/<job id>/
+        lora_config.toml   dataset config
+        command.sh         the exact training command
+        training.log       full trainer output
+        meta.json          job spec, timestamps and outcome
+
+``logs/training.log`` stays a symlink to the most recent run's log, so
+existing readers of that path keep working.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+
+# ============================================================================
+# Configuration
+# ============================================================================
+
+RUNS_DIR_NAME = "runs"
+CONFIG_FILENAME = "lora_config.toml"
+COMMAND_FILENAME = "command.sh"
+LOG_FILENAME = "training.log"
+META_FILENAME = "meta.json"
+
+_meta_lock = threading.Lock()
+
+
+# ============================================================================
+# Run Directories
+# ============================================================================
+
+def new_run_id():
+    return uuid.uuid4().hex[:8]
+
+
+def run_dir(workspace_dir, run_id):
+    return os.path.join(workspace_dir, RUNS_DIR_NAME, run_id)
+
+
+def _write_atomic(path, text):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def create_run_dir(path, toml, command, meta):
+    """Write a run's config, command and initial metadata. Returns ``path``."""
+    os.makedirs(path, exist_ok=True)
+    _write_atomic(os.path.join(path, CONFIG_FILENAME), toml)
+
+    command_path = os.path.join(path, COMMAND_FILENAME)
+    _write_atomic(command_path, f"#!/bin/bash\n{command}\n")
+    os.chmod(command_path, 0o755)
+
+    meta = dict(meta, created=meta.get("created") or time.time())
+    _write_atomic(os.path.join(path, META_FILENAME), json.dumps(meta, indent=2))
+    return path
+
+
+def read_meta(path):
+    try:
+        with open(os.path.join(path, META_FILENAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def update_meta(path, **fields):
+    """Merge ``fields`` into a run's meta.json."""
+    with _meta_lock:
+        meta = read_meta(path)
+        meta.update(fields)
+        _write_atomic(os.path.join(path, META_FILENAME), json.dumps(meta, indent=2))
+
+
+def link_latest_log(log_path, latest_path):
+    """Point ``latest_path`` (logs/training.log) at a run's log."""
+    os.makedirs(os.path.dirname(latest_path), exist_ok=True)
+    tmp = f"{latest_path}.{os.getpid()}.tmp"
+    try:
+        os.remove(tmp)
+    except FileNotFoundError:
+        pass
+    os.symlink(os.path.abspath(log_path), tmp)
+    os.replace(tmp, latest_path)
@@ -6,10 +6,10 @@ set -e
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 cd "$SCRIPT_DIR"
 
-# Install requirements if needed
-if ! python3 -c "import gradio" 2>/dev/null; then
+# Install requirements if needed (gr.Timer needs Gradio 4.40 or newer)
+if ! python3 -c "import sys, gradio; sys.exit(tuple(int(p) for p in gradio.__version__.split('.')[:2]) < (4, 40))" 2>/dev/null; then
     echo "📦 Installing Gradio..."
-    pip install -q gradio>=4.0.0 Pillow
+    pip install -q "gradio>=4.40.0" Pillow
 fi
 
 echo "🚀 Starting Chroma LoRA Training UI..."
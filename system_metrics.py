@@ -0,0 +1,221 @@
+"""
+📊 System Metrics
+One long-lived sampler for GPU, CPU, RAM and disk stats, shared by all UI views.
+
+GPU stats come from NVML when ``pynvml`` is installed, otherwise from a
+single ``nvidia-smi --loop-ms`` process whose output is streamed, instead of
+forking nvidia-smi for every page refresh. CPU and RAM are read from
+``/proc``. Samples are kept in a fixed-size ring buffer, so UI calls only
+read memory.
+"""
+
+import os
+import shutil
+import subprocess
+import threading
+import time
+from collections import deque, namedtuple
+
+import gpus
+
+try:
+    import pynvml
+except ImportError:  # NVML bindings are optional, nvidia-smi is the fallback
+    pynvml = None
+
+# ============================================================================
+# Configuration
+# ============================================================================
+
+METRICS_INTERVAL = float(os.environ.get("METRICS_INTERVAL", 2.0))
+METRICS_MAX_SAMPLES = int(os.environ.get("METRICS_MAX_SAMPLES", 10800))  # 6 hours at 2 s
+
+# After nvidia-smi exits (driver hiccup, killed), wait this long before restarting it
+NVIDIA_SMI_RESTART_DELAY = 30
+
+Sample = namedtuple("Sample", ["time", "gpus", "cpu_percent", "ram_used", "ram_total",
+                               "disk_used", "disk_total"])
+
+
+# ============================================================================
+# Probes
+# ============================================================================
+
+def _read_cpu_times():
+    """``(busy, total)`` jiffies from /proc/stat, or None off Linux."""
+    try:
+        with open("/proc/stat", "r") as f:
+            fields = [int(x) for x in f.readline().split()[1:]]
+    except (OSError, ValueError):
+        return None
+    idle = fields[3] + (fields[4] if len(fields) > 4 else 0)  # idle + iowait
+    total = sum(fields[:8])  # guest time is already included in user/nice
+    return total - idle, total
+
+
+def _read_memory():
+    """``(used, total)`` bytes from /proc/meminfo, or ``(None, None)``."""
+    info = {}
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("MemTotal", "MemAvailable"):
+                    info[key] = int(value.split()[0]) * 1024
+    except (OSError, ValueError):
+        pass
+    if "MemTotal" not in info or "MemAvailable" not in info:
+        return None, None
+    return info["MemTotal"] - info["MemAvailable"], info["MemTotal"]
+
+
+def _read_nvml():
+    """Current GPU stats through NVML (already initialized)."""
+    result = []
+    for i in range(pynvml.nvmlDeviceGetCount()):
+        handle = pynvml.nvmlDeviceGetHandleByIndex(i)
+        name = pynvml.nvmlDeviceGetName(handle)
+        if isinstance(name, bytes):
+            name = name.decode()
+        mem = pynvml.nvmlDeviceGetMemoryInfo(handle)
+        util = pynvml.nvmlDeviceGetUtilizationRates(handle)
+        temp = pynvml.nvmlDeviceGetTemperature(handle, pynvml.NVML_TEMPERATURE_GPU)
+        mb = 1024 * 1024
+        result.append(gpus.GPU(str(i), name, mem.total / mb, mem.used / mb, mem.free / mb, util.gpu, temp))
+    return gpus.visible_gpus(result)
+
+
+# ============================================================================
+# Sampler
+# ============================================================================
+
+class MetricsSampler:
+    """Samples host metrics every ``interval`` seconds on background threads."""
+
+    def __init__(self, disk_path, interval=METRICS_INTERVAL, max_samples=METRICS_MAX_SAMPLES):
+        self.disk_path = disk_path
+        self.interval = interval
+        self.source = None  # "nvml", "nvidia-smi" or None once started
+        self._samples = deque(maxlen=max_samples)
+        self._latest = None
+        self._gpus = ()
+        self._cpu_times = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start sampling (idempotent). The first sample is taken right away."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            if pynvml is not None:
+                try:
+                    pynvml.nvmlInit()
+                    self.source = "nvml"
+                except Exception:
+                    pass
+            if self.source is None and shutil.which(gpus.NVIDIA_SMI):
+                self.source = "nvidia-smi"
+                threading.Thread(target=self._read_nvidia_smi, name="nvidia-smi-reader", daemon=True).start()
+            self._thread = threading.Thread(target=self._run, name="metrics-sampler", daemon=True)
+        self._sample()
+        self._thread.start()
+
+    def latest(self):
+        """The most recent Sample, or None before the first one."""
+        return self._latest
+
+    def samples(self):
+        """Snapshot of the time series, oldest first."""
+        with self._lock:
+            return list(self._samples)
+
+    def current_gpus(self):
+        """GPU stats from the latest sample."""
+        return list(self._gpus)
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while True:
+            next_tick += self.interval
+            time.sleep(max(0.0, next_tick - time.monotonic()))
+            try:
+                self._sample()
+            except Exception:
+                pass  # a failed probe must not kill the sampler
+
+    def _sample(self):
+        if self.source == "nvml":
+            try:
+                self._gpus = tuple(_read_nvml())
+            except Exception:
+                self._gpus = ()
+
+        cpu_percent = None
+        cpu_times = _read_cpu_times()
+        if cpu_times and self._cpu_times:
+            busy = cpu_times[0] - self._cpu_times[0]
+            total = cpu_times[1] - self._cpu_times[1]
+            cpu_percent = busy / total * 100 if total > 0 else 0.0
+        self._cpu_times = cpu_times
+
+        ram_used, ram_total = _read_memory()
+        try:
+            disk = shutil.disk_usage(self.disk_path)
+            disk_used, disk_total = disk.used, disk.total
+        except OSError:
+            disk_used = disk_total = None
+
+        sample = Sample(time.time(), self._gpus, cpu_percent, ram_used, ram_total, disk_used, disk_total)
+        with self._lock:
+            self._samples.append(sample)
+            self._latest = sample
+
+    def _read_nvidia_smi(self):
+        """Stream ``nvidia-smi --loop-ms`` output; one line per GPU per round."""
+        loop_ms = max(100, int(self.interval * 1000))
+        while True:
+            try:
+                process = subprocess.Popen(
+                    [gpus.NVIDIA_SMI, f"--query-gpu={gpus.QUERY_FIELDS}", "--format=csv,noheader,nounits",
+                     f"--loop-ms={loop_ms}"],
+                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, bufsize=1
+                )
+            except OSError:
+                return
+            batch = []
+            round_size = 0
+            for line in process.stdout:
+                parsed = gpus.parse_gpus(line)
+                if not parsed:
+                    continue
+                # A GPU index seen again means a new round has started
+                if batch and parsed[0].index in {g.index for g in batch}:
+                    round_size = len(batch)
+                    self._gpus = tuple(gpus.visible_gpus(batch))
+                    batch = []
+                batch.append(parsed[0])
+                if len(batch) == round_size:
+                    self._gpus = tuple(gpus.visible_gpus(batch))
+                    batch = []
+            process.wait()
+            self._gpus = ()  # don't keep serving stale numbers while it is down
+            time.sleep(NVIDIA_SMI_RESTART_DELAY)
+
+
+# ============================================================================
+# Shared Instance
+# ============================================================================
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def get_sampler(disk_path=None):
+    """Return the process-wide sampler, starting it on first use."""
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = MetricsSampler(disk_path or os.getcwd())
+            _sampler.start()
+        return _sampler
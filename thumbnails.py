@@ -0,0 +1,115 @@
+"""
+🖼️ Thumbnails
+Downscaled gallery previews, cached on disk and built in a process pool.
+
+Thumbnails are keyed by source path, mtime and size, so an edited or
+replaced image gets a fresh thumbnail and stale ones are simply never
+looked up again. Without Pillow the original images are served as-is.
+"""
+
+import hashlib
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional, galleries fall back to originals
+    Image = None
+
+# ============================================================================
+# Configuration
+# ============================================================================
+
+THUMBNAIL_SIZE = int(os.environ.get("THUMBNAIL_SIZE", 384))
+THUMBNAIL_FORMAT = os.environ.get("THUMBNAIL_FORMAT", "webp").lower()  # webp or jpeg
+if THUMBNAIL_FORMAT == "jpg":  # Pillow only knows the format as JPEG
+    THUMBNAIL_FORMAT = "jpeg"
+THUMBNAIL_QUALITY = 80
+THUMBNAIL_WORKERS = int(os.environ.get("THUMBNAIL_WORKERS", min(8, os.cpu_count() or 1)))
+
+# Below this many missing thumbnails a process pool costs more than it saves
+INLINE_BUILD_LIMIT = 4
+
+_executor = None
+_executor_lock = threading.Lock()
+_known = set()
+
+
+# ============================================================================
+# Building
+# ============================================================================
+
+def thumbnail_path(cache_dir, src_path, mtime_ns, size):
+    """Cache location of the thumbnail for one version of an image."""
+    key = f"{os.path.abspath(src_path)}\0{mtime_ns}\0{size}\0{THUMBNAIL_SIZE}"
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    ext = "jpg" if THUMBNAIL_FORMAT == "jpeg" else THUMBNAIL_FORMAT
+    return os.path.join(cache_dir, digest[:2], f"{digest}.{ext}")
+
+
+def build_thumbnail(src_path, dst_path):
+    """Write a downscaled copy of ``src_path``. Returns ``dst_path`` or None on failure."""
+    tmp_path = f"{dst_path}.{os.getpid()}.tmp"
+    try:
+        with Image.open(src_path) as img:
+            # JPEG can decode at 1/2, 1/4 or 1/8 scale, which skips most of the work
+            img.draft("RGB", (THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+            if img.mode not in ("RGB", "RGBA") or THUMBNAIL_FORMAT == "jpeg":
+                img = img.convert("RGB")
+
+            os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+            img.save(tmp_path, format=THUMBNAIL_FORMAT.upper(), quality=THUMBNAIL_QUALITY)
+        os.replace(tmp_path, dst_path)
+        return dst_path
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return None
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=THUMBNAIL_WORKERS)
+        return _executor
+
+
+def get_thumbnails(entries, cache_dir):
+    """Return a thumbnail path for every dataset index entry, building missing ones.
+
+    Entries whose thumbnail can't be produced map to the original image.
+    """
+    if Image is None:
+        return [entry.path for entry in entries]
+
+    results = []
+    missing = []
+    for i, entry in enumerate(entries):
+        thumb = thumbnail_path(cache_dir, entry.path, entry.mtime_ns, entry.size)
+        if thumb in _known or os.path.exists(thumb):
+            _known.add(thumb)
+            results.append(thumb)
+        else:
+            results.append(entry.path)
+            missing.append((i, entry.path, thumb))
+
+    if len(missing) <= INLINE_BUILD_LIMIT:
+        built = [build_thumbnail(src, thumb) for _, src, thumb in missing]
+    else:
+        executor = _get_executor()
+        built = list(executor.map(build_thumbnail,
+                                  [src for _, src, _ in missing],
+                                  [thumb for _, _, thumb in missing],
+                                  chunksize=16))
+
+    for (i, _, _), thumb in zip(missing, built):
+        if thumb:
+            _known.add(thumb)
+            results[i] = thumb
+    return results
@@ -0,0 +1,56 @@
+"""
+📉 Time Series
+Downsampling for the history charts.
+
+Largest-Triangle-Three-Buckets (LTTB) keeps the visual shape of a series -
+peaks, dips and plateaus - with a fixed number of points, so hours of
+2-second samples render as a few hundred points in the browser.
+"""
+
+import os
+
+# ============================================================================
+# Configuration
+# ============================================================================
+
+CHART_MAX_POINTS = int(os.environ.get("CHART_MAX_POINTS", 400))
+
+
+# ============================================================================
+# LTTB
+# ============================================================================
+
+def lttb(points, threshold=CHART_MAX_POINTS):
+    """Downsample ``[(x, y), ...]`` (sorted by x) to at most ``threshold`` points.
+
+    The first and last points are always kept. Points whose y is None are
+    dropped first.
+    """
+    points = [p for p in points if p[1] is not None]
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return points
+
+    sampled = [points[0]]
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0  # index of the previously selected point
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third corner of the triangle
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        count = next_end - next_start
+        avg_x = sum(p[0] for p in points[next_start:next_end]) / count
+        avg_y = sum(p[1] for p in points[next_start:next_end]) / count
+
+        ax, ay = points[a]
+        best, best_area = next_start - 1, -1.0
+        for j in range(int(i * bucket_size) + 1, next_start):
+            x, y = points[j]
+            area = abs((ax - avg_x) * (y - ay) - (ax - x) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(points[best])
+        a = best
+
+    sampled.append(points[-1])
+    return sampled
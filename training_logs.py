@@ -0,0 +1,350 @@
+"""
+📋 Training Logs
+Bounded in-memory training log shared by the UIs.
+
+Lines are kept in a ring buffer with a configurable cap, and every line gets
+a sequence number, so a caller that remembers the last number it saw can
+fetch only what was added since; ``log_delta`` turns that into the payload a
+UI appends to its log box in the browser. The on-disk copy is written by a single
+background writer holding one buffered file handle.
+"""
+
+import os
+import queue
+import threading
+import time
+from collections import deque
+from itertools import count, islice
+
+# ============================================================================
+# Configuration
+# ============================================================================
+
+TRAINING_LOG_MAX_LINES = int(os.environ.get("TRAINING_LOG_MAX_LINES", 5000))
+LOG_MAX_BYTES = int(os.environ.get("TRAINING_LOG_MAX_BYTES", 100 * 1024 * 1024))
+LOG_BACKUP_COUNT = 3
+
+# Longest close() waits for the writer thread before giving up on the rest
+LOG_CLOSE_TIMEOUT = float(os.environ.get("TRAINING_LOG_CLOSE_TIMEOUT", 10))
+
+
+# ============================================================================
+# Ring Buffer
+# ============================================================================
+
+class LogBuffer:
+    """Line-oriented ring buffer holding the most recent ``max_lines`` log lines."""
+
+    def __init__(self, max_lines=TRAINING_LOG_MAX_LINES):
+        self._lines = deque(maxlen=max_lines)
+        self._next_seq = 0
+        self.generation = 0  # bumped by clear()
+        self._lock = threading.Lock()
+
+    @property
+    def max_lines(self):
+        return self._lines.maxlen
+
+    @property
+    def next_seq(self):
+        """Sequence number the next appended line will get."""
+        return self._next_seq
+
+    @property
+    def first_seq(self):
+        """Sequence number of the oldest line still held."""
+        return self._next_seq - len(self._lines)
+
+    def __bool__(self):
+        return bool(self._lines)
+
+    def append(self, text):
+        """Append text; it is split into lines, a trailing newline is implied."""
+        lines = text.splitlines()
+        if not lines:
+            return
+        with self._lock:
+            self._lines.extend(lines)
+            self._next_seq += len(lines)
+
+    def clear(self):
+        """Drop all lines. Sequence numbers keep counting; ``generation`` tells readers to start over."""
+        with self._lock:
+            self._lines.clear()
+            self.generation += 1
+
+    def since(self, seq):
+        """Return ``(lines, next_seq)`` for lines numbered ``seq`` or later.
+
+        Lines that were already trimmed from the buffer are skipped silently.
+        """
+        with self._lock:
+            count = min(len(self._lines), self._next_seq - seq)
+            if count <= 0:
+                return [], self._next_seq
+            # Walk from the newest end so the cost is O(new lines), not O(buffer)
+            lines = list(islice(reversed(self._lines), count))
+            lines.reverse()
+            return lines, self._next_seq
+
+    def text(self):
+        """The whole retained log as one string."""
+        with self._lock:
+            return "\n".join(self._lines)
+
+
+# ============================================================================
+# Streaming To Browsers
+# ============================================================================
+
+# Browser side of log_delta(), for a js-only event with inputs [delta, log box]
+# and output [log box]: appends the new lines, or replaces the text on a reset
+APPEND_LOG_JS = """
+(delta, text) => {
+    if (!delta || delta.id === window.__trainingLogDelta) return text;
+    window.__trainingLogDelta = delta.id;
+    if (delta.reset || !text) return delta.text;
+    return delta.text ? text + "\\n" + delta.text : text;
+}
+"""
+
+_delta_ids = count()
+
+
+def log_delta(log, key, last_seen):
+    """Bring a viewer whose previous state is ``last_seen`` up to date with ``log``.
+
+    Returns ``(delta, seen)``. ``delta`` is None when no line was added, else
+    ``{"id", "reset", "text"}``: the new lines to append, or with ``reset``
+    the whole retained log to show instead. That happens for a new ``key``
+    (another run), a cleared buffer, or when the viewer's copy would grow
+    past the buffer's cap. ``seen`` is passed back on the next call.
+    """
+    key = (key, log.generation)
+    if last_seen is not None and last_seen[0] == key:
+        base, seq = last_seen[1], last_seen[2]
+        if log.next_seq == seq:
+            return None, last_seen
+        if log.next_seq - base <= log.max_lines and seq >= log.first_seq:
+            lines, next_seq = log.since(seq)
+            delta = {"id": next(_delta_ids), "reset": False, "text": "\n".join(lines)}
+            return delta, (key, base, next_seq)
+    lines, next_seq = log.since(0)
+    delta = {"id": next(_delta_ids), "reset": True, "text": "\n".join(lines)}
+    return delta, (key, next_seq - len(lines), next_seq)
+
+
+# ============================================================================
+# File Writer
+# ============================================================================
+
+class LogWriter:
+    """Writes a log file from a background thread through one buffered handle.
+
+    ``write`` never blocks on disk: lines are queued, and the writer thread
+    flushes every ``flush_interval`` seconds or ``flush_bytes`` bytes and
+    rotates the file (``training.log`` -> ``training.log.1`` ...) once it grows
+    past ``max_bytes``. If the disk can't keep up and the queue fills, lines
+    are dropped and a note with the count is written once it catches up.
+    A write or rotation error (e.g. a full disk) stops the file there and is
+    kept in ``error``; the run itself is never blocked by its log.
+    """
+
+    _STOP = object()
+
+    def __init__(self, path, mode="a", flush_interval=1.0, flush_bytes=64 * 1024,
+                 max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT, queue_size=10000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.dropped = 0
+        self.error = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._file = open(path, mode, encoding="utf-8", buffering=1024 * 1024)
+        self._size = self._file.tell()
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, text):
+        if self.error is not None:
+            self.dropped += 1
+            return
+        try:
+            self._queue.put_nowait(text)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout=LOG_CLOSE_TIMEOUT):
+        """Flush everything queued so far and close the file.
+
+        Returns after at most ``timeout`` seconds even if the writer is stuck.
+        """
+        if self._thread.is_alive():
+            try:
+                self._queue.put(self._STOP, timeout=timeout)
+            except queue.Full:
+                pass
+            self._thread.join(timeout)
+
+    def _run(self):
+        try:
+            self._write_loop()
+        except (OSError, ValueError) as e:
+            # ValueError: a failed rotation left the handle closed
+            self.error = e
+        finally:
+            try:
+                self._file.close()
+            except (OSError, ValueError):
+                pass
+            # Nothing will read the queue anymore; let writers drop instead of filling it
+            while True:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+    def _write_loop(self):
+        pending = 0
+        last_flush = time.monotonic()
+        reported_drops = 0
+        while True:
+            timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is self._STOP:
+                break
+            if item:
+                if self.dropped > reported_drops:
+                    item = f"[log writer dropped {self.dropped - reported_drops} lines]\n" + item
+                    reported_drops = self.dropped
+                self._file.write(item)
+                written = len(item.encode("utf-8"))
+                pending += written
+                self._size += written
+
+            now = time.monotonic()
+            if pending and (pending >= self.flush_bytes or now - last_flush >= self.flush_interval):
+                self._file.flush()
+                pending = 0
+                last_flush = now
+            elif not pending:
+                last_flush = now
+
+            if self.max_bytes and self._size >= self.max_bytes:
+                self._rotate()
+                pending = 0
+
+    def _rotate(self):
+        self._file.close()
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, "w", encoding="utf-8", buffering=1024 * 1024)
+        self._size = 0
+
+
+# ============================================================================
+# File Tail
+# ============================================================================
+
+def tail_lines(path, n, block_size=64 * 1024):
+    """Return the last ``n`` lines of a file, reading backwards from its end."""
+    with open(path, "rb") as f:
+        return _read_tail(f, n, block_size)[0]
+
+
+def _read_tail(f, n, block_size=64 * 1024):
+    """Read the last ``n`` complete lines of an open binary file.
+
+    Returns ``(lines, partial)`` where ``partial`` is an unterminated last
+    line, and leaves the file positioned at its end.
+    """
+    end = f.seek(0, os.SEEK_END)
+    pos = end
+    data = b""
+    while pos > 0 and data.count(b"\n") <= n:
+        step = min(block_size, pos)
+        pos -= step
+        f.seek(pos)
+        data = f.read(step) + data
+    f.seek(end)
+
+    # Without any newline rpartition puts everything in ``partial``
+    data, _, partial = data.rpartition(b"\n")
+    lines = data.decode("utf-8", errors="replace").splitlines()
+    if pos > 0 and lines:
+        lines = lines[1:]  # the first one may be cut off mid-line
+    return (lines[-n:] if n else []), partial
+
+
+class LogTail:
+    """Follows a log file like ``tail -F``, returning only newly appended lines.
+
+    The file is kept open and read from the remembered offset. Truncation
+    (file shorter than the offset) restarts from the beginning; rotation
+    (path now points to a different file) drains the old file and switches
+    to the new one. The first read only returns the last ``initial_lines``
+    lines instead of the whole file.
+    """
+
+    def __init__(self, path, initial_lines=TRAINING_LOG_MAX_LINES):
+        self.path = path
+        self.initial_lines = initial_lines
+        self._file = None
+        self._partial = b""
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def read(self):
+        """Return the complete lines appended since the previous call."""
+        if self._file is None:
+            return self._open(self.initial_lines)
+
+        lines = self._read_new()
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return lines
+        if (st.st_dev, st.st_ino) != self._identity:
+            # Rotated: the old file is fully drained above, follow the new one from its start
+            self.close()
+            self._partial = b""
+            lines += self._open(None)
+        return lines
+
+    def _open(self, initial_lines):
+        try:
+            self._file = open(self.path, "rb")
+        except FileNotFoundError:
+            return []
+        st = os.fstat(self._file.fileno())
+        self._identity = (st.st_dev, st.st_ino)
+        if initial_lines is None:
+            return self._read_new()
+        lines, self._partial = _read_tail(self._file, initial_lines)
+        return lines
+
+    def _read_new(self):
+        if os.fstat(self._file.fileno()).st_size < self._file.tell():
+            # Truncated in place
+            self._file.seek(0)
+            self._partial = b""
+        data = self._partial + self._file.read()
+        data, sep, self._partial = data.rpartition(b"\n")
+        if not sep:
+            return []
+        return data.decode("utf-8", errors="replace").splitlines()
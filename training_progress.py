@@ -0,0 +1,128 @@
+"""
+📈 Training Progress
+Streaming parser for the tqdm progress lines printed by sd-scripts.
+
+``flux_train_network.py`` reports progress as
+
+    steps:  12%|█▏        | 300/2500 [05:12<38:10,  1.04s/it, avr_loss=0.123]
+
+The tracker is fed every stdout line, recognizes these updates and keeps a
+compact time series (one small tuple per step), independent of how much of
+the raw log is still held in memory.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import deque, namedtuple
+
+# ============================================================================
+# Configuration
+# ============================================================================
+
+PROGRESS_MAX_SAMPLES = int(os.environ.get("PROGRESS_MAX_SAMPLES", 20000))
+
+_PROGRESS_RE = re.compile(
+    r"steps:\s*\d+%\|[^|]*\|\s*(?P<step>\d+)/(?P<total>\d+)\s*"
+    r"\[(?P<elapsed>[\d:]+)<(?P<eta>[\d:?]+),\s*(?P<rate>[\d.]+|\?)\s*(?P<unit>s/it|it/s)"
+    r"(?:,\s*(?P<postfix>[^\]]*))?\]"
+)
+_POSTFIX_RE = re.compile(r"(\w+)=([-+\d.eE]+|nan|inf)")
+
+Sample = namedtuple("Sample", ["time", "step", "total", "loss", "avr_loss", "it_per_sec", "eta"])
+
+
+def _parse_duration(text):
+    """``"38:10"`` / ``"1:02:03"`` -> seconds, None for ``"?"``."""
+    if not text or "?" in text:
+        return None
+    seconds = 0
+    for part in text.split(":"):
+        seconds = seconds * 60 + int(part)
+    return seconds
+
+
+def parse_progress_line(line):
+    """Parse one progress update into a dict, or return None if it isn't one."""
+    match = _PROGRESS_RE.search(line)
+    if not match:
+        return None
+
+    rate = match.group("rate")
+    it_per_sec = None
+    if rate != "?" and float(rate) > 0:
+        it_per_sec = float(rate) if match.group("unit") == "it/s" else 1.0 / float(rate)
+
+    postfix = dict(_POSTFIX_RE.findall(match.group("postfix") or ""))
+    return {
+        "step": int(match.group("step")),
+        "total": int(match.group("total")),
+        "elapsed": _parse_duration(match.group("elapsed")),
+        "eta": _parse_duration(match.group("eta")),
+        "it_per_sec": it_per_sec,
+        "loss": float(postfix["loss"]) if "loss" in postfix else None,
+        "avr_loss": float(postfix["avr_loss"]) if "avr_loss" in postfix else None,
+    }
+
+
+# ============================================================================
+# Tracker
+# ============================================================================
+
+class ProgressTracker:
+    """Keeps the latest progress and a bounded per-step time series."""
+
+    def __init__(self, max_samples=PROGRESS_MAX_SAMPLES):
+        self._samples = deque(maxlen=max_samples)
+        self._latest = None
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._latest = None
+
+    def feed(self, line):
+        """Feed one line of trainer output. Returns the new Sample, if the step advanced."""
+        if "steps:" not in line:
+            return None
+        progress = parse_progress_line(line)
+        if progress is None:
+            return None
+
+        sample = Sample(time.time(), progress["step"], progress["total"], progress["loss"],
+                        progress["avr_loss"], progress["it_per_sec"], progress["eta"])
+        with self._lock:
+            self._latest = sample
+            # tqdm redraws the same step several times; keep one sample per step
+            if self._samples and self._samples[-1].step == sample.step:
+                self._samples[-1] = sample
+                return None
+            self._samples.append(sample)
+        return sample
+
+    def latest(self):
+        """The most recent progress as a Sample, or None before the first step."""
+        return self._latest
+
+    def samples(self):
+        """Snapshot of the time series, oldest first."""
+        with self._lock:
+            return list(self._samples)
+
+    def summary(self):
+        """Short human-readable progress line, empty before the first step."""
+        s = self._latest
+        if s is None:
+            return ""
+        parts = [f"step {s.step}/{s.total} ({s.step / max(s.total, 1) * 100:.0f}%)"]
+        if s.avr_loss is not None:
+            parts.append(f"avr_loss {s.avr_loss:.4f}")
+        elif s.loss is not None:
+            parts.append(f"loss {s.loss:.4f}")
+        if s.it_per_sec:
+            parts.append(f"{s.it_per_sec:.2f} it/s" if s.it_per_sec >= 1 else f"{1 / s.it_per_sec:.2f} s/it")
+        if s.eta is not None:
+            parts.append(f"ETA {s.eta // 3600}:{s.eta // 60 % 60:02d}:{s.eta % 60:02d}")
+        return " · ".join(parts)